@@ -0,0 +1,500 @@
+import numpy as np
+
+from .game import IMPACT_EPSILON, MAX_IMPACTS
+
+
+# Rows allocated up front, doubled whenever the games outgrow them
+INITIAL_CAPACITY = 64
+
+# Per-match state kept as one array per field (structure of arrays)
+FIELDS = [
+    ('pitch_width', np.float64),
+    ('pitch_height', np.float64),
+    ('ball_left', np.float64),
+    ('ball_top', np.float64),
+    ('ball_size', np.float64),
+    ('ball_angle', np.float64),
+    ('ball_dx', np.float64),
+    ('ball_dy', np.float64),
+    ('ball_speed', np.float64),
+    ('ball_speed_orig', np.float64),
+    ('ball_speed_max', np.float64),
+    ('ball_accelerator', np.float64),
+    ('ball_amplitude', np.int64),
+    ('ball_engage_left', np.bool_),
+    ('left_paddle_left', np.float64),
+    ('left_paddle_top', np.float64),
+    ('left_paddle_height', np.float64),
+    ('left_paddle_speed', np.float64),
+    ('left_paddle_dy', np.float64),
+    ('left_paddle_amplitude', np.float64),
+    ('right_paddle_left', np.float64),
+    ('right_paddle_top', np.float64),
+    ('right_paddle_height', np.float64),
+    ('right_paddle_speed', np.float64),
+    ('right_paddle_dy', np.float64),
+    ('right_paddle_amplitude', np.float64),
+    ('score_left', np.int64),
+    ('score_right', np.int64),
+    ('max_points', np.int64),
+    ('paused', np.bool_),
+    ('pause_start', np.float64),
+    ('pause_duration', np.float64),
+    ('finished', np.bool_),
+    ('last_update', np.float64),
+    ('time', np.float64),
+    ('time_step', np.float64),
+    ('max_steps', np.int64),
+    ('accumulator', np.float64),
+    ('steps', np.int64),
+    ('swept', np.bool_),
+]
+
+
+class BatchPhysics:
+    # Steps many GameLogic instances with one vectorized update per tick.
+    # The GameLogic objects stay the source of truth for everything outside
+    # the simulation: paddle moves are read from them before each step and
+    # the resulting positions, scores and pause state are written back.
+
+    def __init__(self):
+        self.logics = []
+        self.rows = {}
+        self.capacity = INITIAL_CAPACITY
+        self.storage = {
+            name: np.empty(self.capacity, dtype=dtype)
+            for name, dtype in FIELDS
+        }
+        self.resize()
+
+    def __len__(self):
+        return len(self.logics)
+
+    def __contains__(self, logic):
+        return logic in self.rows
+
+    def resize(self):
+        # state holds views on the rows in use, updated in place
+        self.state = {
+            name: array[:len(self.logics)]
+            for name, array in self.storage.items()
+        }
+
+    def add(self, logic):
+        if logic in self:
+            return
+        if len(self.logics) == self.capacity:
+            self.capacity *= 2
+            for name, array in self.storage.items():
+                self.storage[name] = np.resize(array, self.capacity)
+        row = self.load(logic)
+        index = len(self.logics)
+        for name, _ in FIELDS:
+            self.storage[name][index] = row[name]
+        self.rows[logic] = index
+        self.logics.append(logic)
+        self.resize()
+
+    def remove(self, logic):
+        # The last row takes the place of the removed one
+        index = self.rows.pop(logic, None)
+        if index is None:
+            return
+        last = self.logics.pop()
+        if last is not logic:
+            self.logics[index] = last
+            self.rows[last] = index
+            for array in self.storage.values():
+                array[index] = array[len(self.logics)]
+        self.resize()
+
+    def load(self, logic):
+        ball = logic.ball
+        left = logic.player['left']
+        right = logic.player['right']
+        return {
+            'pitch_width': logic.pitch.width,
+            'pitch_height': logic.pitch.height,
+            'ball_left': ball.left,
+            'ball_top': ball.top,
+            'ball_size': ball.height,
+            'ball_angle': ball.angle,
+            'ball_dx': ball.d_x,
+            'ball_dy': ball.d_y,
+            'ball_speed': ball.px_per_sec,
+            'ball_speed_orig': ball.px_per_sec_orig,
+            'ball_speed_max': ball.px_per_sec_max,
+            'ball_accelerator': ball.accelerate_factor_per_sec or 0,
+            'ball_amplitude': ball.start_amplitude,
+            'ball_engage_left': ball.engage_left,
+            'left_paddle_left': left.paddle.left,
+            'left_paddle_top': left.paddle.top,
+            'left_paddle_height': left.paddle.height,
+            'left_paddle_speed': left.paddle.px_per_sec,
+            'left_paddle_dy': left.paddle.d_y,
+            'left_paddle_amplitude': left.paddle.amplitude,
+            'right_paddle_left': right.paddle.left,
+            'right_paddle_top': right.paddle.top,
+            'right_paddle_height': right.paddle.height,
+            'right_paddle_speed': right.paddle.px_per_sec,
+            'right_paddle_dy': right.paddle.d_y,
+            'right_paddle_amplitude': right.paddle.amplitude,
+            'score_left': left.score,
+            'score_right': right.score,
+            'max_points': logic.max_points,
+            'paused': logic.paused,
+            'pause_start': logic.pause_start,
+            'pause_duration': logic.pause_duration,
+            'finished': logic.finished,
+            'last_update': logic.last_update,
+            'time': logic.time,
+            'time_step': logic.time_step or 0,
+            'max_steps': logic.max_steps,
+            'accumulator': logic.accumulator,
+            'steps': logic.steps,
+            'swept': logic.swept_collisions,
+        }
+
+    def load_inputs(self, logics, indexes):
+        s = self.state
+        for side in ['left', 'right']:
+            paddles = [logic.player[side].paddle for logic in logics]
+            s[f'{side}_paddle_speed'][indexes] = [
+                paddle.px_per_sec for paddle in paddles
+            ]
+            s[f'{side}_paddle_dy'][indexes] = [
+                paddle.d_y for paddle in paddles
+            ]
+
+    def store(self, logics, indexes):
+        s = self.state
+
+        def column(name):
+            return s[name][indexes].tolist()
+        columns = zip(
+            logics,
+            column('ball_left'),
+            column('ball_top'),
+            column('ball_angle'),
+            column('ball_dx'),
+            column('ball_dy'),
+            column('ball_speed'),
+            column('ball_engage_left'),
+            column('left_paddle_left'),
+            column('left_paddle_top'),
+            column('right_paddle_left'),
+            column('right_paddle_top'),
+            column('score_left'),
+            column('score_right'),
+            column('paused'),
+            column('pause_start'),
+            column('finished'),
+            column('last_update'),
+            column('time'),
+            column('accumulator'),
+            column('steps'),
+        )
+        for (
+            logic, ball_left, ball_top, ball_angle, ball_dx, ball_dy,
+            ball_speed, engage_left,
+            left_paddle_left, left_paddle_top,
+            right_paddle_left, right_paddle_top,
+            score_left, score_right,
+            paused, pause_start, finished, last_update,
+            simulated_time, accumulator, steps
+        ) in columns:
+            ball = logic.ball
+            ball.move_at(ball_left, ball_top)
+            ball.angle = ball_angle
+            ball.d_x = ball_dx
+            ball.d_y = ball_dy
+            ball.px_per_sec = ball_speed
+            ball.engage_left = engage_left
+            left = logic.player['left']
+            right = logic.player['right']
+            left.paddle.move_at(left_paddle_left, left_paddle_top)
+            right.paddle.move_at(right_paddle_left, right_paddle_top)
+            left.score = score_left
+            right.score = score_right
+            logic.paused = paused
+            logic.pause_start = pause_start
+            logic.finished = finished
+            logic.last_update = last_update
+            logic.time = simulated_time
+            logic.accumulator = accumulator
+            logic.steps = steps
+
+    def update(self, logics=None):
+        # Steps the given games, all of them by default. The others keep
+        # their state and catch up on their next update, as they would
+        # with GameLogic.update().
+        if logics is None:
+            logics = self.logics
+        if not logics:
+            return
+        s = self.state
+        indexes = np.array([self.rows[logic] for logic in logics])
+        due = np.zeros(len(self.logics), dtype=np.bool_)
+        due[indexes] = True
+        self.load_inputs(logics, indexes)
+        # Each game keeps its own clock, as GameLogic.update() does
+        current_time = s['last_update'].copy()
+        current_time[indexes] = [logic.chrono.get_time() for logic in logics]
+        elapsed_time = current_time - s['last_update']
+        s['last_update'][:] = current_time
+
+        variable = due & (s['time_step'] == 0)
+        s['time'][variable] = current_time[variable]
+        self.step(variable, elapsed_time)
+
+        # Fixed timestep games run their catch-up steps side by side
+        fixed = due & (s['time_step'] != 0)
+        s['accumulator'][fixed] += elapsed_time[fixed]
+        for steps in range(int(s['max_steps'].max())):
+            stepping = (
+                fixed
+                & (s['accumulator'] >= s['time_step'])
+                & (steps < s['max_steps'])
+            )
+            if not stepping.any():
+                break
+            s['time'][stepping] += s['time_step'][stepping]
+            self.step(stepping, s['time_step'])
+            s['accumulator'][stepping] -= s['time_step'][stepping]
+        behind = fixed & (s['accumulator'] >= s['time_step'])
+        s['accumulator'][behind] = np.mod(
+            s['accumulator'][behind], s['time_step'][behind]
+        )
+        self.store(logics, indexes)
+
+    def step(self, stepping, elapsed_time):
+        s = self.state
+        current_time = s['time']
+        s['steps'] += stepping
+
+        # GameLogic.check_finish
+        s['finished'] |= stepping & (
+            (s['score_left'] == s['max_points'])
+            | (s['score_right'] == s['max_points'])
+        )
+        active = stepping & ~s['finished']
+        swept = s['swept']
+
+        # Paddle.update_position, swept games move them along with the ball
+        for side in ['left', 'right']:
+            self.move_paddle(side, active & ~swept, elapsed_time)
+
+        # GameLogic.check_pause
+        s['paused'] &= ~(
+            active
+            & (current_time - s['pause_start'] >= s['pause_duration'])
+        )
+        moving = active & ~s['paused']
+
+        for side in ['left', 'right']:
+            self.move_paddle(side, active & swept & s['paused'], elapsed_time)
+        self.move_ball(moving & ~swept, elapsed_time)
+        self.handle_collisions(moving & ~swept, current_time)
+        self.sweep(moving & swept, elapsed_time, current_time)
+
+    def move_paddle(self, side, active, elapsed_time):
+        # Paddles only move vertically
+        s = self.state
+        top = s[f'{side}_paddle_top']
+        height = s[f'{side}_paddle_height']
+        d_y = s[f'{side}_paddle_dy']
+        speed = s[f'{side}_paddle_speed']
+        top += np.where(active, d_y * speed * elapsed_time, 0)
+        top[active & (top < 0)] = 0
+        overflow = active & (top + height - 1 > s['pitch_height'])
+        top[overflow] = (s['pitch_height'] - height)[overflow]
+
+    def accelerate_ball(self, moving, elapsed_time):
+        s = self.state
+        speed = s['ball_speed']
+        accelerating = moving & (s['ball_accelerator'] != 0)
+        speed += np.where(
+            accelerating, s['ball_accelerator'] * elapsed_time, 0
+        )
+        capped = accelerating & (speed > s['ball_speed_max'])
+        speed[capped] = s['ball_speed_max'][capped]
+
+    def move_ball(self, moving, elapsed_time):
+        s = self.state
+        self.accelerate_ball(moving, elapsed_time)
+        speed = s['ball_speed']
+        left = s['ball_left']
+        top = s['ball_top']
+        size = s['ball_size']
+        left += np.where(moving, s['ball_dx'] * speed * elapsed_time, 0)
+        top += np.where(moving, s['ball_dy'] * speed * elapsed_time, 0)
+
+        # Ball.update_position clamps to the pitch in this order
+        top[moving & (top < 0)] = 0
+        overflow = moving & (top + size - 1 > s['pitch_height'] - 1)
+        top[overflow] = (s['pitch_height'] - size)[overflow]
+        left[moving & (left < 0)] = 0
+        overflow = moving & (left + size - 1 > s['pitch_width'] - 1)
+        left[overflow] = (s['pitch_width'] - size)[overflow]
+
+    def handle_collisions(self, moving, current_time):
+        s = self.state
+        size = s['ball_size']
+        top = s['ball_top']
+        bottom = top + size - 1
+
+        # Ball.handle_wall_collisions
+        wall = moving & ((top == 0) | (bottom == s['pitch_height'] - 1))
+        self.set_ball_angle(wall, np.mod(360 - s['ball_angle'][wall], 360))
+
+        self.check_goals(moving, current_time)
+
+    def sweep(self, moving, elapsed_time, current_time):
+        # GameLogic.sweep, every game advancing to its own next impact
+        s = self.state
+        left = s['ball_left']
+        top = s['ball_top']
+        size = s['ball_size']
+        width = s['pitch_width']
+        height = s['pitch_height']
+        self.accelerate_ball(moving, elapsed_time)
+        remaining = np.where(moving, elapsed_time, 0)
+        for _ in range(MAX_IMPACTS):
+            live = remaining > 0
+            if not live.any():
+                break
+
+            # Ball.time_of_impact
+            d_x = s['ball_dx'] * s['ball_speed']
+            d_y = s['ball_dy'] * s['ball_speed']
+            with np.errstate(divide='ignore', invalid='ignore'):
+                time_x = np.where(
+                    d_x < 0,
+                    (0 - left) / d_x,
+                    np.where(
+                        d_x > 0,
+                        ((width - 1) - (left + size - 1)) / d_x,
+                        np.inf
+                    )
+                )
+                time_y = np.where(
+                    d_y < 0,
+                    (0 - top) / d_y,
+                    np.where(
+                        d_y > 0,
+                        ((height - 1) - (top + size - 1)) / d_y,
+                        np.inf
+                    )
+                )
+            time_of_impact = np.maximum(np.minimum(time_x, time_y), 0)
+            time_of_impact = np.where(
+                live, np.minimum(time_of_impact, remaining), 0
+            )
+
+            for side in ['left', 'right']:
+                self.move_paddle(side, live, time_of_impact)
+
+            # Ball.sweep_position
+            left += np.where(
+                live, s['ball_dx'] * s['ball_speed'] * time_of_impact, 0
+            )
+            top += np.where(
+                live, s['ball_dy'] * s['ball_speed'] * time_of_impact, 0
+            )
+            top[live & (top < 0 + IMPACT_EPSILON)] = 0
+            reached = live & (top + size - 1 > height - 1 - IMPACT_EPSILON)
+            top[reached] = (height - size)[reached]
+            left[live & (left < 0 + IMPACT_EPSILON)] = 0
+            reached = live & (left + size - 1 > width - 1 - IMPACT_EPSILON)
+            left[reached] = (width - size)[reached]
+            remaining -= time_of_impact
+
+            # GameLogic.handle_impacts
+            scored = self.check_goals(live, current_time)
+            bouncing = live & ~scored
+            d_y = s['ball_dy']
+            wall = bouncing & (
+                ((top == 0) & (d_y < 0))
+                | ((top + size - 1 == height - 1) & (d_y > 0))
+            )
+            self.set_ball_angle(
+                wall, np.mod(360 - s['ball_angle'][wall], 360)
+            )
+
+            for side in ['left', 'right']:
+                self.move_paddle(side, scored, remaining)
+            remaining[scored] = 0
+
+        for side in ['left', 'right']:
+            self.move_paddle(side, remaining > 0, remaining)
+
+    def check_goals(self, moving, current_time):
+        s = self.state
+        size = s['ball_size']
+        top = s['ball_top']
+        bottom = top + size - 1
+
+        # Player.check_goal, left side first as in GameLogic
+        at_left = moving & (s['ball_left'] == 0)
+        at_right = moving & (
+            s['ball_left'] + size - 1 == s['pitch_width'] - 1
+        )
+        scored = np.zeros_like(moving)
+        for side, at_goal, opponent in [
+            ('left', at_left, 'right'),
+            ('right', at_right, 'left'),
+        ]:
+            paddle_top = s[f'{side}_paddle_top']
+            paddle_height = s[f'{side}_paddle_height']
+            paddle_bottom = paddle_top + paddle_height - 1
+            hit = (
+                (top <= paddle_bottom + 1) & (bottom >= paddle_top - 1)
+            )
+            bounce = at_goal & hit
+            goal = at_goal & ~hit
+
+            # Ball.handle_paddle_collision
+            span = (size + paddle_height + 1) / 2
+            distance = (
+                (bottom - size / 2) - (paddle_bottom - paddle_height / 2)
+            )
+            angle = distance / span * s[f'{side}_paddle_amplitude']
+            if side == 'right':
+                angle = 180 - angle
+            self.set_ball_angle(bounce, np.mod(angle[bounce], 360))
+
+            s[f'score_{opponent}'] += goal
+            scored |= goal
+
+        if scored.any():
+            self.reset_balls(np.flatnonzero(scored), current_time)
+        return scored
+
+    def reset_balls(self, indexes, current_time):
+        s = self.state
+        width = s['pitch_width'][indexes]
+        height = s['pitch_height'][indexes]
+        size = s['ball_size'][indexes]
+        s['ball_speed'][indexes] = s['ball_speed_orig'][indexes]
+        s['ball_left'][indexes] = (width - 1 - width / 2) - size / 2
+        s['ball_top'][indexes] = (height - 1 - height / 2) - size / 2
+        s['paused'][indexes] = True
+        s['pause_start'][indexes] = current_time[indexes]
+
+        # Ball.reset draws from each game's own random generator
+        for index in indexes.tolist():
+            engage_left = not s['ball_engage_left'][index]
+            amplitude = int(s['ball_amplitude'][index])
+            angle = self.logics[index].random.randint(-amplitude, amplitude)
+            if engage_left:
+                angle = (180 - angle) % 360
+            s['ball_engage_left'][index] = engage_left
+            s['ball_angle'][index] = angle
+        self.set_ball_angle(indexes, s['ball_angle'][indexes])
+
+    def set_ball_angle(self, mask, angle):
+        # MovingRectangle.set_angle
+        s = self.state
+        s['ball_angle'][mask] = angle
+        s['ball_dx'][mask] = np.cos(np.radians(angle))
+        s['ball_dy'][mask] = np.sin(np.radians(angle))
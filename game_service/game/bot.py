@@ -0,0 +1,79 @@
+import random
+
+
+# How far off, in pixels, a bot may aim from where the ball will land
+LEVELS = {'easy': 45, 'medium': 30, 'hard': 15}
+DEFAULT_LEVEL = 'medium'
+
+
+def predict_landing(ball, pitch, line_x):
+    # Top of the ball when its leading edge reaches line_x. The walls fold
+    # the straight trajectory back into the pitch, so the bounces come out
+    # of a modulo instead of frame by frame simulation.
+    if ball.d_x > 0:
+        distance = line_x - ball.right
+    else:
+        distance = ball.left - line_x
+    travel = ball.top - pitch.top + ball.d_y * distance / abs(ball.d_x)
+    span = pitch.height - ball.height
+    travel %= 2 * span
+    if travel > span:
+        travel = 2 * span - travel
+    return pitch.top + travel
+
+
+class Bot:
+    # Plays one side of a game by steering its paddle towards where the
+    # ball will reach its goal line, back to the middle otherwise
+
+    def __init__(self, side, level=DEFAULT_LEVEL, seed=None):
+        self.side = side
+        self.level = level
+        self.error = LEVELS[level]
+        self.random = random.Random(seed)
+        self.move = None
+        self.heading = None
+        self.offset = 0
+        self.target = None
+
+    def act(self, logic):
+        # Returns the move to trigger, if it changed
+        ball = logic.ball
+        pitch = logic.pitch
+        paddle = logic.player[self.side].paddle
+        coming = ball.d_x < 0 if self.side == 'left' else ball.d_x > 0
+
+        if logic.paused or not coming:
+            self.heading = None
+            target = pitch.top + pitch.height / 2
+        else:
+            # Predict once per straight segment of the trajectory, with
+            # one aiming error per approach
+            heading = (ball.d_x, ball.d_y)
+            if self.heading is None:
+                self.offset = self.random.uniform(-self.error, self.error)
+            if heading != self.heading:
+                self.heading = heading
+                # Paddles send the ball back from the goal lines
+                line_x = pitch.left if self.side == 'left' else pitch.right
+                self.target = (
+                    predict_landing(ball, pitch, line_x)
+                    + ball.height / 2
+                    + self.offset
+                )
+            target = self.target
+
+        center = paddle.top + paddle.height / 2
+        deadband = paddle.height / 4
+        if center < target - deadband:
+            move = 'down'
+        elif center > target + deadband:
+            move = 'up'
+        elif self.move in ['up', 'down']:
+            move = f'{self.move}_off'
+        else:
+            move = self.move
+        if move == self.move:
+            return None
+        self.move = move
+        return move
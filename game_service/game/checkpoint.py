@@ -0,0 +1,188 @@
+import asyncio
+import logging
+
+from channels.db import database_sync_to_async
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from .game import GameLogic
+from .metrics import metrics
+from .models import GameCheckpoint, PendingResult
+
+
+logger = logging.getLogger('game-service')
+
+
+# The tick loop snapshots its running games every CHECKPOINT_TIME, between
+# two ticks so the snapshots are consistent, and one writer per process
+# upserts them in batches. A snapshot is a few hundred bytes of JSON taken
+# in a few microseconds. Snapshots are skipped while the previous batch is
+# still being written, a slow database delays checkpoints, never ticks.
+CHECKPOINT_TIME = 1     # Seconds
+BATCH_SIZE = 500
+
+
+def snapshot(logic):
+    ball = logic.ball
+    return {
+        'seed': logic.seed,
+        'steps': logic.steps,
+        'time': logic.time,
+        'chrono': logic.chrono.get_time(),
+        'ball': [
+            ball.left,
+            ball.top,
+            ball.px_per_sec,
+            ball.angle,
+            ball.engage_left,
+        ],
+        'paddles': [
+            logic.player['left'].paddle.top,
+            logic.player['right'].paddle.top,
+        ],
+        'scores': [
+            logic.player['left'].score,
+            logic.player['right'].score,
+        ],
+    }
+
+
+def restore(config, state, clock=None):
+    logic = GameLogic(**config, seed=state['seed'], clock=clock)
+    logic.start()
+    # The random generator state is not kept, the next serves are drawn
+    # from a new one
+    logic.random.seed(state['seed'] + state['steps'])
+    left, top, px_per_sec, angle, engage_left = state['ball']
+    logic.ball.move_at(left, top)
+    logic.ball.px_per_sec = px_per_sec
+    logic.ball.set_angle(angle)
+    logic.ball.engage_left = engage_left
+    # Paddles restart still, nobody holds a key after a restart
+    for side, top, score in zip(
+        ['left', 'right'], state['paddles'], state['scores']
+    ):
+        player = logic.player[side]
+        player.paddle.move_at(player.paddle.left, top)
+        player.score = score
+    logic.steps = state['steps']
+    logic.check_finish()
+    resume(logic, state)
+    return logic
+
+
+def resume(logic, state):
+    # The match clock goes on from the snapshot, starting with a pause so
+    # players get ready again
+    logic.chrono.start_time = logic.chrono.clock() - state['chrono']
+    logic.last_update = logic.chrono.get_time()
+    logic.time = state['time']
+    logic.accumulator = 0
+    logic.trigger_pause()
+
+
+def write(checkpoints, ended, shard, now, handoff=False):
+    # Checkpoints come as (game_id, bots, state) tuples, building the model
+    # instances is left to the writer thread
+    checkpoints = [
+        GameCheckpoint(
+            game_id=game_id,
+            shard=shard,
+            bots=bots,
+            state=state,
+            handoff=handoff,
+            updated_at=now
+        )
+        for game_id, bots, state in checkpoints
+    ]
+    with transaction.atomic():
+        GameCheckpoint.objects.bulk_create(
+            checkpoints,
+            batch_size=BATCH_SIZE,
+            update_conflicts=True,
+            unique_fields=['game_id'],
+            update_fields=['shard', 'bots', 'state', 'handoff', 'updated_at']
+        )
+        if ended:
+            GameCheckpoint.objects.filter(game_id__in=ended).delete()
+
+
+def load(shard):
+    # Checkpoints left behind by the shard, claimed so no other shard takes
+    # over the games it handed off. Games whose result is already waiting
+    # in the outbox ended right before the shard went down.
+    with transaction.atomic():
+        checkpoints = list(
+            GameCheckpoint.objects
+            .select_for_update(skip_locked=True)
+            .filter(shard=shard)
+        )
+        ended = set(
+            PendingResult.objects
+            .filter(game_id__in=[saved.game_id for saved in checkpoints])
+            .values_list('game_id', flat=True)
+        )
+        if ended:
+            GameCheckpoint.objects.filter(game_id__in=ended).delete()
+        checkpoints = [
+            saved for saved in checkpoints if saved.game_id not in ended
+        ]
+        GameCheckpoint.objects.filter(
+            pk__in=[saved.pk for saved in checkpoints]
+        ).update(handoff=False)
+    return checkpoints
+
+
+def claim(game_id, shard):
+    # Checkpoint of a game handed off by a draining shard, None when there
+    # is none or another shard claimed it first
+    with transaction.atomic():
+        saved = (
+            GameCheckpoint.objects
+            .select_for_update(skip_locked=True)
+            .filter(game_id=game_id, handoff=True)
+            .first()
+        )
+        if saved:
+            saved.shard = shard
+            saved.handoff = False
+            saved.save(update_fields=['shard', 'handoff'])
+    return saved
+
+
+class Checkpointer:
+
+    writing = None
+    ended = set()
+
+    @classmethod
+    def save(cls, checkpoints):
+        # Returns the write task, None when there was nothing to write or
+        # the previous write is still running
+        if cls.writing and not cls.writing.done():
+            metrics.increment('checkpoints_skipped')
+            return None
+        if not checkpoints and not cls.ended:
+            return None
+        ended = list(cls.ended)
+        cls.ended.clear()
+        cls.writing = asyncio.create_task(cls.write(checkpoints, ended))
+        return cls.writing
+
+    @classmethod
+    async def write(cls, checkpoints, ended):
+        try:
+            await database_sync_to_async(write)(
+                checkpoints, ended, settings.SHARD, timezone.now()
+            )
+            metrics.increment('checkpoints', len(checkpoints))
+        except Exception as e:
+            logger.error(
+                f'Failed to write {len(checkpoints)} checkpoints [{e}]'
+            )
+            # Deleted with the next batch instead
+            cls.ended.update(ended)
+
+    @classmethod
+    def discard(cls, game_id):
+        cls.ended.add(game_id)
@@ -1,17 +1,28 @@
 import asyncio
-import http.client
+import contextvars
 import json
 import logging
 import logging.config
-import ssl
+import math
 import time
 import urllib.parse
 import uuid
+from datetime import timedelta
 
-from asgiref.sync import sync_to_async
+from channels.db import database_sync_to_async
 from channels.generic.websocket import AsyncWebsocketConsumer
 from django.conf import settings
+from django.utils import timezone
+from . import bot
+from . import checkpoint
+from . import protocol
+from .batch import BatchPhysics
+from .checkpoint import Checkpointer
 from .game import GameLogic
+from .metrics import metrics
+from .models import Replay
+from .outbox import ResultOutbox
+from .replay import ReplayRecorder
 
 
 PITCH_WIDTH = 480       # Pixels
@@ -26,9 +37,50 @@ PADDLE_MOVES = 300      # Pixels per second
 PADDLE_AMPLITUDE = 60   # Degrees
 PAUSE_TIME = 1.5        # Seconds
 UPDATE_TIME = 0.03      # Seconds
+TIME_STEP = 0.01        # Seconds
+MAX_STEPS = 10          # Physics steps per update
+SWEPT_COLLISIONS = True  # Resolve collisions at their time of impact
+REPORT_TIME = 1         # Seconds
+
+# Matches are updated every few scheduler ticks depending on their phase,
+# and every phase is slowed down together while the server is loaded
+TICK_TIME = 0.015       # Seconds
+NEAR_PADDLE_TICKS = 1   # Ball about to reach a goal line
+PLAY_TICKS = round(UPDATE_TIME / TICK_TIME)
+SLOW_TICKS = 3          # Ball slower than SLOW_BALL
+PAUSE_TICKS = 6         # After a goal
+MAX_TICKS = int(TIME_STEP * MAX_STEPS / TICK_TIME)  # Catch-up limit
+NEAR_PADDLE_TIME = 0.15  # Seconds
+SLOW_BALL = 300         # Pixels per second
+MAX_BACKOFF = 3
+HIGH_LOAD = 0.75        # Share of TICK_TIME spent ticking or late
+LOW_LOAD = 0.25
+# Spectators may ask for fewer frames, rounded down to one of these rates
+SPECTATOR_RATES = [15, 10, 5, 2, 1]  # Frames per second
 FORFEIT_TIME = int(settings.GAME_CONNECTION_TIMEOUT)
+DRAIN_POLL_TIME = 0.5   # Seconds
+REDIRECT_DELAY = 1      # Seconds before redirected clients reconnect
+RETRY_AFTER = 2         # Seconds before asking a full shard again
 MAX_POINTS = 3
 
+GAME_CONFIG = {
+    'pitch_width': PITCH_WIDTH,
+    'pitch_height': PITCH_HEIGHT,
+    'ball_size': BALL_SIZE,
+    'ball_speed': BALL_MOVES,
+    'start_amplitude': START_AMPLITUDE,
+    'paddle_size': PADDLE_SIZE,
+    'paddle_speed': PADDLE_MOVES,
+    'paddle_amplitude': PADDLE_AMPLITUDE,
+    'pause_duration': PAUSE_TIME,
+    'max_points': MAX_POINTS,
+    'accelerator': ACCELERATOR,
+    'max_acceleration': MAX_ACCELERATION,
+    'time_step': TIME_STEP,
+    'max_steps': MAX_STEPS,
+    'swept_collisions': SWEPT_COLLISIONS,
+}
+
 logging.config.dictConfig(settings.LOGGING)
 logger = logging.getLogger('game-service')
 
@@ -36,9 +88,11 @@ logger = logging.getLogger('game-service')
 class GamePlayerConsumer(AsyncWebsocketConsumer):
 
     participants = {}
+    spectating = None
     games = {}
     games_lock = asyncio.Lock()
     clean_loop_started = asyncio.Event()
+    draining = False
 
     async def connect(self):
         self.game_id = self.scope['url_route']['kwargs'].get('game_id')
@@ -47,20 +101,58 @@ class GamePlayerConsumer(AsyncWebsocketConsumer):
         player_side = params.get('position', [''])[0]
         up_key = params.get('up', ['ArrowUp'])[0]
         down_key = params.get('down', ['ArrowDown'])[0]
+        self.frame_format = params.get('format', [protocol.JSON])[0]
+        if self.frame_format not in protocol.FORMATS:
+            self.frame_format = protocol.JSON
+        role = params.get('role', ['player'])[0]
 
         game = self.get_game(self.game_id)
+        if not game and not self.draining:
+            game = await self.adopt_game(self.game_id)
         if not game:
             return
-        await self.add_participant(game, player_side, up_key, down_key)
+        if role == 'spectator':
+            await self.add_spectator(game, params.get('rate', [None])[0])
+        else:
+            await self.add_participant(game, player_side, up_key, down_key)
 
     @classmethod
     async def create_game(cls, game_id):
+        # Returns the game, None when the shard is too busy for a new one
         await cls.start_clean_loop()
+        await ResultOutbox.start_loop()
         if game_id not in cls.games:
+            if cls.is_full():
+                metrics.increment('games_rejected')
+                logger.warning(
+                    f'Refused game {game_id}, '
+                    f'{cls.active_games()} games running'
+                )
+                return None
             cls.games[game_id] = Game(game_id)
             logger.debug(f'Game created for game_id {game_id}')
         else:
             logger.debug(f'Game {game_id} already exists')
+        return cls.games[game_id]
+
+    @classmethod
+    def active_games(cls):
+        # Ended games stay in games until the clean loop drops them
+        return sum(
+            game.status != 'game_ended' for game in cls.games.values()
+        )
+
+    @classmethod
+    def is_full(cls):
+        # Full at MAX_GAMES, or when the tick loop is overloaded even with
+        # its matches updated as rarely as they can be
+        return (
+            cls.active_games() >= settings.MAX_GAMES
+            or (
+                TickScheduler.backoff >= MAX_BACKOFF
+                and TickScheduler.load > HIGH_LOAD
+            )
+        )
 
     async def add_participant(self, game, player_side, up_key, down_key):
         self.id = str(uuid.uuid4())
@@ -70,7 +162,8 @@ class GamePlayerConsumer(AsyncWebsocketConsumer):
             up_key,
             down_key,
             self.channel_layer,
-            self.channel_name)
+            self.channel_name,
+            self.frame_format)
         logger.info(
             f'{player_side} player connected to game (ID: {self.game_id}) '
             f'with {up_key} for up and {down_key} for down '
@@ -83,7 +176,31 @@ class GamePlayerConsumer(AsyncWebsocketConsumer):
             self.group_name, self.channel_name
         )
 
+    async def add_spectator(self, game, rate):
+        self.id = str(uuid.uuid4())
+        await self.accept()
+        self.spectating = await game.add_spectator(
+            self.channel_layer,
+            self.channel_name,
+            self.frame_format,
+            spectator_rate(rate)
+        )
+        logger.info(
+            f'Spectator connected to game (ID: {self.game_id}) '
+            f'[{self.scope["client"][0]}:{self.scope["client"][1]}]'
+        )
+
     async def disconnect(self, close_code):
+        if self.spectating:
+            await self.channel_layer.group_discard(
+                self.spectating, self.channel_name
+            )
+            if self.game_id in self.games:
+                self.games[self.game_id].remove_spectator(
+                    self.spectating, self.channel_name
+                )
+            return
+
         logger.info(
             f'Player disconnected from game (ID: {self.game_id}) '
             f'[{self.scope["client"][0]}:{self.scope["client"][1]}] '
@@ -98,39 +215,79 @@ class GamePlayerConsumer(AsyncWebsocketConsumer):
             self.games[self.game_id].disconnect_player(self.id)
 
     async def receive(self, text_data):
+        # Clients only send key events and keyframe requests
         text_data_json = json.loads(text_data)
 
-        await self.channel_layer.group_send(
-            self.group_name, {
-                'type': text_data_json['messageType'],
-                'id': self.id,
-                **text_data_json
-            }
-        )
+        # Spectators only ever ask for a keyframe of their delta stream
+        if self.spectating:
+            game = self.games.get(self.game_id)
+            if (
+                game
+                and text_data_json['messageType'] == 'keyframe_request'
+                and self.spectating in game.spectators
+            ):
+                game.spectators[self.spectating].request_keyframe()
+            return
 
-    # Handle message from websocket
-    @classmethod
-    async def key_event_message(self, event):
-        for game_id in self.games:
-            self.games[game_id].key_event(event)
+        # Key events go straight to the player's game, without a round
+        # trip through the channel layer
+        if text_data_json['messageType'] == 'key_event_message':
+            participant = self.participants.get(self.id)
+            if participant:
+                game, side = participant
+                game.key_event(
+                    side,
+                    text_data_json.get('key'),
+                    text_data_json.get('event')
+                )
+            return
+        if text_data_json['messageType'] == 'keyframe_request':
+            participant = self.participants.get(self.id)
+            if participant:
+                game, _ = participant
+                game.delta.request_keyframe()
+            return
+
+        # Anything else would reach the handlers meant for server messages
+        logger.debug(
+            f'Dropped {text_data_json.get("messageType")} message '
+            f'from game (ID: {self.game_id})'
+        )
 
     async def connection_message(self, event):
-        await self.send(text_data=json.dumps(event))
+        await self.send_frame(event)
 
     async def initial_message(self, event):
-        await self.send(text_data=json.dumps(event))
+        await self.send_frame(event)
 
     async def update_message(self, event):
-        await self.send(text_data=json.dumps(event))
+        await self.send_frame(event)
 
     async def endgame_message(self, event):
-        await self.send(text_data=json.dumps(event))
+        await self.send_frame(event)
+
+    async def redirect_message(self, event):
+        # The game moved to another shard, the client connects again after
+        # the delay in the message
+        await self.send_frame(event)
+        await self.close()
+
+    async def send_frame(self, event):
+        # Game frames arrive already encoded, see Game.notify_players()
+        if 'bytes' in event:
+            await self.send(bytes_data=event['bytes'])
+        elif 'text' in event:
+            await self.send(text_data=event['text'])
+        else:
+            await self.send(text_data=json.dumps(event))
 
     @classmethod
     async def start_clean_loop(cls):
         if not cls.clean_loop_started.is_set():
             cls.clean_loop_started.set()
-            asyncio.create_task(cls.clean_loop())
+            asyncio.create_task(
+                cls.clean_loop(), context=contextvars.Context()
+            )
         else:
             return
 
@@ -147,6 +304,97 @@ class GamePlayerConsumer(AsyncWebsocketConsumer):
                 logger.debug(f'Deleted game {game_id}')
             await asyncio.sleep(1)
 
+    @classmethod
+    async def recover(cls):
+        # Brings back the games the shard was running when it went down.
+        # They wait for their players again and resume from their last
+        # checkpoint, or are forfeited like any other game that waited too
+        # long. Checkpoints older than that are forfeited right away.
+        try:
+            checkpoints = await database_sync_to_async(checkpoint.load)(
+                settings.SHARD
+            )
+        except Exception as e:
+            logger.error(f'Failed to load checkpoints [{e}]')
+            return
+        expired = timezone.now() - timedelta(seconds=FORFEIT_TIME)
+        for saved in checkpoints:
+            if saved.game_id in cls.games:
+                continue
+            game = cls.games[saved.game_id] = Game(saved.game_id)
+            await game.restore(saved, saved.updated_at < expired)
+        if checkpoints:
+            logger.info(f'Recovered {len(checkpoints)} interrupted games')
+
+    @classmethod
+    async def adopt_game(cls, game_id):
+        # Takes over a game handed off by a draining shard when one of its
+        # clients reaches this shard first
+        async with cls.games_lock:
+            if game_id in cls.games:
+                return cls.games[game_id]
+            try:
+                saved = await database_sync_to_async(checkpoint.claim)(
+                    game_id, settings.SHARD
+                )
+            except Exception as e:
+                logger.error(f'Failed to claim game {game_id} [{e}]')
+                return None
+            if not saved:
+                return None
+            game = cls.games[game_id] = Game(game_id)
+        await cls.start_clean_loop()
+        await ResultOutbox.start_loop()
+        await game.restore(saved)
+        logger.info(f'Took over game {game_id}')
+        return game
+
+    @classmethod
+    async def drain(cls, timeout=settings.DRAIN_TIMEOUT):
+        # Stops taking new games and lets the running matches finish for up
+        # to timeout seconds. The games left are handed off through their
+        # checkpoints, their clients are redirected and reach either this
+        # shard restarted, which recovers them, or another shard, which
+        # adopts them.
+        cls.draining = True
+        logger.info(f'Draining {len(cls.games)} games')
+        deadline = time.monotonic() + timeout
+        while TickScheduler.games and time.monotonic() < deadline:
+            await asyncio.sleep(DRAIN_POLL_TIME)
+        await cls.hand_off([
+            game for game in list(cls.games.values())
+            if game.status in [
+                'created', 'waiting_for_players', 'game_started'
+            ]
+        ])
+
+    @classmethod
+    async def hand_off(cls, games):
+        if not games:
+            return
+        # Running games are frozen until their checkpoint is written, they
+        # go on here if it cannot be
+        for game in games:
+            game.handing_off = True
+        if Checkpointer.writing:
+            await Checkpointer.writing
+        try:
+            await database_sync_to_async(checkpoint.write)(
+                [game.checkpoint() for game in games],
+                [],
+                settings.SHARD,
+                timezone.now(),
+                True
+            )
+        except Exception as e:
+            logger.error(f'Failed to hand off {len(games)} games [{e}]')
+            for game in games:
+                game.handing_off = False
+            return
+        for game in games:
+            await game.hand_off()
+        logger.info(f'Handed off {len(games)} games')
+
     @classmethod
     def get_game(cls, game_id):
         if game_id in cls.games:
@@ -155,6 +403,184 @@ class GamePlayerConsumer(AsyncWebsocketConsumer):
             return None
 
 
+class TickScheduler:
+
+    games = {}
+    loop_started = asyncio.Event()
+    physics = BatchPhysics() if settings.BATCH_PHYSICS else None
+    tick_games = 0
+    tick_duration = 0
+    backoff = 1
+    load = 0
+    lag = 0
+
+    @classmethod
+    async def start_loop(cls):
+        if not cls.loop_started.is_set():
+            cls.loop_started.set()
+            asyncio.create_task(cls.loop(), context=contextvars.Context())
+
+    @classmethod
+    async def run(cls, game):
+        await cls.start_loop()
+        if cls.physics is not None:
+            cls.physics.add(game.game_logic)
+        cls.games[game.id] = game
+        await game.stopped.wait()
+
+    @classmethod
+    async def loop(cls):
+        clock = asyncio.get_running_loop().time
+        next_tick = clock()
+        report_ticks = max(1, round(REPORT_TIME / TICK_TIME))
+        report_duration = 0
+        report_max_duration = 0
+        report_games = 0
+        report_late = 0
+        checkpoint_ticks = round(checkpoint.CHECKPOINT_TIME / TICK_TIME)
+        ticks = 0
+        while True:
+            # A failing tick or report must not stop every game of the
+            # shard, the next tick runs as planned
+            try:
+                await cls.tick()
+                ticks += 1
+                report_games = max(report_games, cls.tick_games)
+                report_duration += cls.tick_duration
+                report_max_duration = max(
+                    report_max_duration, cls.tick_duration
+                )
+                if ticks % report_ticks == 0:
+                    cls.load = (
+                        (report_duration + report_late)
+                        / (report_ticks * TICK_TIME)
+                    )
+                    cls.lag = report_late / report_ticks
+                    cls.adjust_backoff(cls.load)
+                    if report_games:
+                        average = report_duration / report_ticks
+                        logger.debug(
+                            f'Ticked up to {report_games} games over '
+                            f'{report_ticks} ticks '
+                            f'(avg {average * 1000:.2f} ms, '
+                            f'max {report_max_duration * 1000:.2f} ms)'
+                        )
+                    report_duration = 0
+                    report_max_duration = 0
+                    report_games = 0
+                    report_late = 0
+                if ticks % checkpoint_ticks == 0:
+                    cls.checkpoint()
+            except Exception as e:
+                logger.error(f'Failed to tick games [{e}]')
+                metrics.increment('update_errors')
+
+            # Ticks stay aligned on multiples of TICK_TIME: an overrun
+            # skips the boundaries it missed instead of drifting
+            next_tick += TICK_TIME
+            now = clock()
+            if now > next_tick:
+                next_tick += (
+                    math.floor((now - next_tick) / TICK_TIME) + 1
+                ) * TICK_TIME
+            await asyncio.sleep(next_tick - now)
+            late = max(0, clock() - next_tick)
+            report_late += late
+            metrics.observe('tick_lag', late)
+
+    @classmethod
+    def checkpoint(cls):
+        start = time.perf_counter()
+        task = Checkpointer.save([
+            game.checkpoint() for game in cls.games.values()
+            if game.status == 'game_started' and not game.handing_off
+        ])
+        metrics.observe('checkpoint_time', time.perf_counter() - start)
+        return task
+
+    @classmethod
+    def simulate(cls, games):
+        # Steps the matches due this tick, bots acting first. Simulation
+        # time is observed once per tick with either engine.
+        for game in games:
+            try:
+                game.act_bots()
+            except Exception as e:
+                cls.fail(game, e)
+        games = [game for game in games if game.status == 'game_started']
+        if not games:
+            return
+        start = time.perf_counter()
+        if cls.physics is not None:
+            try:
+                cls.physics.update([game.game_logic for game in games])
+            except Exception as e:
+                # The batch state cannot tell which match broke it
+                for game in games:
+                    cls.fail(game, e)
+        else:
+            for game in games:
+                try:
+                    game.game_logic.update()
+                except Exception as e:
+                    cls.fail(game, e)
+        metrics.observe('simulation_time', time.perf_counter() - start)
+
+    @classmethod
+    def fail(cls, game, e):
+        logger.error(f'Failed to update game {game.id} [{e}]')
+        metrics.increment('update_errors')
+        game.status = 'game_over'
+
+    @classmethod
+    def adjust_backoff(cls, load):
+        if load > HIGH_LOAD and cls.backoff < MAX_BACKOFF:
+            cls.backoff += 1
+            logger.warning(
+                f'Tick load at {load:.0%}, '
+                f'updating matches {cls.backoff} times less often'
+            )
+        elif load < LOW_LOAD and cls.backoff > 1:
+            cls.backoff -= 1
+            logger.info(
+                f'Tick load at {load:.0%}, '
+                f'updating matches {cls.backoff} times less often'
+            )
+
+    @classmethod
+    async def tick(cls):
+        start = time.perf_counter()
+        games = list(cls.games.values())
+        due = []
+        for game in games:
+            game.ticks_left -= 1
+            if (
+                game.ticks_left <= 0
+                and game.status == 'game_started'
+                and not game.handing_off
+            ):
+                due.append(game)
+        cls.simulate(due)
+        for game in due:
+            if game.status != 'game_started':
+                continue
+            try:
+                await game.update()
+                game.ticks_left = game.update_interval(cls.backoff)
+            except Exception as e:
+                cls.fail(game, e)
+        for game in games:
+            if game.status != 'game_started':
+                del cls.games[game.id]
+                if cls.physics is not None:
+                    cls.physics.remove(game.game_logic)
+                game.stopped.set()
+        cls.tick_games = len(games)
+        cls.tick_duration = time.perf_counter() - start
+        metrics.increment('ticks')
+        metrics.observe('tick_duration', cls.tick_duration)
+
+
 class Game:
 
     def __init__(
@@ -163,19 +589,90 @@ class Game:
     ):
         self.id = id
         self.player = {}
+        self.spectators = {}
+        self.spectator_layer = None
         self.game_logic = None
+        self.recorder = None
+        self.restored = None
+        self.bots = {}
         self.status = 'created'
         self.player_lock = asyncio.Lock()
+        self.players_changed = asyncio.Event()
+        self.delta = protocol.DeltaEncoder()
+        self.stopped = asyncio.Event()
+        self.event_loop = None
+        self.ticks_left = 0
+        self.handing_off = False
 
     async def notify_players(self, message):
         async with self.player_lock:
-            for side in self.player:
-                player = self.player[side]
-                if player.channel_layer and player.channel:
-                    await player.channel_layer.send(
-                        player.channel,
-                        message
+            recipients = [
+                (player.channel_layer, player.channel, player.frame_format)
+                for player in self.player.values()
+                if player.channel_layer and player.channel
+            ]
+        frames = {}
+        for channel_layer, channel, frame_format in recipients:
+            if frame_format not in frames:
+                if frame_format == protocol.DELTA:
+                    frames[frame_format] = self.delta.encode(message)
+                else:
+                    frames[frame_format] = protocol.encode(
+                        message, frame_format
                     )
+            frame = frames[frame_format]
+            await channel_layer.send(channel, frame)
+            self.count_frame(frame)
+        if self.spectators:
+            await self.notify_spectators(message, frames)
+
+    async def notify_spectators(self, message, frames):
+        # One frame and one group_send per group, however many spectators
+        # it has. Groups reuse the frames already encoded for the players.
+        now = time.monotonic()
+        for group in list(self.spectators.values()):
+            if not group.due(message, now):
+                continue
+            if group.delta:
+                frame = group.encode(message)
+            else:
+                if group.frame_format not in frames:
+                    frames[group.frame_format] = group.encode(message)
+                frame = frames[group.frame_format]
+            await self.spectator_layer.group_send(group.name, frame)
+            self.count_frame(frame)
+
+    def count_frame(self, frame):
+        size = len(frame.get('bytes') or frame['text'])
+        metrics.increment('frames')
+        metrics.increment('frame_bytes', size)
+        metrics.observe('frame_bytes', size)
+
+    async def add_spectator(self, channel_layer, channel, frame_format, rate):
+        name = f'spectate_{self.id}_{frame_format}_{rate}'
+        group = self.spectators.get(name)
+        if group is None:
+            group = self.spectators[name] = SpectatorGroup(
+                name, frame_format, rate
+            )
+        group.members.add(channel)
+        group.request_keyframe()
+        self.spectator_layer = channel_layer
+        await channel_layer.group_add(name, channel)
+        if self.game_logic:
+            await channel_layer.send(
+                channel,
+                protocol.encode(self.generate_init_message())
+            )
+        return name
+
+    def remove_spectator(self, name, channel):
+        group = self.spectators.get(name)
+        if group is None:
+            return
+        group.members.discard(channel)
+        if not group.members:
+            del self.spectators[name]
 
     def add_player(
         self,
@@ -184,7 +681,8 @@ class Game:
         up_key,
         down_key,
         channel_layer=None,
-        channel=None
+        channel=None,
+        frame_format=protocol.JSON
     ):
         if player_side in ['left', 'right'] and player_side not in self.player:
             self.player[player_side] = Participant(
@@ -193,121 +691,167 @@ class Game:
                 up_key,
                 down_key,
                 channel_layer,
-                channel
+                channel,
+                frame_format
             )
-            GamePlayerConsumer.participants[id] = self.player[player_side]
+            GamePlayerConsumer.participants[id] = (self, player_side)
+            if frame_format == protocol.DELTA:
+                self.delta.request_keyframe()
+            self.notify_players_changed()
+
+    def add_bot(self, side, level=bot.DEFAULT_LEVEL):
+        # The bot holds the side like a player without a connection
+        if side in ['left', 'right'] and side not in self.player:
+            self.bots[side] = bot.Bot(side, level)
+            self.add_player(str(uuid.uuid4()), side, 'ArrowUp', 'ArrowDown')
+
+    def remove_player(self, side):
+        GamePlayerConsumer.participants.pop(self.player[side].id, None)
+        del self.player[side]
+        self.bots.pop(side, None)
 
     def disconnect_player(self, player_id):
         for side in list(self.player.keys()):
             if player_id == self.player[side].id:
-                del self.player[side]
+                self.remove_player(side)
                 self.status = f'{side}_player_disconnected'
+                self.notify_players_changed()
+
+    def notify_players_changed(self):
+        # Players also join through the HTTP views, which run outside the
+        # event loop thread
+        if self.event_loop:
+            self.event_loop.call_soon_threadsafe(self.players_changed.set)
+        else:
+            self.players_changed.set()
 
     async def start(self):
         self.status = 'waiting_for_players'
         self.start_time = time.time()
-        asyncio.create_task(self.loop())
+        self.event_loop = asyncio.get_running_loop()
+        # Views start games through async_to_sync, whose context would tie
+        # every database_sync_to_async call of the task to the view's
+        # thread, long gone by then
+        asyncio.create_task(self.loop(), context=contextvars.Context())
 
     async def loop(self):
         while self.status == 'waiting_for_players':
             await self.wait()
-        while self.status == 'game_started':
-            await self.update()
-        await self.end()
+        if self.status == 'game_started':
+            await TickScheduler.run(self)
+        if self.status == 'game_handed_off':
+            await self.redirect()
+        else:
+            await self.end()
 
     async def wait(self):
-        if time.time() - self.start_time >= FORFEIT_TIME:
+        try:
+            await asyncio.wait_for(
+                self.players_changed.wait(),
+                FORFEIT_TIME - (time.time() - self.start_time)
+            )
+        except asyncio.TimeoutError:
             self.status = 'player_forfeited'
             return
+        self.players_changed.clear()
+        if self.status != 'waiting_for_players':
+            return
         if not ('left' in self.player and 'right' in self.player):
-            await asyncio.sleep(UPDATE_TIME * 0.01)
             return
         await self.notify_players(self.generate_init_message())
-        self.game_logic = GameLogic(
-            PITCH_WIDTH,
-            PITCH_HEIGHT,
-            BALL_SIZE,
-            BALL_MOVES,
-            START_AMPLITUDE,
-            PADDLE_SIZE,
-            PADDLE_MOVES,
-            PADDLE_AMPLITUDE,
-            PAUSE_TIME,
-            MAX_POINTS,
-            ACCELERATOR,
-            MAX_ACCELERATION
-        )
-        self.game_logic.start()
+        if self.restored:
+            # Restored games are not recorded, their replay would need the
+            # random generator state the checkpoint does not keep
+            checkpoint.resume(self.game_logic, self.restored)
+        else:
+            self.game_logic = GameLogic(**GAME_CONFIG)
+            self.game_logic.start()
+            self.recorder = ReplayRecorder(GAME_CONFIG, self.game_logic)
         self.status = 'game_started'
-        self.last_update = time.time() - UPDATE_TIME
+        metrics.increment('games_started')
+
+    def update_interval(self, backoff=1):
+        # Scheduler ticks until the next update
+        logic = self.game_logic
+        if logic.paused:
+            ticks = PAUSE_TICKS
+        elif logic.ball.time_to_goal_line(logic.pitch) < NEAR_PADDLE_TIME:
+            ticks = NEAR_PADDLE_TICKS
+        elif logic.ball.px_per_sec < SLOW_BALL:
+            ticks = SLOW_TICKS
+        else:
+            ticks = PLAY_TICKS
+        return min(ticks * backoff, MAX_TICKS)
+
+    def act_bots(self):
+        for side, player_bot in self.bots.items():
+            move = player_bot.act(self.game_logic)
+            if move:
+                self.move(side, move)
 
     async def update(self):
-        sleep_time = UPDATE_TIME - (time.time() - self.last_update)
-        if sleep_time > 0:
-            await asyncio.sleep(sleep_time)
-        self.last_update = time.time()
-        self.game_logic.update()
+        # Sends the match as TickScheduler.simulate() left it
+        start = time.perf_counter()
         try:
             await self.notify_players(self.generate_message('update_message'))
         except Exception as e:
             logger.error(f'Failed to notify players [{e}]')
+        metrics.observe('broadcast_time', time.perf_counter() - start)
+        metrics.increment('updates')
         if self.game_logic.finished:
             self.status = 'game_over'
 
+    async def restore(self, saved, expired=False):
+        if saved.state:
+            self.restored = saved.state
+            self.game_logic = checkpoint.restore(GAME_CONFIG, saved.state)
+        for side, level in saved.bots.items():
+            self.add_bot(side, level)
+        if expired:
+            self.status = 'player_forfeited'
+            asyncio.create_task(self.end())
+        else:
+            await self.start()
+
+    def checkpoint(self):
+        return (
+            self.id,
+            {side: player_bot.level for side, player_bot in self.bots.items()},
+            checkpoint.snapshot(self.game_logic) if self.game_logic else None
+        )
+
+    async def hand_off(self):
+        # Waiting and running games leave through their loop, the others
+        # have none
+        loop_running = self.status in ['waiting_for_players', 'game_started']
+        self.status = 'game_handed_off'
+        if loop_running:
+            self.notify_players_changed()
+        else:
+            await self.redirect()
+
+    async def redirect(self):
+        await self.notify_players({
+            'type': 'redirect_message',
+            'delay': REDIRECT_DELAY,
+        })
+        for side in list(self.player.keys()):
+            self.remove_player(side)
+        self.status = 'game_ended'
+
     async def end(self):
+        # Games recovered or taken over without a match state have a
+        # checkpoint as well
+        Checkpointer.discard(self.id)
         await self.submit_result()
+        await self.save_replay()
         await self.notify_players(self.generate_message('endgame_message'))
         for side in list(self.player.keys()):
-            del self.player[side]
+            self.remove_player(side)
         self.status = 'game_ended'
-
-    async def get_matchmaker_csrf_token(self):
-        context = ssl._create_unverified_context()
-        conn = http.client.HTTPSConnection(
-            'matchmaker-service',
-            8002,
-            context=context
-        )
-
-        try:
-            await sync_to_async(conn.request)('GET', '/get-csrf-token/')
-            response = await sync_to_async(conn.getresponse)()
-
-            if response.status == 200:
-                cookies = response.getheader('Set-Cookie')
-                csrf_token = json.loads(
-                    response.read().decode('utf-8')
-                )['csrfToken']
-                if not csrf_token:
-                    raise Exception('No CSRF token found in response')
-                return csrf_token, cookies
-            else:
-                raise Exception(
-                    'Failed to get CSRF token from matchmaker-service'
-                    f' {response.status} {response.reason}'
-                )
-        except Exception as e:
-            logger.error(f'{e}')
-        finally:
-            await sync_to_async(conn.close)()
-        return None
+        metrics.increment('games_ended')
 
     async def submit_result(self):
-        csrf_token, cookies = await self.get_matchmaker_csrf_token()
-
-        if not csrf_token or not cookies:
-            logger.error(
-                f'Failed to submit result of game {self.id}'
-                ' [No CSRF token or cookie]'
-            )
-            return
-
-        context = ssl._create_unverified_context()
-        conn = http.client.HTTPSConnection(
-            'matchmaker-service',
-            8002,
-            context=context
-        )
         left_score = 0
         right_score = 0
         if 'left' not in self.player and 'right' in self.player:
@@ -318,39 +862,26 @@ class Game:
             left_score = self.game_logic.player['left'].score
             right_score = self.game_logic.player['right'].score
 
-        payload = json.dumps({
+        payload = {
             'game_id': self.id,
             'left_score': left_score,
             'right_score': right_score,
             'status': self.status
-        })
-
-        headers = {
-            'Content-Type': 'application/json',
-            'X-CSRFToken': csrf_token,
-            'X-API-Key': settings.MATCHMAKER_SERVICE_API_KEY,
-            'Referer': 'https://game-service:8001/',
-            'Cookie': cookies
         }
 
+        await ResultOutbox.add(payload)
+
+    async def save_replay(self):
+        if not self.recorder:
+            return
+        data = self.recorder.finish(self.game_logic)
         try:
-            await sync_to_async(conn.request)(
-                'POST',
-                '/api/games/result/',
-                body=payload,
-                headers=headers
+            await database_sync_to_async(Replay.objects.update_or_create)(
+                game_id=self.id,
+                defaults={'data': data}
             )
-            response = await sync_to_async(conn.getresponse)()
-
-            if response.status != 200:
-                logger.error(
-                    f'Failed to submit result of game {self.id}'
-                    f' {response.status} {response.reason}'
-                )
         except Exception as e:
-            logger.error(f'{e}')
-        finally:
-            await sync_to_async(conn.close)()
+            logger.error(f'Failed to save replay of game {self.id} [{e}]')
 
     def generate_init_message(self):
         return {
@@ -383,19 +914,65 @@ class Game:
             'status': self.status,
         }
 
-    def key_event(self, event):
-        player = None
-        for side in self.player:
-            if event['id'] == self.player[side].id:
-                player = self.player[side]
-        if not player:
+    def key_event(self, side, key, event):
+        player = self.player.get(side)
+        if not player or not self.game_logic:
             return
-        key = event['key']
         keyname = player.key_to_action.get(key, '')
-        side = player.side
-        suffix = '_off' if event.get('event') == 'keyup' else ''
-        if self.game_logic:
-            self.game_logic.trigger_move(side, keyname + suffix)
+        suffix = '_off' if event == 'keyup' else ''
+        self.move(side, keyname + suffix)
+
+    def move(self, side, move):
+        self.game_logic.trigger_move(side, move)
+        if self.recorder:
+            self.recorder.record(self.game_logic.steps, side, move)
+
+
+class SpectatorGroup:
+    # Spectators of a game sharing a frame format and a rate. A rate of 0
+    # follows every update of the game.
+
+    def __init__(self, name, frame_format, rate):
+        self.name = name
+        self.frame_format = frame_format
+        self.interval = 1 / rate if rate else 0
+        self.next_frame = 0
+        self.delta = (
+            protocol.DeltaEncoder() if frame_format == protocol.DELTA
+            else None
+        )
+        self.members = set()
+
+    def request_keyframe(self):
+        if self.delta:
+            self.delta.request_keyframe()
+
+    def due(self, message, now):
+        if message['type'] != 'update_message' or not self.interval:
+            return True
+        if now < self.next_frame:
+            return False
+        # Keep the average rate without bursting after a long pause
+        self.next_frame += self.interval
+        if self.next_frame <= now:
+            self.next_frame = now + self.interval
+        return True
+
+    def encode(self, message):
+        if self.delta:
+            return self.delta.encode(message)
+        return protocol.encode(message, self.frame_format)
+
+
+def spectator_rate(rate):
+    try:
+        rate = float(rate)
+    except (TypeError, ValueError):
+        return 0
+    for allowed in SPECTATOR_RATES:
+        if rate >= allowed:
+            return allowed if rate < 1 / UPDATE_TIME else 0
+    return SPECTATOR_RATES[-1]
 
 
 class Participant:
@@ -406,11 +983,13 @@ class Participant:
         key_up,
         key_down,
         channel_layer=None,
-        channel=None
+        channel=None,
+        frame_format=protocol.JSON
     ):
         self.id = id
         self.channel_layer = channel_layer
         self.channel = channel
+        self.frame_format = frame_format
         self.key_to_action = {
                 key_up: 'up',
                 key_down: 'down',
@@ -3,32 +3,31 @@ import random
 import time
 
 
+IMPACT_EPSILON = 1e-6   # Pixels
+MAX_IMPACTS = 10        # Per simulation step
+
+
 class Rectangle:
+    __slots__ = ('left', 'top', 'width', 'height', 'right', 'bottom')
+
     def __init__(self, left, top, width, height):
-        self.left = left
-        self.top = top
         self.width = width
         self.height = height
-        self.compute_rectangle()
-
-    def compute_rectangle(self):
-        self.right = self.left + self.width - 1
-        self.bottom = self.top + self.height - 1
+        self.move_at(left, top)
 
+    # right and bottom are kept up to date by every move, left and top are
+    # only ever changed through them
     def move_of(self, d_x, d_y):
-        self.left += d_x
-        self.top += d_y
-        self.compute_rectangle()
+        self.move_at(self.left + d_x, self.top + d_y)
 
     def move_at(self, x, y):
         self.left = x
         self.top = y
-        self.compute_rectangle()
+        self.right = x + self.width - 1
+        self.bottom = y + self.height - 1
 
     def center_at(self, x, y):
-        self.left = x - (self.width / 2)
-        self.top = y - (self.height / 2)
-        self.compute_rectangle()
+        self.move_at(x - (self.width / 2), y - (self.height / 2))
 
     def get_center_x(self):
         return self.right - (self.width / 2)
@@ -38,6 +37,16 @@ class Rectangle:
 
 
 class MovingRectangle(Rectangle):
+    __slots__ = (
+        'px_per_sec',
+        'px_per_sec_orig',
+        'px_per_sec_max',
+        'accelerate_factor_per_sec',
+        'angle',
+        'd_x',
+        'd_y',
+    )
+
     def __init__(
         self,
         left,
@@ -56,20 +65,30 @@ class MovingRectangle(Rectangle):
         if not self.px_per_sec_max:
             self.px_per_sec_max = px_per_sec
         self.accelerate_factor_per_sec = accelerate_factor_per_sec
+        self.set_angle(angle)
+
+    # The (d_x, d_y) unit vector is only recomputed when the direction
+    # changes, never while moving
+    def set_angle(self, angle):
         self.angle = angle
+        self.d_x = math.cos(math.radians(angle))
+        self.d_y = math.sin(math.radians(angle))
 
-    def update_position(self, elapsed_time):
+    def accelerate(self, elapsed_time):
         if self.accelerate_factor_per_sec:
             acceleration = self.accelerate_factor_per_sec * elapsed_time
             self.px_per_sec = self.px_per_sec + acceleration
             if self.px_per_sec > self.px_per_sec_max:
                 self.px_per_sec = self.px_per_sec_max
 
+    def velocity(self):
+        return self.d_x * self.px_per_sec, self.d_y * self.px_per_sec
+
+    def update_position(self, elapsed_time):
+        self.accelerate(elapsed_time)
         self.move_of(
-            (math.cos(math.radians(self.angle))
-                * self.px_per_sec * elapsed_time),
-            (math.sin(math.radians(self.angle))
-                * self.px_per_sec * elapsed_time)
+            self.d_x * self.px_per_sec * elapsed_time,
+            self.d_y * self.px_per_sec * elapsed_time
         )
 
     def reset(self):
@@ -77,8 +96,11 @@ class MovingRectangle(Rectangle):
 
 
 class Paddle(MovingRectangle):
+    __slots__ = ('right_sided', 'amplitude', 'speed')
+
     def __init__(self, height, right_sided, speed, amplitude, pitch):
         super().__init__(0, 0, 1, height, 0, 90)
+        self.d_x, self.d_y = 0.0, 1.0
         self.right_sided = right_sided
         self.amplitude = amplitude
         self.speed = speed
@@ -98,10 +120,12 @@ class Paddle(MovingRectangle):
     def set_move_down(self):
         self.px_per_sec = self.speed
         self.angle = 90
+        self.d_x, self.d_y = 0.0, 1.0
 
     def set_move_up(self):
         self.px_per_sec = self.speed
         self.angle = 270
+        self.d_x, self.d_y = 0.0, -1.0
 
     def set_move_down_off(self):
         if self.angle == 90:
@@ -113,6 +137,8 @@ class Paddle(MovingRectangle):
 
 
 class Ball(MovingRectangle):
+    __slots__ = ('start_amplitude', 'rng', 'engage_left')
+
     def __init__(
         self,
         pitch,
@@ -120,7 +146,8 @@ class Ball(MovingRectangle):
         px_per_sec,
         start_amplitude,
         accelerate_factor_per_sec=None,
-        px_per_sec_max=None
+        px_per_sec_max=None,
+        rng=random
     ):
         super().__init__(
             0,
@@ -133,7 +160,8 @@ class Ball(MovingRectangle):
             px_per_sec_max
         )
         self.start_amplitude = start_amplitude
-        self.engage_left = random.choice([True, False])
+        self.rng = rng
+        self.engage_left = self.rng.choice([True, False])
         self.reset(pitch)
 
     def update_position(self, elapsed_time, pitch):
@@ -147,20 +175,68 @@ class Ball(MovingRectangle):
         if self.right > pitch.right:
             self.move_at(pitch.width - self.width, self.top)
 
+    def time_of_impact(self, pitch):
+        d_x, d_y = self.velocity()
+        time_of_impact = math.inf
+        if d_x < 0:
+            time_of_impact = (pitch.left - self.left) / d_x
+        elif d_x > 0:
+            time_of_impact = (pitch.right - self.right) / d_x
+        if d_y < 0:
+            time_of_impact = min(
+                time_of_impact, (pitch.top - self.top) / d_y
+            )
+        elif d_y > 0:
+            time_of_impact = min(
+                time_of_impact, (pitch.bottom - self.bottom) / d_y
+            )
+        return max(time_of_impact, 0)
+
+    def time_to_goal_line(self, pitch):
+        d_x = self.d_x * self.px_per_sec
+        if d_x < 0:
+            return (pitch.left - self.left) / d_x
+        if d_x > 0:
+            return (pitch.right - self.right) / d_x
+        return math.inf
+
+    def sweep_position(self, elapsed_time, pitch):
+        self.move_of(
+            self.d_x * self.px_per_sec * elapsed_time,
+            self.d_y * self.px_per_sec * elapsed_time
+        )
+        # Land exactly on the walls or goal lines reached
+        if self.top < pitch.top + IMPACT_EPSILON:
+            self.move_at(self.left, pitch.top)
+        if self.bottom > pitch.bottom - IMPACT_EPSILON:
+            self.move_at(self.left, pitch.height - self.height)
+        if self.left < pitch.left + IMPACT_EPSILON:
+            self.move_at(pitch.left, self.top)
+        if self.right > pitch.right - IMPACT_EPSILON:
+            self.move_at(pitch.width - self.width, self.top)
+
     def reset(self, pitch):
         super().reset()
         self.center_at(pitch.get_center_x(), pitch.get_center_y())
         self.engage_left = not self.engage_left
-        self.angle = random.randint(
+        angle = self.rng.randint(
             -self.start_amplitude,
             self.start_amplitude
         )
         if self.engage_left:
-            self.angle = (180 - self.angle) % 360
+            angle = (180 - angle) % 360
+        self.set_angle(angle)
 
     def handle_wall_collisions(self, pitch):
         if self.top == pitch.top or self.bottom == pitch.bottom:
-            self.angle = (360 - self.angle) % 360
+            self.set_angle((360 - self.angle) % 360)
+
+    def handle_wall_impacts(self, pitch):
+        if (
+            (self.top == pitch.top and self.d_y < 0) or
+            (self.bottom == pitch.bottom and self.d_y > 0)
+        ):
+            self.set_angle((360 - self.angle) % 360)
 
     def handle_paddle_collision(self, paddle):
         size = self.height + paddle.height + 1
@@ -168,10 +244,12 @@ class Ball(MovingRectangle):
         angle = (distance / (size / 2) * paddle.amplitude)
         if paddle.right_sided:
             angle = 180 - angle
-        self.angle = angle % 360
+        self.set_angle(angle % 360)
 
 
 class Player:
+    __slots__ = ('score', 'side', 'paddle', 'goal')
+
     def __init__(
         self,
         side,
@@ -213,15 +291,24 @@ class Player:
         return False
 
 
+MOVE_ACTIONS = {
+    'up': Paddle.set_move_up,
+    'down': Paddle.set_move_down,
+    'up_off': Paddle.set_move_up_off,
+    'down_off': Paddle.set_move_down_off
+}
+
+
 class Chrono:
-    def __init__(self):
-        self.start_time = time.time()
+    def __init__(self, clock=None):
+        self.clock = clock or time.time
+        self.start_time = self.clock()
 
     def get_time(self):
-        return time.time() - self.start_time
+        return self.clock() - self.start_time
 
     def reinit(self):
-        self.start_time = time.time()
+        self.start_time = self.clock()
 
 
 class GameLogic:
@@ -239,12 +326,23 @@ class GameLogic:
         pause_duration,
         max_points,
         accelerator,
-        max_acceleration
+        max_acceleration,
+        time_step=None,
+        max_steps=1,
+        seed=None,
+        swept_collisions=False,
+        clock=None
     ):
         self.finished = False
         self.paused = False
         self.pause_duration = pause_duration
         self.max_points = max_points
+        self.time_step = time_step
+        self.max_steps = max_steps
+        self.swept_collisions = swept_collisions
+        self.clock = clock
+        self.seed = seed if seed is not None else random.getrandbits(32)
+        self.random = random.Random(self.seed)
         self.pitch = Rectangle(0, 0, pitch_width, pitch_height)
         self.ball = Ball(
             self.pitch,
@@ -252,7 +350,8 @@ class GameLogic:
             ball_speed,
             start_amplitude,
             accelerator,
-            max_acceleration
+            max_acceleration,
+            self.random
         )
         self.player = {
             'left': Player(
@@ -272,8 +371,11 @@ class GameLogic:
         }
 
     def start(self):
-        self.chrono = Chrono()
+        self.chrono = Chrono(self.clock)
         self.last_update = self.chrono.get_time()
+        self.time = self.last_update
+        self.accumulator = 0
+        self.steps = 0
         self.trigger_pause()
 
     def update(self):
@@ -281,17 +383,85 @@ class GameLogic:
         elapsed_time = current_time - self.last_update
         self.last_update = current_time
 
+        if not self.time_step:
+            self.time = current_time
+            self.step(elapsed_time)
+            return
+
+        # Fixed timestep: simulate the elapsed time in equal steps, at most
+        # max_steps per update, and drop the backlog beyond that
+        self.accumulator += elapsed_time
+        steps = 0
+        while self.accumulator >= self.time_step and steps < self.max_steps:
+            self.time += self.time_step
+            self.step(self.time_step)
+            self.accumulator -= self.time_step
+            steps += 1
+        if self.accumulator >= self.time_step:
+            self.accumulator %= self.time_step
+
+    def step(self, elapsed_time):
+        self.steps += 1
         self.check_finish()
-        if not self.finished:
-            for side in ['left', 'right']:
-                self.player[side].paddle.update_position(
-                    elapsed_time,
-                    self.pitch
-                )
+        if self.finished:
+            return
+        if self.swept_collisions:
             self.check_pause()
-            if not self.paused:
-                self.ball.update_position(elapsed_time, self.pitch)
-                self.handle_collisions()
+            if self.paused:
+                self.move_paddles(elapsed_time)
+            else:
+                self.sweep(elapsed_time)
+            return
+        self.move_paddles(elapsed_time)
+        self.check_pause()
+        if not self.paused:
+            self.ball.update_position(elapsed_time, self.pitch)
+            self.handle_collisions()
+
+    def move_paddles(self, elapsed_time):
+        for side in ['left', 'right']:
+            self.player[side].paddle.update_position(
+                elapsed_time,
+                self.pitch
+            )
+
+    def sweep(self, elapsed_time):
+        # Advance ball and paddles together from one impact to the next, so
+        # collisions are resolved where they happen within the step
+        self.ball.accelerate(elapsed_time)
+        remaining = elapsed_time
+        impacts = 0
+        while remaining > 0 and impacts < MAX_IMPACTS:
+            time_of_impact = min(
+                self.ball.time_of_impact(self.pitch),
+                remaining
+            )
+            self.move_paddles(time_of_impact)
+            self.ball.sweep_position(time_of_impact, self.pitch)
+            remaining -= time_of_impact
+            impacts += 1
+            if self.handle_impacts():
+                self.trigger_pause()
+                break
+        if remaining > 0:
+            self.move_paddles(remaining)
+
+    def handle_impacts(self):
+        if (
+            self.player['left'].check_goal(
+                self.ball,
+                self.pitch,
+                self.player['right']
+            ) or
+            self.player['right'].check_goal(
+                self.ball,
+                self.pitch,
+                self.player['left']
+            )
+        ):
+            return True
+        self.ball.handle_wall_impacts(self.pitch)
+        return False
 
     def handle_collisions(self):
         self.ball.handle_wall_collisions(self.pitch)
@@ -310,26 +480,19 @@ class GameLogic:
             self.trigger_pause()
 
     def trigger_move(self, side, move):
-        if side not in {'left', 'right'}:
-            return
-        paddle = self.player[side].paddle
-        move_actions = {
-            'up': paddle.set_move_up,
-            'down': paddle.set_move_down,
-            'up_off': paddle.set_move_up_off,
-            'down_off': paddle.set_move_down_off
-        }
-        if move in move_actions:
-            move_actions[move]()
+        player = self.player.get(side)
+        action = MOVE_ACTIONS.get(move)
+        if player and action:
+            action(player.paddle)
 
     def trigger_pause(self):
-        self.pause_start = self.chrono.get_time()
+        self.pause_start = self.time
         self.paused = True
 
     def check_pause(self):
         if (
             self.paused and
-            self.chrono.get_time() - self.pause_start >= self.pause_duration
+            self.time - self.pause_start >= self.pause_duration
         ):
             self.paused = False
 
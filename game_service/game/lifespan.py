@@ -0,0 +1,52 @@
+import asyncio
+import logging
+import signal
+
+
+logger = logging.getLogger('game-service')
+
+
+async def lifespan(scope, receive, send):
+    # ASGI lifespan events of the shard process. At startup the outbox
+    # delivers the results left over by the previous process, and the
+    # games it was running are recovered from their checkpoints. At
+    # shutdown the running games get a last checkpoint.
+    from .consumers import GamePlayerConsumer, TickScheduler
+    from .outbox import ResultOutbox
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            try:
+                await GamePlayerConsumer.start_clean_loop()
+                await ResultOutbox.start_loop()
+                await GamePlayerConsumer.recover()
+                asyncio.get_running_loop().add_signal_handler(
+                    signal.SIGUSR1,
+                    lambda: asyncio.create_task(drain(GamePlayerConsumer))
+                )
+            except Exception as e:
+                logger.error(f'Failed to start game-service [{e}]')
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            try:
+                task = TickScheduler.checkpoint()
+                if task:
+                    await task
+            except Exception as e:
+                logger.error(f'Failed to checkpoint games [{e}]')
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def drain(consumer):
+    # SIGUSR1 drains the shard, which then stops by itself, see the
+    # runshards command
+    if consumer.draining:
+        return
+    try:
+        await consumer.drain()
+        # Let the redirect messages go out
+        await asyncio.sleep(1)
+    except Exception as e:
+        logger.error(f'Failed to drain game-service [{e}]')
+    signal.raise_signal(signal.SIGTERM)
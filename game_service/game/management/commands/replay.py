@@ -0,0 +1,37 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from game.models import Replay
+from game.replay import parse, replay
+
+
+class Command(BaseCommand):
+    """Replay a recorded match on the headless engine."""
+
+    def add_arguments(self, parser):
+        parser.add_argument('game_id')
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+        try:
+            data = bytes(Replay.objects.get(game_id=options['game_id']).data)
+        except Replay.DoesNotExist:
+            raise CommandError(f'No replay for game {options["game_id"]}')
+
+        recorded = parse(data)
+        logic = replay(data)
+        scores = (
+            logic.player['left'].score,
+            logic.player['right'].score
+        )
+        self.stdout.write(json.dumps({
+            'game_id': options['game_id'],
+            'bytes': len(data),
+            'seed': recorded['seed'],
+            'steps': recorded['steps'],
+            'inputs': len(recorded['inputs']),
+            'recorded_scores': list(recorded['scores']),
+            'replayed_scores': list(scores),
+            'identical': scores == recorded['scores'],
+        }, indent=4))
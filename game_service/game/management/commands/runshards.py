@@ -0,0 +1,117 @@
+import os
+import signal
+import subprocess
+import sys
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+
+# Seconds a draining shard gets on top of GAME_DRAIN_TIMEOUT to hand its
+# games off and stop
+DRAIN_MARGIN = 10
+
+
+class Command(BaseCommand):
+    """Django command to run one uvicorn process per game shard.
+
+    SIGTERM drains every shard before stopping, SIGHUP drains and restarts
+    the shards one at a time. A drained shard hands its games off, their
+    clients reconnect to the shard taking them over.
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument('--shards', type=int, default=settings.SHARDS)
+        parser.add_argument('--host', default='0.0.0.0')
+        parser.add_argument(
+            '--port',
+            type=int,
+            default=8000,
+            help='Port of shard 0, shard N listens on port + N'
+        )
+        parser.add_argument('--ssl-keyfile')
+        parser.add_argument('--ssl-certfile')
+
+    def start_shard(self, shard, options):
+        command = [
+            sys.executable, '-m', 'uvicorn',
+            'game_service.asgi:application',
+            '--host', options['host'],
+            '--port', str(options['port'] + shard),
+        ]
+        if options['ssl_keyfile']:
+            command += ['--ssl-keyfile', options['ssl_keyfile']]
+        if options['ssl_certfile']:
+            command += ['--ssl-certfile', options['ssl_certfile']]
+        env = dict(
+            os.environ,
+            GAME_SHARD=str(shard),
+            GAME_SHARDS=str(options['shards'])
+        )
+        process = subprocess.Popen(command, env=env)
+        self.stdout.write(
+            f'Started shard {shard} on port {options["port"] + shard}'
+        )
+        return process
+
+    def drain_shard(self, process):
+        if process.poll() is None:
+            process.send_signal(signal.SIGUSR1)
+
+    def wait_drained(self, processes):
+        deadline = time.monotonic() + settings.DRAIN_TIMEOUT + DRAIN_MARGIN
+        while (
+            any(process.poll() is None for process in processes)
+            and time.monotonic() < deadline
+        ):
+            time.sleep(0.5)
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+        processes = [
+            self.start_shard(shard, options)
+            for shard in range(options['shards'])
+        ]
+        signals = []
+
+        def stop(signum, frame):
+            for process in processes:
+                if process.poll() is None:
+                    process.terminate()
+
+        signal.signal(signal.SIGTERM, lambda signum, frame: signals.append(
+            signal.SIGTERM
+        ))
+        signal.signal(signal.SIGHUP, lambda signum, frame: signals.append(
+            signal.SIGHUP
+        ))
+        signal.signal(signal.SIGINT, stop)
+
+        # A shard going down on its own takes its games with it, stop them
+        # all so the container gets restarted as a whole
+        while all(process.poll() is None for process in processes):
+            if signal.SIGTERM in signals:
+                self.stdout.write('Draining shards')
+                for process in processes:
+                    self.drain_shard(process)
+                self.wait_drained(processes)
+                break
+            if signal.SIGHUP in signals:
+                signals.remove(signal.SIGHUP)
+                for shard, process in enumerate(processes):
+                    if signal.SIGTERM in signals:
+                        break
+                    self.stdout.write(f'Restarting shard {shard}')
+                    self.drain_shard(process)
+                    self.wait_drained([process])
+                    if process.poll() is None:
+                        process.terminate()
+                    process.wait()
+                    processes[shard] = self.start_shard(shard, options)
+                continue
+            time.sleep(1)
+        stop(None, None)
+        for process in processes:
+            process.wait()
+        sys.exit(max(process.returncode for process in processes))
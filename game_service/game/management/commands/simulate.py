@@ -0,0 +1,64 @@
+import json
+
+from django.core.management.base import BaseCommand
+
+from game import consumers
+from game.simulation import run_benchmark
+
+
+class Command(BaseCommand):
+    """Play headless matches on a virtual clock and report performance."""
+
+    def add_arguments(self, parser):
+        parser.add_argument('--matches', type=int, default=1000)
+        parser.add_argument(
+            '--inputs',
+            choices=['random', 'tracking', 'bots'],
+            default='random'
+        )
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument(
+            '--update-time',
+            type=float,
+            default=consumers.UPDATE_TIME
+        )
+        parser.add_argument(
+            '--time-step',
+            type=float,
+            default=consumers.TIME_STEP,
+            help='0 for a variable timestep'
+        )
+        parser.add_argument(
+            '--max-steps',
+            type=int,
+            default=consumers.MAX_STEPS
+        )
+        parser.add_argument(
+            '--no-swept',
+            action='store_true',
+            help='Check collisions at the end of each step only'
+        )
+        parser.add_argument(
+            '--max-duration',
+            type=float,
+            default=600,
+            help='Simulated seconds before a match is abandoned'
+        )
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+        config = {
+            **consumers.GAME_CONFIG,
+            'time_step': options['time_step'] or None,
+            'max_steps': options['max_steps'],
+            'swept_collisions': not options['no_swept'],
+        }
+        report = run_benchmark(
+            config,
+            matches=options['matches'],
+            inputs=options['inputs'],
+            seed=options['seed'],
+            update_time=options['update_time'],
+            max_duration=options['max_duration']
+        )
+        self.stdout.write(json.dumps(report, indent=4))
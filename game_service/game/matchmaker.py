@@ -0,0 +1,114 @@
+import asyncio
+import logging
+
+import httpx
+from django.conf import settings
+
+
+logger = logging.getLogger('game-service')
+
+
+MATCHMAKER_URL = 'https://matchmaker-service:8002'
+REFERER = 'https://game-service:8001/'
+TIMEOUT = 5             # Seconds
+KEEPALIVE_TIME = 60     # Seconds
+MAX_CONNECTIONS = 10
+
+
+class MatchmakerClient:
+    # Shared client for requests to matchmaker-service. Connections are kept
+    # alive in a pool and share one SSL context so TLS sessions are resumed,
+    # and the CSRF token and cookie are fetched once and only refreshed when
+    # the matchmaker answers 403.
+
+    def __init__(self, base_url=MATCHMAKER_URL, transport=None):
+        self.base_url = base_url
+        self.transport = transport
+        self.client = None
+        self.loop = None
+        self.csrf_lock = None
+        self.csrf_token = None
+        self.cookies = None
+
+    async def get_client(self):
+        # Pooled connections belong to the event loop that opened them
+        loop = asyncio.get_running_loop()
+        if self.client is None or self.client.is_closed or self.loop != loop:
+            if self.client is not None and not self.client.is_closed:
+                await self.close_stale(self.client, self.loop)
+            self.client = httpx.AsyncClient(
+                base_url=self.base_url,
+                verify=False,
+                timeout=TIMEOUT,
+                limits=httpx.Limits(
+                    max_connections=MAX_CONNECTIONS,
+                    max_keepalive_connections=MAX_CONNECTIONS,
+                    keepalive_expiry=KEEPALIVE_TIME
+                ),
+                headers={'Referer': REFERER},
+                transport=self.transport
+            )
+            self.loop = loop
+            self.csrf_lock = asyncio.Lock()
+        return self.client
+
+    async def close_stale(self, client, loop):
+        # Closed on its own loop while that one still runs
+        try:
+            if loop.is_running():
+                await asyncio.wrap_future(
+                    asyncio.run_coroutine_threadsafe(client.aclose(), loop)
+                )
+            else:
+                await client.aclose()
+        except Exception as e:
+            logger.warning(f'Failed to close matchmaker client [{e}]')
+
+    async def get_csrf_token(self, stale_token=None):
+        # Concurrent requests rejected with the same token refresh it once
+        client = await self.get_client()
+        async with self.csrf_lock:
+            if self.csrf_token is None or self.csrf_token == stale_token:
+                response = await client.get('/get-csrf-token/')
+                if response.status_code != 200:
+                    raise Exception(
+                        'Failed to get CSRF token from matchmaker-service'
+                        f' {response.status_code} {response.reason_phrase}'
+                    )
+                csrf_token = response.json().get('csrfToken')
+                if not csrf_token:
+                    raise Exception('No CSRF token found in response')
+                self.cookies = '; '.join(
+                    f'{name}={value}'
+                    for name, value in response.cookies.items()
+                )
+                # The cookie is sent explicitly, keep the jar empty
+                client.cookies.clear()
+                self.csrf_token = csrf_token
+            return self.csrf_token, self.cookies
+
+    async def post(self, path, payload):
+        client = await self.get_client()
+        csrf_token = None
+        for _ in range(2):
+            csrf_token, cookies = await self.get_csrf_token(csrf_token)
+            response = await client.post(
+                path,
+                json=payload,
+                headers={
+                    'X-CSRFToken': csrf_token,
+                    'X-API-Key': settings.MATCHMAKER_SERVICE_API_KEY,
+                    'Cookie': cookies,
+                }
+            )
+            if response.status_code != 403:
+                break
+        return response
+
+    async def close(self):
+        if self.client is not None:
+            await self.client.aclose()
+            self.client = None
+
+
+client = MatchmakerClient()
@@ -0,0 +1,105 @@
+import bisect
+import time
+
+
+# Histograms count observations in fixed buckets, recording one costs a
+# bisect and two additions so they stay on in production. Everything is
+# per process and cumulative since it started.
+TIME_BUCKETS = (                # Seconds
+    0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.015, 0.025,
+    0.05, 0.1, 0.25, 0.5, 1,
+)
+BYTES_BUCKETS = (16, 32, 64, 128, 256, 512, 1024, 2048, 4096, 8192)
+QUANTILES = {'p50': 0.5, 'p90': 0.9, 'p99': 0.99}
+
+
+class Histogram:
+    __slots__ = ('bounds', 'counts', 'count', 'sum', 'max')
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.sum = 0
+        self.max = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.sum += value
+        if value > self.max:
+            self.max = value
+
+    def quantile(self, q):
+        # Upper bound of the bucket holding the quantile, the maximum for
+        # the overflow bucket
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.bounds, self.counts):
+            seen += count
+            if seen >= rank:
+                return min(bound, self.max)
+        return self.max
+
+    def to_dict(self):
+        counts = list(self.counts)
+        return {
+            'count': self.count,
+            'sum': self.sum,
+            'mean': self.sum / self.count if self.count else None,
+            'max': self.max,
+            **{name: self.quantile(q) for name, q in QUANTILES.items()},
+            'buckets': {
+                **{
+                    str(bound): count
+                    for bound, count in zip(self.bounds, counts)
+                },
+                'inf': counts[-1],
+            },
+        }
+
+
+class Metrics:
+    def __init__(self):
+        self.started = time.time()
+        self.histograms = {
+            'tick_lag': Histogram(TIME_BUCKETS),
+            'tick_duration': Histogram(TIME_BUCKETS),
+            'simulation_time': Histogram(TIME_BUCKETS),
+            'broadcast_time': Histogram(TIME_BUCKETS),
+            'frame_bytes': Histogram(BYTES_BUCKETS),
+            'checkpoint_time': Histogram(TIME_BUCKETS),
+        }
+        self.counters = {
+            'ticks': 0,
+            'updates': 0,
+            'update_errors': 0,
+            'frames': 0,
+            'frame_bytes': 0,
+            'games_started': 0,
+            'games_ended': 0,
+            'games_rejected': 0,
+            'checkpoints': 0,
+            'checkpoints_skipped': 0,
+        }
+
+    def observe(self, name, value):
+        self.histograms[name].observe(value)
+
+    def increment(self, name, value=1):
+        self.counters[name] += value
+
+    def to_dict(self):
+        return {
+            'uptime': time.time() - self.started,
+            'counters': dict(self.counters),
+            'histograms': {
+                name: histogram.to_dict()
+                for name, histogram in self.histograms.items()
+            },
+        }
+
+
+metrics = Metrics()
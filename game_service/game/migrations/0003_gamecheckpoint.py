@@ -0,0 +1,25 @@
+# Generated by Django 4.2.30 on 2026-10-18 02:57
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('game', '0002_replay'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GameCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('game_id', models.CharField(max_length=255, unique=True)),
+                ('shard', models.IntegerField(db_index=True)),
+                ('bots', models.JSONField(default=dict)),
+                ('state', models.JSONField()),
+                ('updated_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.30 on 2026-10-18 03:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('game', '0003_gamecheckpoint'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='gamecheckpoint',
+            name='handoff',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AlterField(
+            model_name='gamecheckpoint',
+            name='state',
+            field=models.JSONField(null=True),
+        ),
+    ]
@@ -0,0 +1,56 @@
+from django.db import models
+from django.utils import timezone
+
+
+class PendingResult(models.Model):
+    # Result of a finished game waiting to be delivered to matchmaker-service.
+    # The game id is the idempotency key, matchmaker-service ignores results
+    # of games it already finished.
+    game_id = models.CharField(max_length=255, unique=True)
+    left_score = models.IntegerField()
+    right_score = models.IntegerField()
+    status = models.CharField(max_length=32)
+    created_at = models.DateTimeField(default=timezone.now)
+    attempts = models.IntegerField(default=0)
+    next_attempt_at = models.DateTimeField(
+        default=timezone.now,
+        db_index=True
+    )
+
+    def __str__(self):
+        return self.game_id
+
+    def to_dict(self):
+        return {
+            'game_id': self.game_id,
+            'left_score': self.left_score,
+            'right_score': self.right_score,
+            'status': self.status
+        }
+
+
+class Replay(models.Model):
+    # Seed, config and input log of a finished game, see game/replay.py
+    game_id = models.CharField(max_length=255, unique=True)
+    created_at = models.DateTimeField(default=timezone.now)
+    data = models.BinaryField()
+
+    def __str__(self):
+        return self.game_id
+
+
+class GameCheckpoint(models.Model):
+    # Last snapshot of a running game, see game/checkpoint.py. Rows are
+    # removed when their game ends, the ones left behind belong to games
+    # interrupted by a restart or a crash of their shard. Handed off games
+    # were given up by a draining shard and go to the first shard claiming
+    # them.
+    game_id = models.CharField(max_length=255, unique=True)
+    shard = models.IntegerField(db_index=True)
+    bots = models.JSONField(default=dict)
+    state = models.JSONField(null=True)     # None before the match started
+    handoff = models.BooleanField(default=False)
+    updated_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return self.game_id
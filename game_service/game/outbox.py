@@ -0,0 +1,202 @@
+import asyncio
+import contextvars
+import logging
+import time
+from datetime import timedelta
+
+from channels.db import database_sync_to_async
+from django.db import transaction
+from django.utils import timezone
+from . import matchmaker
+from .models import PendingResult
+
+
+logger = logging.getLogger('game-service')
+
+
+# Finished games are stored in PendingResult and delivered to
+# matchmaker-service in batches by one drainer per process. Drainers of
+# different shards lease the results they send so they never send the same
+# ones at the same time, failed deliveries are retried with exponential
+# backoff, for as long as it takes. A batch refused by matchmaker-service is
+# split to isolate the results it cannot take. Splitting stops before the
+# lease runs out, the results not sent by then are failed and retried.
+BATCH_SIZE = 100
+BATCH_TIME = 0.5        # Seconds to collect results before a delivery
+DRAIN_TIME = 5          # Seconds between checks for due retries
+LEASE_TIME = 30         # Seconds
+# Seconds to start requests in, the last one ends and its results are
+# recorded within the lease
+DELIVERY_TIME = LEASE_TIME - 2 * matchmaker.TIMEOUT
+BACKOFF_TIME = 1        # Seconds, doubled on every failed attempt
+MAX_BACKOFF = 300       # Seconds
+
+BULK_PATH = '/api/games/results/'
+SINGLE_PATH = '/api/games/result/'
+
+
+def store(result):
+    PendingResult.objects.update_or_create(
+        game_id=result['game_id'],
+        defaults={
+            'left_score': result['left_score'],
+            'right_score': result['right_score'],
+            'status': result['status'],
+            'attempts': 0,
+            'next_attempt_at': timezone.now(),
+        }
+    )
+
+
+def claim(limit=BATCH_SIZE):
+    now = timezone.now()
+    with transaction.atomic():
+        results = list(
+            PendingResult.objects
+            .select_for_update(skip_locked=True)
+            .filter(next_attempt_at__lte=now)
+            .order_by('next_attempt_at')[:limit]
+        )
+        PendingResult.objects.filter(
+            pk__in=[result.pk for result in results]
+        ).update(next_attempt_at=now + timedelta(seconds=LEASE_TIME))
+    return results
+
+
+def finish(delivered, failed):
+    now = timezone.now()
+    for result in failed:
+        result.attempts += 1
+        # Results keep failing for as long as matchmaker-service is down,
+        # the exponent is bounded as well as the delay
+        delay = min(
+            BACKOFF_TIME * 2 ** min(result.attempts - 1, 16), MAX_BACKOFF
+        )
+        result.next_attempt_at = now + timedelta(seconds=delay)
+    with transaction.atomic():
+        PendingResult.objects.filter(
+            pk__in=[result.pk for result in delivered]
+        ).delete()
+        PendingResult.objects.bulk_update(
+            failed,
+            ['attempts', 'next_attempt_at']
+        )
+
+
+class ResultOutbox:
+
+    loop_started = asyncio.Event()
+    wakeup = asyncio.Event()
+
+    @classmethod
+    async def start_loop(cls):
+        if not cls.loop_started.is_set():
+            cls.loop_started.set()
+            # Not tied to the view creating the first game, see Game.start()
+            asyncio.create_task(cls.loop(), context=contextvars.Context())
+
+    @classmethod
+    async def add(cls, result):
+        try:
+            await database_sync_to_async(store)(result)
+        except Exception as e:
+            logger.error(
+                f'Failed to store result of game {result["game_id"]} [{e}]'
+            )
+            # Better late than never, try to deliver it right away
+            await cls.post_single(result)
+            return
+        await cls.start_loop()
+        cls.wakeup.set()
+
+    @classmethod
+    async def loop(cls):
+        while True:
+            try:
+                await asyncio.wait_for(cls.wakeup.wait(), DRAIN_TIME)
+                await asyncio.sleep(BATCH_TIME)
+            except asyncio.TimeoutError:
+                pass
+            cls.wakeup.clear()
+            try:
+                while await cls.drain() == BATCH_SIZE:
+                    pass
+            except Exception as e:
+                logger.error(f'Failed to drain results [{e}]')
+
+    @classmethod
+    async def drain(cls):
+        results = await database_sync_to_async(claim)()
+        if results:
+            delivered, failed = await cls.deliver(
+                results, time.monotonic() + DELIVERY_TIME
+            )
+            await database_sync_to_async(finish)(delivered, failed)
+        return len(results)
+
+    @classmethod
+    async def deliver(cls, results, deadline):
+        # Returns the delivered and the failed results
+        if time.monotonic() > deadline:
+            logger.warning(
+                f'Out of time to submit {len(results)} results, '
+                f'retrying them later'
+            )
+            return [], results
+        try:
+            response = await matchmaker.client.post(
+                BULK_PATH,
+                {'results': [result.to_dict() for result in results]}
+            )
+        except Exception as e:
+            logger.error(f'Failed to submit {len(results)} results [{e}]')
+            return [], results
+        if response.status_code == 200:
+            return results, []
+        if response.status_code != 404:
+            logger.error(
+                f'Failed to submit {len(results)} results'
+                f' {response.status_code} {response.reason_phrase}'
+            )
+            if response.status_code == 503 or len(results) == 1:
+                return [], results
+            # One bad result fails the whole batch, the halves are sent
+            # apart until it is the only one left failing
+            middle = len(results) // 2
+            first = await cls.deliver(results[:middle], deadline)
+            second = await cls.deliver(results[middle:], deadline)
+            return first[0] + second[0], first[1] + second[1]
+
+        # matchmaker-service without the bulk endpoint
+        delivered = []
+        failed = []
+        for index, result in enumerate(results):
+            if time.monotonic() > deadline:
+                logger.warning(
+                    f'Out of time to submit {len(results) - index} '
+                    f'results, retrying them later'
+                )
+                failed.extend(results[index:])
+                break
+            if await cls.post_single(result.to_dict()):
+                delivered.append(result)
+            else:
+                failed.append(result)
+        return delivered, failed
+
+    @classmethod
+    async def post_single(cls, result):
+        try:
+            response = await matchmaker.client.post(SINGLE_PATH, result)
+        except Exception as e:
+            logger.error(
+                f'Failed to submit result of game {result["game_id"]} [{e}]'
+            )
+            return False
+        if response.status_code != 200:
+            logger.error(
+                f'Failed to submit result of game {result["game_id"]}'
+                f' {response.status_code} {response.reason_phrase}'
+            )
+            return False
+        return True
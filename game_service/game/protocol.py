@@ -0,0 +1,156 @@
+import json
+import math
+import struct
+
+
+# Frame formats, negotiated with ?format=<format> on ws/game/<game_id>/.
+# Spectators connect with ?role=spectator and may add ?rate=<frames per
+# second> to receive fewer update frames.
+# Clients of a game handed off by a draining shard receive a JSON
+# {"type": "redirect_message", "delay": <seconds>} and get disconnected, they
+# connect again after the delay to reach the shard taking the game over.
+JSON = 'json'
+BINARY = 'binary'
+DELTA = 'delta'
+FORMATS = [JSON, BINARY, DELTA]
+
+# Binary update and endgame frames (little endian, 24 bytes):
+#   uint8    message type   index in MESSAGE_TYPES
+#   uint8    status         index in STATUSES, 255 if unknown
+#   float32  time           NaN before the game started
+#   float32  ballX          NaN before the game started
+#   float32  ballY          NaN before the game started
+#   float32  paddleLeft     NaN while not connected
+#   float32  paddleRight    NaN while not connected
+#   uint8    scoreLeft      255 while not connected
+#   uint8    scoreRight     255 while not connected
+# Initial messages are always sent as JSON.
+BINARY_FRAME = struct.Struct('<BBfffffBB')
+MESSAGE_TYPES = ['update_message', 'endgame_message']
+STATUSES = [
+    'created',
+    'waiting_for_players',
+    'game_started',
+    'game_over',
+    'game_ended',
+    'player_forfeited',
+    'left_player_disconnected',
+    'right_player_disconnected',
+]
+NOT_SET = 255
+
+# Delta frames are JSON update messages holding only the fields that changed
+# since the previous frame, plus 'seq' (incremented on every frame) and
+# 'keyframe'. Keyframes carry every field and are sent periodically, on
+# score, status or message type changes, when a delta client joins and when
+# a client sends {"messageType": "keyframe_request"} after a gap in 'seq'.
+KEYFRAME_INTERVAL = 100
+KEYFRAME_FIELDS = ['type', 'scoreLeft', 'scoreRight', 'status']
+
+
+def encode(message, frame_format=JSON):
+    if frame_format == BINARY and message['type'] in MESSAGE_TYPES:
+        return {'type': message['type'], 'bytes': encode_binary(message)}
+    return {'type': message['type'], 'text': json.dumps(message)}
+
+
+class DeltaEncoder:
+    def __init__(self, keyframe_interval=KEYFRAME_INTERVAL):
+        self.keyframe_interval = keyframe_interval
+        self.seq = 0
+        self.last = None
+        self.since_keyframe = 0
+
+    def request_keyframe(self):
+        self.last = None
+
+    def encode(self, message):
+        if message['type'] not in MESSAGE_TYPES:
+            return encode(message)
+        self.seq += 1
+        self.since_keyframe += 1
+        keyframe = (
+            self.last is None
+            or self.since_keyframe >= self.keyframe_interval
+            or any(
+                message[field] != self.last[field]
+                for field in KEYFRAME_FIELDS
+            )
+        )
+        if keyframe:
+            frame = dict(message)
+            self.since_keyframe = 0
+        else:
+            frame = {
+                field: value for field, value in message.items()
+                if value != self.last[field]
+            }
+            frame['type'] = message['type']
+        frame['seq'] = self.seq
+        frame['keyframe'] = keyframe
+        self.last = message
+        return {'type': message['type'], 'text': json.dumps(frame)}
+
+
+class DeltaDecoder:
+    def __init__(self):
+        self.seq = None
+        self.state = None
+
+    def decode(self, text):
+        frame = json.loads(text)
+        if frame['keyframe']:
+            self.state = {}
+        elif self.state is None or frame['seq'] != self.seq + 1:
+            raise ValueError(
+                f'Missing delta frames before {frame["seq"]}'
+            )
+        self.seq = frame.pop('seq')
+        del frame['keyframe']
+        self.state.update(frame)
+        return dict(self.state)
+
+
+def encode_binary(message):
+    return BINARY_FRAME.pack(
+        MESSAGE_TYPES.index(message['type']),
+        STATUSES.index(message['status'])
+        if message['status'] in STATUSES else NOT_SET,
+        _position(message['time']),
+        _position(message['ballX']),
+        _position(message['ballY']),
+        _position(message['paddleLeft']),
+        _position(message['paddleRight']),
+        _score(message['scoreLeft']),
+        _score(message['scoreRight'])
+    )
+
+
+def decode_binary(frame):
+    (
+        message_type, status, time, ball_x, ball_y,
+        paddle_left, paddle_right, score_left, score_right
+    ) = BINARY_FRAME.unpack(frame)
+    return {
+        'type': MESSAGE_TYPES[message_type],
+        'time': None if math.isnan(time) else time,
+        'ballX': None if math.isnan(ball_x) else ball_x,
+        'ballY': None if math.isnan(ball_y) else ball_y,
+        'paddleLeft': None if math.isnan(paddle_left) else paddle_left,
+        'paddleRight': None if math.isnan(paddle_right) else paddle_right,
+        'scoreLeft': None if score_left == NOT_SET else score_left,
+        'scoreRight': None if score_right == NOT_SET else score_right,
+        'status': STATUSES[status] if status != NOT_SET else None,
+    }
+
+
+def _position(value):
+    if isinstance(value, (int, float)):
+        return value
+    return math.nan
+
+
+def _score(value):
+    if isinstance(value, int) and 0 <= value < NOT_SET:
+        return value
+    return NOT_SET
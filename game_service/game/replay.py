@@ -0,0 +1,119 @@
+import json
+import struct
+
+from .game import GameLogic, MOVE_ACTIONS
+
+
+# A replay holds what the headless engine needs to play a match again:
+#   header   b'PONG', uint8 version, uint32 seed, float64 start time,
+#            uint16 config length, then the GameLogic config as JSON
+#   inputs   uint16 physics steps since the previous record,
+#            uint8 side index * 4 + move index
+#   end      uint16 steps to the last step and uint8 END, followed by
+#            uint8 left score and uint8 right score
+# Records are only ever appended while the match runs. Inputs cost 3 bytes
+# each and repeated ones are skipped, so a match takes a few KB whatever its
+# number of frames.
+MAGIC = b'PONG'
+VERSION = 1
+HEADER = struct.Struct('<4sBIdH')
+RECORD = struct.Struct('<HB')
+SCORES = struct.Struct('<BB')
+SIDES = ['left', 'right']
+MOVES = list(MOVE_ACTIONS)
+MAX_GAP = 0xFFFF
+SKIP = 0xFE             # Carries gaps longer than MAX_GAP steps
+END = 0xFF
+
+
+class ReplayRecorder:
+    def __init__(self, config, logic):
+        # Only fixed timestep matches can be replayed step by step
+        if not logic.time_step:
+            raise ValueError('Replays need a fixed timestep')
+        encoded = json.dumps(config).encode()
+        self.data = bytearray(HEADER.pack(
+            MAGIC, VERSION, logic.seed, logic.time, len(encoded)
+        ))
+        self.data += encoded
+        self.last_step = logic.steps
+        self.last_move = {}
+        self.finished = False
+
+    def gap(self, step):
+        gap = step - self.last_step
+        self.last_step = step
+        while gap > MAX_GAP:
+            self.data += RECORD.pack(MAX_GAP, SKIP)
+            gap -= MAX_GAP
+        return gap
+
+    def record(self, step, side, move):
+        if self.finished or side not in SIDES or move not in MOVE_ACTIONS:
+            return
+        # Paddle moves are idempotent, key repeats change nothing
+        if self.last_move.get(side) == move:
+            return
+        self.last_move[side] = move
+        self.data += RECORD.pack(
+            self.gap(step),
+            SIDES.index(side) * 4 + MOVES.index(move)
+        )
+
+    def finish(self, logic):
+        if not self.finished:
+            self.finished = True
+            self.data += RECORD.pack(self.gap(logic.steps), END)
+            self.data += SCORES.pack(
+                logic.player['left'].score,
+                logic.player['right'].score
+            )
+        return bytes(self.data)
+
+
+def parse(data):
+    magic, version, seed, start_time, length = HEADER.unpack_from(data)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError('Not a replay or unknown replay version')
+    offset = HEADER.size
+    config = json.loads(data[offset:offset + length])
+    offset += length
+
+    inputs = []
+    step = 0
+    while True:
+        gap, code = RECORD.unpack_from(data, offset)
+        offset += RECORD.size
+        step += gap
+        if code == END:
+            break
+        if code != SKIP:
+            inputs.append((step, SIDES[code // 4], MOVES[code % 4]))
+    scores = SCORES.unpack_from(data, offset)
+    return {
+        'seed': seed,
+        'start_time': start_time,
+        'config': config,
+        'inputs': inputs,
+        'steps': step,
+        'scores': scores,
+    }
+
+
+def replay(data):
+    # Plays the match again and returns its GameLogic after the last step
+    recorded = parse(data)
+    logic = GameLogic(**recorded['config'], seed=recorded['seed'])
+    logic.start()
+    logic.time = logic.last_update = recorded['start_time']
+    logic.trigger_pause()
+    inputs = iter(recorded['inputs'])
+    pending = next(inputs, None)
+    while logic.steps < recorded['steps']:
+        # An input recorded after n steps moved the paddle from step n + 1
+        while pending and pending[0] <= logic.steps:
+            logic.trigger_move(pending[1], pending[2])
+            pending = next(inputs, None)
+        logic.time += logic.time_step
+        logic.step(logic.time_step)
+    return logic
@@ -1,6 +1,20 @@
 from django.urls import re_path
 
 
+# WebSocket Endpoints
+# -------------------
+# ws/game/<game_id>/    : Play or watch a game
+#                       ?role=<player|spectator>    # Optional, player
+#                       ?position=<left|right>      # Required for players
+#                       ?up=<key>                   # Optional
+#                       ?down=<key>                 # Optional
+#                       ?format=<json|binary|delta> # Optional
+#                       ?rate=<frames per second>   # Optional, spectators
+#                                                   # only, rounded down to
+#                                                   # 15, 10, 5, 2 or 1,
+#                                                   # every update otherwise
+
+
 def get_websocket_urlpatterns():
     from .consumers import GamePlayerConsumer
     return [
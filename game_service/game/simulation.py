@@ -0,0 +1,199 @@
+import random
+import statistics
+import time
+import tracemalloc
+
+from .bot import Bot
+from .game import GameLogic
+
+
+MOVES = ['up', 'down', 'up_off', 'down_off']
+
+
+class VirtualClock:
+    def __init__(self, start=0.0):
+        self.now = start
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
+
+
+class RandomInputs:
+    # Presses or releases a random key on each side with a fixed probability
+    # per tick
+
+    def __init__(self, seed=None, probability=0.1):
+        self.random = random.Random(seed)
+        self.probability = probability
+
+    def __call__(self, tick, logic):
+        for side in ['left', 'right']:
+            if self.random.random() < self.probability:
+                logic.trigger_move(side, self.random.choice(MOVES))
+
+
+class TrackingInputs:
+    # Moves each paddle towards the ball, missing now and then
+
+    def __init__(self, seed=None, miss=0.02):
+        self.random = random.Random(seed)
+        self.miss = miss
+
+    def __call__(self, tick, logic):
+        ball_y = logic.ball.get_center_y()
+        for side in ['left', 'right']:
+            paddle = logic.player[side].paddle
+            if self.random.random() < self.miss:
+                move = self.random.choice(MOVES)
+            elif ball_y < paddle.top:
+                move = 'up'
+            elif ball_y > paddle.bottom:
+                move = 'down'
+            else:
+                move = 'up_off' if paddle.angle == 270 else 'down_off'
+            logic.trigger_move(side, move)
+
+
+class BotInputs:
+    # Lets a bot play each side
+
+    def __init__(self, seed=None, level='medium'):
+        self.bots = [Bot('left', level, seed), Bot('right', level, seed)]
+
+    def __call__(self, tick, logic):
+        for bot in self.bots:
+            move = bot.act(logic)
+            if move:
+                logic.trigger_move(bot.side, move)
+
+
+class ScriptedInputs:
+    # Replays a list of (tick, side, move) entries
+
+    def __init__(self, script):
+        self.moves = {}
+        for tick, side, move in script:
+            self.moves.setdefault(tick, []).append((side, move))
+
+    def __call__(self, tick, logic):
+        for side, move in self.moves.get(tick, []):
+            logic.trigger_move(side, move)
+
+
+def play_match(
+    config,
+    inputs,
+    seed=None,
+    update_time=0.03,
+    max_duration=600
+):
+    # Plays one match as fast as possible on a virtual clock and returns
+    # the finished GameLogic with the number of ticks it took
+    clock = VirtualClock()
+    logic = GameLogic(**config, seed=seed, clock=clock)
+    logic.start()
+    ticks = 0
+    while not logic.finished and clock.now < max_duration:
+        clock.advance(update_time)
+        inputs(ticks, logic)
+        logic.update()
+        ticks += 1
+    return logic, ticks
+
+
+def measure_allocations(
+    config,
+    inputs,
+    seed=None,
+    update_time=0.03,
+    ticks=1000
+):
+    # Average peak of bytes allocated during one tick, traced on a separate
+    # match so tracing does not slow down the timed ones
+    clock = VirtualClock()
+    logic = GameLogic(**config, seed=seed, clock=clock)
+    logic.start()
+    allocated = 0
+    tracemalloc.start()
+    try:
+        for tick in range(ticks):
+            clock.advance(update_time)
+            inputs(tick, logic)
+            current, _ = tracemalloc.get_traced_memory()
+            tracemalloc.reset_peak()
+            logic.update()
+            _, peak = tracemalloc.get_traced_memory()
+            allocated += peak - current
+    finally:
+        tracemalloc.stop()
+    return allocated / ticks
+
+
+def measure_match_size(config, seed=None):
+    # Bytes held by one started match
+    tracemalloc.start()
+    try:
+        logic = GameLogic(**config, seed=seed, clock=VirtualClock())
+        logic.start()
+        size, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return size
+
+
+def run_benchmark(
+    config,
+    matches=1000,
+    inputs='random',
+    seed=0,
+    update_time=0.03,
+    max_duration=600
+):
+    input_types = {
+        'random': RandomInputs,
+        'tracking': TrackingInputs,
+        'bots': BotInputs,
+    }
+    durations = []
+    total_ticks = 0
+    unfinished = 0
+    start = time.perf_counter()
+    for match in range(matches):
+        logic, ticks = play_match(
+            config,
+            input_types[inputs](seed + match),
+            seed + match,
+            update_time,
+            max_duration
+        )
+        total_ticks += ticks
+        durations.append(logic.chrono.get_time())
+        unfinished += not logic.finished
+    elapsed = time.perf_counter() - start
+
+    report = {
+        'matches': matches,
+        'unfinished': unfinished,
+        'ticks': total_ticks,
+        'seconds': elapsed,
+        'ticks_per_sec': total_ticks / elapsed if elapsed else 0,
+        'allocated_bytes_per_tick': measure_allocations(
+            config, input_types[inputs](seed), seed, update_time
+        ),
+        'bytes_per_match': measure_match_size(config, seed),
+        'duration_min': min(durations),
+        'duration_mean': statistics.fmean(durations),
+        'duration_max': max(durations),
+    }
+    if len(durations) > 1:
+        # Inclusive: percentiles stay within the durations measured
+        percentiles = statistics.quantiles(
+            durations, n=100, method='inclusive'
+        )
+        report['duration_p50'] = percentiles[49]
+        report['duration_p90'] = percentiles[89]
+        report['duration_p99'] = percentiles[98]
+    return report
@@ -0,0 +1,171 @@
+import random
+from unittest.mock import patch
+
+from django.test import SimpleTestCase
+from game.batch import BatchPhysics
+from game.game import GameLogic
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class BatchPhysicsTests(SimpleTestCase):
+    """Test the vectorized engine against the GameLogic classes"""
+
+    GAMES = 12
+    TICKS = 3000
+    UPDATE_TIME = 0.03
+
+    def create_logics(self, time_step=None):
+        return [
+            GameLogic(
+                480, 360, 5, 200, 60, 60, 300, 60, 1.5, 3, 15, 500,
+                time_step=time_step if seed % 2 else None,
+                max_steps=4,
+                seed=seed,
+                swept_collisions=seed % 4 >= 2
+            )
+            for seed in range(self.GAMES)
+        ]
+
+    def simulate(self, step, time_step=None):
+        clock = FakeClock()
+        inputs = random.Random(42)
+        moves = ['up', 'down', 'up_off', 'down_off']
+        trace = []
+        with patch('time.time', clock):
+            logics = self.create_logics(time_step)
+            for logic in logics:
+                logic.start()
+            engine = BatchPhysics()
+            for logic in logics:
+                engine.add(logic)
+            for _ in range(self.TICKS):
+                clock.now += self.UPDATE_TIME * inputs.uniform(0.5, 2)
+                for logic in logics:
+                    for side in ['left', 'right']:
+                        if inputs.random() < 0.1:
+                            logic.trigger_move(side, inputs.choice(moves))
+                step(logics, engine)
+                trace.append([self.snapshot(logic) for logic in logics])
+        return trace
+
+    def snapshot(self, logic):
+        return (
+            logic.ball.left,
+            logic.ball.top,
+            logic.ball.angle,
+            logic.player['left'].paddle.top,
+            logic.player['right'].paddle.top,
+            logic.player['left'].score,
+            logic.player['right'].score,
+            logic.paused,
+            logic.finished,
+            logic.steps,
+        )
+
+    def assertSnapshotsEqual(self, expected, actual):
+        for expected_game, actual_game in zip(expected, actual):
+            for expected_value, actual_value in zip(
+                expected_game, actual_game
+            ):
+                self.assertAlmostEqual(expected_value, actual_value, 6)
+
+    def assertMatchesGameLogic(self, time_step=None):
+        def reference(logics, engine):
+            for logic in logics:
+                logic.update()
+
+        def batched(logics, engine):
+            engine.update()
+
+        expected = self.simulate(reference, time_step)
+        actual = self.simulate(batched, time_step)
+        for expected_tick, actual_tick in zip(expected, actual):
+            self.assertSnapshotsEqual(expected_tick, actual_tick)
+        scores = [game[5] + game[6] for game in expected[-1]]
+        self.assertGreater(sum(scores), 0)
+
+    def test_matches_game_logic(self):
+        self.assertMatchesGameLogic()
+
+    def test_matches_fixed_timestep_game_logic(self):
+        self.assertMatchesGameLogic(time_step=0.01)
+
+    def test_add_and_remove(self):
+        logics = self.create_logics()
+        for logic in logics:
+            logic.start()
+        engine = BatchPhysics()
+        for logic in logics:
+            engine.add(logic)
+        engine.add(logics[0])
+        self.assertEqual(len(engine), self.GAMES)
+        engine.remove(logics[3])
+        self.assertEqual(len(engine), self.GAMES - 1)
+        self.assertNotIn(logics[3], engine)
+        self.assertEqual(len(engine.state['ball_left']), self.GAMES - 1)
+        for logic in logics[:3] + logics[4:]:
+            self.assertEqual(
+                engine.state['ball_left'][engine.rows[logic]],
+                logic.ball.left
+            )
+        engine.update()
+
+    @patch('game.batch.INITIAL_CAPACITY', 4)
+    def test_capacity_doubling(self):
+        logics = self.create_logics()
+        engine = BatchPhysics()
+        for logic in logics:
+            logic.start()
+            engine.add(logic)
+        self.assertEqual(engine.capacity, 16)
+        self.assertEqual(len(engine.state['ball_top']), self.GAMES)
+        for logic in logics:
+            self.assertEqual(
+                engine.state['ball_top'][engine.rows[logic]], logic.ball.top
+            )
+
+    def test_clock_of_each_game(self):
+        clocks = [FakeClock(), FakeClock()]
+        logics = [
+            GameLogic(
+                480, 360, 5, 200, 60, 60, 300, 60, 1.5, 3, 15, 500,
+                seed=seed, clock=clock
+            )
+            for seed, clock in enumerate(clocks)
+        ]
+        engine = BatchPhysics()
+        for logic in logics:
+            logic.start()
+            engine.add(logic)
+        clocks[0].now += 2
+        engine.update()
+        self.assertEqual(logics[0].time, 2)
+        self.assertEqual(logics[1].time, 0)
+
+    def test_update_due_games(self):
+        clock = FakeClock()
+        with patch('time.time', clock):
+            batched = self.create_logics()[:2]
+            reference = self.create_logics()[1]
+            for logic in batched + [reference]:
+                logic.start()
+            engine = BatchPhysics()
+            for logic in batched:
+                engine.add(logic)
+            for _ in range(10):
+                clock.now += self.UPDATE_TIME
+                engine.update([batched[0]])
+            self.assertEqual(batched[1].steps, 0)
+            engine.update()
+            reference.update()
+        self.assertEqual(batched[0].steps, 11)
+        self.assertEqual(
+            self.snapshot(batched[1]), self.snapshot(reference)
+        )
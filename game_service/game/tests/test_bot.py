@@ -0,0 +1,66 @@
+
+from django.test import SimpleTestCase
+from game.bot import Bot, predict_landing
+from game.consumers import GAME_CONFIG, Game
+from game.game import GameLogic
+from game.simulation import BotInputs, VirtualClock, play_match
+
+
+class BotTests(SimpleTestCase):
+    """Test the built-in opponent"""
+
+    def setUp(self):
+        self.logic = GameLogic(**GAME_CONFIG, seed=1, clock=VirtualClock())
+        self.logic.start()
+        self.logic.paused = False
+
+    def play(self, angle, miss=0):
+        # Right score after the ball came to a paddle put where the ball is
+        # predicted to land, missed by miss pixels
+        ball = self.logic.ball
+        paddle = self.logic.player['left'].paddle
+        ball.move_at(400, 100)
+        ball.set_angle(angle)
+        ball.px_per_sec = 200
+        predicted = predict_landing(ball, self.logic.pitch, 0)
+        paddle.center_at(
+            paddle.get_center_x(), predicted + ball.height / 2 + miss
+        )
+        while ball.d_x < 0 and not self.logic.player['right'].score:
+            self.logic.time += self.logic.time_step
+            self.logic.step(self.logic.time_step)
+        return self.logic.player['right'].score
+
+    def test_predict_landing(self):
+        for angle in [120, 150, 180, 200, 250]:
+            self.assertEqual(self.play(angle), 0)
+        paddle = self.logic.player['left'].paddle
+        self.assertEqual(self.play(180, paddle.height), 1)
+
+    def test_act(self):
+        bot = Bot('left', 'hard', seed=1)
+        paddle = self.logic.player['left'].paddle
+        paddle.move_at(paddle.left, 0)
+        self.logic.ball.set_angle(180)
+        self.assertEqual(bot.act(self.logic), 'down')
+        self.assertIsNone(bot.act(self.logic))
+        paddle.center_at(paddle.get_center_x(), bot.target)
+        self.assertEqual(bot.act(self.logic), 'down_off')
+
+    def test_bot_matches_finish(self):
+        for seed in range(3):
+            logic, _ = play_match(GAME_CONFIG, BotInputs(seed), seed=seed)
+            self.assertTrue(logic.finished)
+
+    def test_game_bot(self):
+        game = Game('bots')
+        game.add_bot('left')
+        game.add_bot('right', 'easy')
+        self.assertEqual(set(game.player), {'left', 'right'})
+        game.game_logic = self.logic
+        paddle = self.logic.player['left'].paddle
+        paddle.move_at(paddle.left, 0)
+        game.act_bots()
+        self.assertIsNotNone(game.bots['left'].move)
+        game.remove_player('left')
+        self.assertNotIn('left', game.bots)
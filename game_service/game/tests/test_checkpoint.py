@@ -0,0 +1,231 @@
+import asyncio
+import json
+from datetime import timedelta
+from unittest.mock import AsyncMock, patch
+
+from django.test import SimpleTestCase, TransactionTestCase
+from django.urls import reverse
+from django.utils import timezone
+from game import checkpoint
+from game.checkpoint import Checkpointer
+from game.consumers import (
+    GAME_CONFIG, FORFEIT_TIME, Game, GamePlayerConsumer, TickScheduler
+)
+from game.models import GameCheckpoint, PendingResult
+from game.simulation import TrackingInputs, VirtualClock, play_match
+
+
+def write(checkpoints, ended=(), age=0):
+    checkpoint.write(
+        checkpoints, ended, 0, timezone.now() - timedelta(seconds=age)
+    )
+
+
+def match_state(seed=1):
+    logic, _ = play_match(
+        GAME_CONFIG, TrackingInputs(seed), seed=seed, max_duration=20
+    )
+    return logic, checkpoint.snapshot(logic)
+
+
+class SnapshotTests(SimpleTestCase):
+    """Test snapshotting and restoring the state of a match"""
+
+    def test_restore(self):
+        logic, state = match_state()
+        state = json.loads(json.dumps(state))
+        clock = VirtualClock(100)
+        restored = checkpoint.restore(GAME_CONFIG, state, clock)
+        self.assertEqual(restored.steps, logic.steps)
+        self.assertEqual(restored.time, logic.time)
+        self.assertAlmostEqual(
+            restored.chrono.get_time(), logic.chrono.get_time()
+        )
+        for name in ['left', 'top', 'px_per_sec', 'd_x', 'd_y']:
+            self.assertEqual(
+                getattr(restored.ball, name), getattr(logic.ball, name)
+            )
+        for side in ['left', 'right']:
+            self.assertEqual(
+                restored.player[side].score, logic.player[side].score
+            )
+            self.assertEqual(
+                restored.player[side].paddle.top,
+                logic.player[side].paddle.top
+            )
+            self.assertEqual(restored.player[side].paddle.px_per_sec, 0)
+        self.assertTrue(restored.paused)
+
+    def test_restored_match_goes_on(self):
+        _, state = match_state()
+        clock = VirtualClock()
+        restored = checkpoint.restore(GAME_CONFIG, state, clock)
+        inputs = TrackingInputs(1)
+        tick = 0
+        while not restored.finished and tick < 20000:
+            clock.advance(0.03)
+            inputs(tick, restored)
+            restored.update()
+            tick += 1
+        self.assertTrue(restored.finished)
+        self.assertGreater(restored.steps, state['steps'])
+
+
+class CheckpointerTests(TransactionTestCase):
+    """Test writing checkpoints and recovering games from them"""
+
+    def setUp(self):
+        GamePlayerConsumer.games = {}
+        Checkpointer.ended = set()
+        self.addCleanup(setattr, GamePlayerConsumer, 'games', {})
+
+    def test_write(self):
+        _, state = match_state()
+        write([('game1', {}, state), ('game2', {}, state)])
+        state['steps'] += 1
+        write([('game1', {}, state)], ['game2'])
+        self.assertEqual(
+            list(GameCheckpoint.objects.values_list('game_id', 'state')),
+            [('game1', state)]
+        )
+
+    def test_save_discarded(self):
+        _, state = match_state()
+        write([('game1', {}, state)])
+        Checkpointer.discard('game1')
+
+        async def save():
+            await Checkpointer.save([])
+        asyncio.run(save())
+        self.assertFalse(GameCheckpoint.objects.exists())
+        self.assertEqual(Checkpointer.ended, set())
+
+    def test_load_skips_ended_games(self):
+        _, state = match_state()
+        write([('game1', {}, state), ('game2', {}, state)])
+        PendingResult.objects.create(
+            game_id='game2', left_score=3, right_score=0, status='game_over'
+        )
+        loaded = checkpoint.load(0)
+        self.assertEqual([c.game_id for c in loaded], ['game1'])
+        self.assertEqual(GameCheckpoint.objects.count(), 1)
+
+    def test_recover(self):
+        logic, state = match_state()
+        write([('game1', {'left': 'hard'}, state)])
+        write([('game2', {}, state)], age=FORFEIT_TIME + 1)
+        add = AsyncMock()
+
+        async def recover():
+            await GamePlayerConsumer.recover()
+            await asyncio.sleep(0.1)
+        with patch('game.consumers.ResultOutbox.add', add):
+            asyncio.run(recover())
+
+        game = GamePlayerConsumer.games['game1']
+        self.assertEqual(game.status, 'waiting_for_players')
+        self.assertEqual(game.bots['left'].level, 'hard')
+        self.assertEqual(
+            game.game_logic.player['left'].score,
+            logic.player['left'].score
+        )
+        self.assertEqual(
+            GamePlayerConsumer.games['game2'].status, 'game_ended'
+        )
+        add.assert_called_once_with({
+            'game_id': 'game2',
+            'left_score': logic.player['left'].score,
+            'right_score': logic.player['right'].score,
+            'status': 'player_forfeited'
+        })
+        self.assertEqual(Checkpointer.ended, {'game2'})
+
+    def test_recover_without_state(self):
+        checkpoint.write(
+            [('game1', {}, None)], [], 0,
+            timezone.now() - timedelta(seconds=FORFEIT_TIME + 1)
+        )
+
+        async def recover():
+            await GamePlayerConsumer.recover()
+            await asyncio.sleep(0.1)
+        with patch('game.consumers.ResultOutbox.add', AsyncMock()):
+            asyncio.run(recover())
+        self.assertEqual(
+            GamePlayerConsumer.games['game1'].status, 'game_ended'
+        )
+        self.assertEqual(Checkpointer.ended, {'game1'})
+
+
+@patch('game.consumers.TickScheduler.start_loop', new_callable=AsyncMock)
+class DrainTests(TransactionTestCase):
+    """Test draining a shard and taking its games over"""
+
+    def setUp(self):
+        GamePlayerConsumer.games = {}
+        TickScheduler.games = {}
+        Checkpointer.ended = set()
+        self.addCleanup(setattr, GamePlayerConsumer, 'games', {})
+        self.addCleanup(setattr, GamePlayerConsumer, 'draining', False)
+        self.addCleanup(setattr, TickScheduler, 'games', {})
+
+    def redirected(self, channel_layer):
+        return [
+            args[0] for args, _ in channel_layer.send.await_args_list
+            if args[1]['type'] == 'redirect_message'
+        ]
+
+    async def test_drain(self, start_loop):
+        channel_layer = AsyncMock()
+        running = GamePlayerConsumer.games['running'] = Game('running')
+        running.add_player('a', 'left', 'w', 's', channel_layer, 'chan.a')
+        running.add_bot('right', 'easy')
+        await running.start()
+        waiting = GamePlayerConsumer.games['waiting'] = Game('waiting')
+        waiting.add_player('b', 'left', 'w', 's', channel_layer, 'chan.b')
+        await waiting.start()
+        await asyncio.sleep(0.01)
+        self.assertEqual(running.status, 'game_started')
+
+        await GamePlayerConsumer.drain(timeout=0)
+        await TickScheduler.tick()
+        await asyncio.sleep(0.01)
+        self.assertEqual(running.status, 'game_ended')
+        self.assertEqual(waiting.status, 'game_ended')
+        self.assertEqual(
+            sorted(self.redirected(channel_layer)), ['chan.a', 'chan.b']
+        )
+        saved = {
+            saved.game_id: saved
+            async for saved in GameCheckpoint.objects.all()
+        }
+        self.assertTrue(saved['running'].handoff)
+        self.assertEqual(saved['running'].bots, {'right': 'easy'})
+        self.assertEqual(
+            saved['running'].state['steps'], running.game_logic.steps
+        )
+        self.assertIsNone(saved['waiting'].state)
+
+        response = await self.async_client.put(
+            reverse('game', args=['new']), secure=True
+        )
+        self.assertEqual(response.status_code, 503)
+
+    async def test_adopt_game(self, start_loop):
+        _, state = match_state()
+        await asyncio.to_thread(write, [('handed', {'left': 'hard'}, state)])
+        await asyncio.to_thread(
+            checkpoint.write, [('kept', {}, state)], [], 1, timezone.now()
+        )
+        await asyncio.to_thread(
+            GameCheckpoint.objects.filter(game_id='handed').update,
+            handoff=True
+        )
+        with patch('game.consumers.ResultOutbox.start_loop', AsyncMock()):
+            game = await GamePlayerConsumer.adopt_game('handed')
+            self.assertIs(await GamePlayerConsumer.adopt_game('handed'), game)
+            self.assertIsNone(await GamePlayerConsumer.adopt_game('kept'))
+        self.assertEqual(game.status, 'waiting_for_players')
+        self.assertEqual(game.game_logic.steps, state['steps'])
+        saved = await GameCheckpoint.objects.aget(game_id='handed')
+        self.assertFalse(saved.handoff)
@@ -0,0 +1,410 @@
+import asyncio
+import json
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from django.test import SimpleTestCase, override_settings
+from django.urls import reverse
+from game import consumers, protocol
+from game.consumers import (
+    Game, GamePlayerConsumer, SpectatorGroup, TickScheduler, spectator_rate
+)
+from game.game import GameLogic
+
+
+class FakeGame:
+    def __init__(self, id, updates_left, interval=1):
+        self.id = id
+        self.updates_left = updates_left
+        self.updates = 0
+        self.status = 'game_started'
+        self.stopped = asyncio.Event()
+        self.ticks_left = 0
+        self.handing_off = False
+        self.interval = interval
+        self.game_logic = MagicMock()
+
+    def update_interval(self, backoff=1):
+        return self.interval * backoff
+
+    def act_bots(self):
+        pass
+
+    async def update(self):
+        self.updates += 1
+        self.updates_left -= 1
+        if self.updates_left == 0:
+            self.status = 'game_over'
+
+
+class TickSchedulerTests(SimpleTestCase):
+    """Test the shared game tick scheduler"""
+
+    def setUp(self):
+        TickScheduler.games = {}
+        TickScheduler.backoff = 1
+
+    async def test_tick_advances_every_game(self):
+        games = [FakeGame(i, 5) for i in range(3)]
+        for game in games:
+            TickScheduler.games[game.id] = game
+        await TickScheduler.tick()
+        self.assertEqual([game.updates for game in games], [1, 1, 1])
+        self.assertEqual(TickScheduler.tick_games, 3)
+        self.assertGreaterEqual(TickScheduler.tick_duration, 0)
+
+    async def test_tick_releases_finished_games(self):
+        short = FakeGame('short', 1)
+        long = FakeGame('long', 2)
+        TickScheduler.games = {'short': short, 'long': long}
+        await TickScheduler.tick()
+        self.assertTrue(short.stopped.is_set())
+        self.assertFalse(long.stopped.is_set())
+        self.assertEqual(list(TickScheduler.games), ['long'])
+        await TickScheduler.tick()
+        self.assertTrue(long.stopped.is_set())
+        self.assertEqual(TickScheduler.tick_games, 1)
+
+    async def test_tick_follows_update_interval(self):
+        every_tick = FakeGame('every', 100)
+        every_third = FakeGame('third', 100, interval=3)
+        TickScheduler.games = {'every': every_tick, 'third': every_third}
+        for _ in range(6):
+            await TickScheduler.tick()
+        self.assertEqual((every_tick.updates, every_third.updates), (6, 2))
+
+    async def test_batch_physics_steps_due_games(self):
+        physics = MagicMock()
+        every_tick = FakeGame('every', 100)
+        every_third = FakeGame('third', 100, interval=3)
+        handed = FakeGame('handed', 100)
+        handed.handing_off = True
+        TickScheduler.games = {
+            'every': every_tick, 'third': every_third, 'handed': handed
+        }
+        with patch.object(TickScheduler, 'physics', physics):
+            for _ in range(2):
+                await TickScheduler.tick()
+        self.assertEqual(
+            [args[0] for args, _ in physics.update.call_args_list],
+            [
+                [every_tick.game_logic, every_third.game_logic],
+                [every_tick.game_logic]
+            ]
+        )
+        handed.game_logic.update.assert_not_called()
+
+    async def test_batch_physics_failure_fails_batch(self):
+        physics = MagicMock()
+        physics.update.side_effect = ValueError('broken batch')
+        games = [FakeGame(i, 100) for i in range(2)]
+        TickScheduler.games = {game.id: game for game in games}
+        with patch.object(TickScheduler, 'physics', physics):
+            await TickScheduler.tick()
+        self.assertEqual(
+            [game.status for game in games], ['game_over', 'game_over']
+        )
+        self.assertTrue(all(game.stopped.is_set() for game in games))
+        self.assertEqual(TickScheduler.games, {})
+
+    async def test_simulation_time_once_per_tick(self):
+        metrics = MagicMock()
+        for physics in [None, MagicMock()]:
+            metrics.reset_mock()
+            TickScheduler.games = {
+                i: FakeGame(i, 100) for i in range(3)
+            }
+            with patch.object(TickScheduler, 'physics', physics), \
+                    patch('game.consumers.metrics', metrics):
+                await TickScheduler.tick()
+            observed = [
+                args[0] for args, _ in metrics.observe.call_args_list
+            ]
+            self.assertEqual(observed.count('simulation_time'), 1)
+
+    async def test_loop_survives_failing_tick(self):
+        ticked = asyncio.Event()
+        calls = []
+
+        async def tick():
+            calls.append(None)
+            if len(calls) == 1:
+                raise RuntimeError('tick failed')
+            if len(calls) == 3:
+                ticked.set()
+        metrics = MagicMock()
+        with patch.object(TickScheduler, 'tick', tick), \
+                patch('game.consumers.metrics', metrics):
+            task = asyncio.create_task(TickScheduler.loop())
+            try:
+                await asyncio.wait_for(ticked.wait(), 1)
+            finally:
+                task.cancel()
+        metrics.increment.assert_called_once_with('update_errors')
+
+    def test_backoff(self):
+        TickScheduler.adjust_backoff(0.9)
+        TickScheduler.adjust_backoff(0.5)
+        self.assertEqual(TickScheduler.backoff, 2)
+        for _ in range(consumers.MAX_BACKOFF):
+            TickScheduler.adjust_backoff(0.9)
+        self.assertEqual(TickScheduler.backoff, consumers.MAX_BACKOFF)
+        TickScheduler.adjust_backoff(0.1)
+        self.assertEqual(TickScheduler.backoff, consumers.MAX_BACKOFF - 1)
+
+
+class UpdateIntervalTests(SimpleTestCase):
+    """Test the per-match update rate"""
+
+    def setUp(self):
+        self.game = Game('interval')
+        self.game.game_logic = GameLogic(
+            480, 360, 5, 200, 60, 60, 300, 60, 1.5, 3, 15, 500, seed=1
+        )
+        self.logic = self.game.game_logic
+        self.logic.paused = False
+        self.logic.ball.center_at(240, 180)
+        self.logic.ball.set_angle(0)
+
+    def test_paused(self):
+        self.logic.paused = True
+        self.assertEqual(
+            self.game.update_interval(), consumers.PAUSE_TICKS
+        )
+
+    def test_slow_and_fast_rally(self):
+        self.assertEqual(self.game.update_interval(), consumers.SLOW_TICKS)
+        self.logic.ball.px_per_sec = 400
+        self.assertEqual(self.game.update_interval(), consumers.PLAY_TICKS)
+
+    def test_near_paddle(self):
+        self.logic.ball.move_at(460, 180)
+        self.assertEqual(
+            self.game.update_interval(), consumers.NEAR_PADDLE_TICKS
+        )
+        self.logic.ball.set_angle(180)
+        self.assertEqual(self.game.update_interval(), consumers.SLOW_TICKS)
+
+    def test_backoff_is_bounded(self):
+        self.logic.paused = True
+        self.assertEqual(
+            self.game.update_interval(backoff=3), consumers.MAX_TICKS
+        )
+
+
+@patch('game.consumers.Game.end', new_callable=AsyncMock)
+@patch('game.consumers.TickScheduler.run', new_callable=AsyncMock)
+class GameWaitTests(SimpleTestCase):
+    """Test the waiting phase before both players joined"""
+
+    async def test_game_starts_when_players_join(self, run, end):
+        game = Game('wait')
+        await game.start()
+        game.add_player('a', 'left', 'w', 's')
+        await asyncio.sleep(0.01)
+        self.assertEqual(game.status, 'waiting_for_players')
+        await asyncio.to_thread(game.add_player, 'b', 'right', 'w', 's')
+        await asyncio.sleep(0.01)
+        self.assertEqual(game.status, 'game_started')
+        self.assertIsNotNone(game.game_logic)
+        run.assert_awaited_once_with(game)
+
+    async def test_wait_wakes_on_disconnect(self, run, end):
+        game = Game('disconnect')
+        await game.start()
+        game.add_player('a', 'left', 'w', 's')
+        await asyncio.sleep(0.01)
+        game.disconnect_player('a')
+        await asyncio.sleep(0.01)
+        self.assertEqual(game.status, 'left_player_disconnected')
+        end.assert_awaited_once()
+
+    @patch('game.consumers.FORFEIT_TIME', 0.05)
+    async def test_wait_forfeits_after_deadline(self, run, end):
+        game = Game('forfeit')
+        await game.start()
+        game.add_player('a', 'left', 'w', 's')
+        await asyncio.sleep(0.01)
+        self.assertEqual(game.status, 'waiting_for_players')
+        await asyncio.sleep(0.1)
+        self.assertEqual(game.status, 'player_forfeited')
+        run.assert_not_awaited()
+        end.assert_awaited_once()
+
+
+class KeyEventRoutingTests(SimpleTestCase):
+    """Test that key events reach only the sender's game"""
+
+    async def test_receive_moves_own_paddle(self):
+        games = [Game(f'route_{i}') for i in range(3)]
+        for i, game in enumerate(games):
+            game.add_player(f'left_{i}', 'left', 'w', 's')
+            game.add_player(f'right_{i}', 'right', 'ArrowUp', 'ArrowDown')
+            game.game_logic = MagicMock()
+        consumer = GamePlayerConsumer()
+        consumer.id = 'right_1'
+        await consumer.receive(json.dumps({
+            'messageType': 'key_event_message',
+            'key': 'ArrowUp',
+            'event': 'keydown'
+        }))
+        games[1].game_logic.trigger_move.assert_called_once_with(
+            'right', 'up'
+        )
+        games[0].game_logic.trigger_move.assert_not_called()
+        games[2].game_logic.trigger_move.assert_not_called()
+
+    async def test_server_messages_dropped(self):
+        consumer = GamePlayerConsumer()
+        consumer.id = 'a'
+        consumer.game_id = 'dropped'
+        consumer.channel_layer = AsyncMock()
+        for message_type in ['redirect_message', 'endgame_message']:
+            await consumer.receive(json.dumps({'messageType': message_type}))
+        consumer.channel_layer.group_send.assert_not_called()
+
+    def test_index_follows_players(self):
+        game = Game('index')
+        game.add_player('a', 'left', 'w', 's')
+        self.assertEqual(GamePlayerConsumer.participants['a'], (game, 'left'))
+        game.disconnect_player('a')
+        self.assertNotIn('a', GamePlayerConsumer.participants)
+
+
+class NotifyPlayersTests(SimpleTestCase):
+    """Test that game frames are encoded once for every recipient"""
+
+    async def test_same_frame_for_every_player(self):
+        channel_layer = AsyncMock()
+        game = Game('notify')
+        game.add_player('a', 'left', 'w', 's', channel_layer, 'chan.a')
+        game.add_player('b', 'right', 'w', 's', channel_layer, 'chan.b')
+        game.add_player('c', 'spare', 'w', 's', channel_layer, 'chan.c')
+        message = game.generate_message('update_message')
+        with patch('game.consumers.json.dumps', wraps=json.dumps) as dumps:
+            await game.notify_players(message)
+        dumps.assert_called_once_with(message)
+        self.assertEqual(channel_layer.send.await_count, 2)
+        (left, _), (right, _) = channel_layer.send.await_args_list
+        self.assertEqual(left[0], 'chan.a')
+        self.assertEqual(right[0], 'chan.b')
+        self.assertIs(left[1], right[1])
+        self.assertEqual(left[1]['type'], 'update_message')
+        self.assertEqual(json.loads(left[1]['text']), message)
+
+    async def test_one_frame_per_format(self):
+        channel_layer = AsyncMock()
+        game = Game('formats')
+        game.add_player(
+            'a', 'left', 'w', 's', channel_layer, 'chan.a', protocol.BINARY
+        )
+        game.add_player('b', 'right', 'w', 's', channel_layer, 'chan.b')
+        await game.notify_players(game.generate_message('update_message'))
+        (left, _), (right, _) = channel_layer.send.await_args_list
+        self.assertIn('bytes', left[1])
+        self.assertIn('text', right[1])
+
+
+class SpectatorTests(SimpleTestCase):
+    """Test the shared fan-out of frames to spectators"""
+
+    async def test_one_group_send_per_group(self):
+        channel_layer = AsyncMock()
+        game = Game('spectated')
+        game.add_player('a', 'left', 'w', 's', channel_layer, 'chan.a')
+        for i in range(3):
+            await game.add_spectator(
+                channel_layer, f'spec.{i}', protocol.JSON, 0
+            )
+        await game.add_spectator(channel_layer, 'spec.b', protocol.BINARY, 0)
+        self.assertEqual(len(game.spectators), 2)
+        self.assertEqual(channel_layer.group_add.await_count, 4)
+
+        message = game.generate_message('update_message')
+        with patch('game.consumers.json.dumps', wraps=json.dumps) as dumps:
+            await game.notify_players(message)
+        dumps.assert_called_once_with(message)
+        self.assertEqual(channel_layer.group_send.await_count, 2)
+        (json_group, _), (binary_group, _) = \
+            channel_layer.group_send.await_args_list
+        self.assertIs(json_group[1], channel_layer.send.await_args[0][1])
+        self.assertIn('bytes', binary_group[1])
+
+    async def test_remove_spectator(self):
+        game = Game('spectated')
+        name = await game.add_spectator(
+            AsyncMock(), 'spec.a', protocol.JSON, 5
+        )
+        game.remove_spectator(name, 'spec.a')
+        self.assertEqual(game.spectators, {})
+
+    def test_reduced_rate(self):
+        group = SpectatorGroup('group', protocol.JSON, 10)
+        update = {'type': 'update_message'}
+        sent = [
+            tick for tick in range(34)
+            if group.due(update, tick * 0.03)
+        ]
+        self.assertEqual(len(sent), 10)
+        self.assertTrue(group.due({'type': 'endgame_message'}, 1.0))
+
+    def test_spectator_rate(self):
+        self.assertEqual(spectator_rate(None), 0)
+        self.assertEqual(spectator_rate('100'), 0)
+        self.assertEqual(spectator_rate('12'), 10)
+        self.assertEqual(spectator_rate('0.2'), 1)
+        self.assertEqual(spectator_rate('fast'), 0)
+
+
+@override_settings(MAX_GAMES=2)
+@patch('game.consumers.ResultOutbox.start_loop', new_callable=AsyncMock)
+@patch(
+    'game.consumers.GamePlayerConsumer.start_clean_loop',
+    new_callable=AsyncMock
+)
+class AdmissionTests(SimpleTestCase):
+    """Test refusing new games when the shard is full"""
+
+    def setUp(self):
+        GamePlayerConsumer.games = {}
+        TickScheduler.backoff = 1
+        TickScheduler.load = 0
+        self.addCleanup(setattr, GamePlayerConsumer, 'games', {})
+        self.addCleanup(setattr, TickScheduler, 'backoff', 1)
+        self.addCleanup(setattr, TickScheduler, 'load', 0)
+
+    def create(self, game_id):
+        return self.client.put(reverse('game', args=[game_id]), secure=True)
+
+    def test_full(self, start_clean_loop, start_loop):
+        self.assertEqual(self.create('1').status_code, 200)
+        self.assertEqual(self.create('2').status_code, 200)
+        response = self.create('3')
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(
+            response['Retry-After'], str(consumers.RETRY_AFTER)
+        )
+        self.assertNotIn('3', GamePlayerConsumer.games)
+        # Known games are not refused, ended ones no longer count
+        self.assertEqual(self.create('2').status_code, 200)
+        GamePlayerConsumer.games['1'].status = 'game_ended'
+        self.assertEqual(self.create('3').status_code, 200)
+
+    def test_overloaded(self, start_clean_loop, start_loop):
+        TickScheduler.backoff = consumers.MAX_BACKOFF
+        TickScheduler.load = 0.9
+        self.assertEqual(self.create('1').status_code, 503)
+        TickScheduler.load = 0.5
+        self.assertEqual(self.create('1').status_code, 200)
+
+    def test_load(self, start_clean_loop, start_loop):
+        self.create('1')
+        TickScheduler.lag = 0.002
+        self.addCleanup(setattr, TickScheduler, 'lag', 0)
+        data = self.client.get(reverse('load'), secure=True).json()
+        self.assertEqual(data['games'], 1)
+        self.assertEqual(data['max_games'], 2)
+        self.assertEqual(data['tick_lag'], 0.002)
+        self.assertTrue(data['accepting'])
+        self.create('2')
+        data = self.client.get(reverse('load'), secure=True).json()
+        self.assertFalse(data['accepting'])
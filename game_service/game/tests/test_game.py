@@ -1,5 +1,8 @@
+import math
+from unittest.mock import patch
+
 from django.test import SimpleTestCase
-from game.game import Game
+from game.game import GameLogic
 
 
 class GameTests(SimpleTestCase):
@@ -15,9 +18,12 @@ class GameTests(SimpleTestCase):
     PADDLE_AMPLITUDE = 60   # Degrees
     PAUSE_TIME = 1.5        # Seconds
     UPDATE_TIME = 0.03      # Seconds
+    MAX_POINTS = 3
+    ACCELERATOR = 15        # Pixels per second
+    MAX_ACCELERATION = 500  # Pixels per second
 
     def setUp(self):
-        self.game = Game(
+        self.game = GameLogic(
             self.PITCH_WIDTH,
             self.PITCH_HEIGHT,
             self.BALL_SIZE,
@@ -26,19 +32,22 @@ class GameTests(SimpleTestCase):
             self.PADDLE_SIZE,
             self.PADDLE_MOVES,
             self.PADDLE_AMPLITUDE,
-            self.PAUSE_TIME
+            self.PAUSE_TIME,
+            self.MAX_POINTS,
+            self.ACCELERATOR,
+            self.MAX_ACCELERATION
         )
 
     def test_handle_wall_collision(self):
         self.game.ball.move_at(self.game.pitch.left, self.game.pitch.top)
-        self.game.ball.angle = 200
+        self.game.ball.set_angle(200)
         self.game.ball.handle_wall_collisions(self.game.pitch)
         self.assertEqual(self.game.ball.angle, 160)
         self.game.ball.move_at(
             self.game.pitch.get_center_x(),
             self.game.pitch.bottom - (self.game.ball.height - 1)
         )
-        self.game.ball.angle = 30
+        self.game.ball.set_angle(30)
         self.game.ball.handle_wall_collisions(self.game.pitch)
         self.assertEqual(self.game.ball.angle, 330)
 
@@ -50,3 +59,133 @@ class GameTests(SimpleTestCase):
         )
         self.game.ball.handle_paddle_collision(self.game.player['left'].paddle)
         self.assertEqual(self.game.ball.angle, (-27.5 * 60 / 33) % 360)
+
+    def test_cached_direction(self):
+        self.game.ball.set_angle(60)
+        self.assertAlmostEqual(self.game.ball.d_x, 0.5)
+        self.assertAlmostEqual(self.game.ball.d_y, math.sqrt(3) / 2)
+        self.assertFalse(hasattr(self.game.ball, '__dict__'))
+        paddle = self.game.player['left'].paddle
+        paddle.set_move_up()
+        self.assertEqual((paddle.d_x, paddle.d_y), (0, -1))
+
+    def test_edges_follow_moves(self):
+        ball = self.game.ball
+        for move in [
+            lambda: ball.move_at(10, 20),
+            lambda: ball.move_of(1.5, -2),
+            lambda: ball.center_at(100, 50),
+            lambda: ball.update_position(self.UPDATE_TIME, self.game.pitch),
+        ]:
+            move()
+            self.assertEqual(ball.right, ball.left + ball.width - 1)
+            self.assertEqual(ball.bottom, ball.top + ball.height - 1)
+
+    def test_trigger_move(self):
+        paddle = self.game.player['right'].paddle
+        self.game.trigger_move('right', 'up')
+        self.assertEqual((paddle.angle, paddle.px_per_sec), (270, 300))
+        self.game.trigger_move('right', 'down_off')
+        self.assertEqual(paddle.px_per_sec, 300)
+        self.game.trigger_move('right', 'up_off')
+        self.assertEqual(paddle.px_per_sec, 0)
+        self.game.trigger_move('middle', 'up')
+        self.game.trigger_move('left', 'sideways')
+        self.assertEqual(self.game.player['left'].paddle.px_per_sec, 0)
+
+
+class FixedTimestepTests(SimpleTestCase):
+    """Test the fixed timestep simulation"""
+
+    TIME_STEP = 1 / 128
+
+    def create_game(self, max_steps=10):
+        return GameLogic(
+            480, 360, 5, 200, 60, 60, 300, 60, 1.5, 3, 15, 500,
+            time_step=self.TIME_STEP,
+            max_steps=max_steps,
+            seed=1
+        )
+
+    def play(self, tick_times):
+        now = [1000.0]
+        with patch('time.time', lambda: now[0]):
+            game = self.create_game()
+            game.start()
+            for tick_time in tick_times:
+                now[0] += tick_time
+                game.update()
+        return game
+
+    def state(self, game):
+        return (
+            game.steps,
+            game.ball.left,
+            game.ball.top,
+            game.ball.angle,
+            game.player['left'].score,
+            game.player['right'].score,
+        )
+
+    def test_outcome_independent_of_tick_rate(self):
+        regular = self.play([4 / 128] * 300)
+        stretched = self.play([8 / 128, 10 / 128, 6 / 128] * 50)
+        self.assertEqual(regular.steps, 1200)
+        self.assertEqual(self.state(regular), self.state(stretched))
+
+    def test_catch_up_is_bounded(self):
+        now = [1000.0]
+        with patch('time.time', lambda: now[0]):
+            game = self.create_game(max_steps=5)
+            game.start()
+            now[0] += 1
+            game.update()
+        self.assertEqual(game.steps, 5)
+        self.assertLess(game.accumulator, self.TIME_STEP)
+
+
+class SweptCollisionTests(SimpleTestCase):
+    """Test collisions resolved at their time of impact"""
+
+    def create_game(self, swept_collisions=True):
+        game = GameLogic(
+            480, 360, 5, 200, 60, 60, 300, 60, 1.5, 3, None, 500,
+            swept_collisions=swept_collisions
+        )
+        game.start()
+        game.paused = False
+        return game
+
+    def test_bounce_off_paddle_within_step(self):
+        game = self.create_game()
+        paddle = game.player['left'].paddle
+        paddle.move_at(paddle.left, 170)
+        game.ball.move_at(100, 190)
+        game.ball.set_angle(180)
+        game.ball.px_per_sec = 1000
+        game.step(0.25)
+        self.assertEqual(game.player['right'].score, 0)
+        self.assertGreater(math.cos(math.radians(game.ball.angle)), 0)
+        self.assertGreater(game.ball.left, 100)
+
+    def test_paddle_position_at_time_of_impact(self):
+        for swept_collisions, score in [(True, 1), (False, 0)]:
+            game = self.create_game(swept_collisions)
+            paddle = game.player['left'].paddle
+            paddle.move_at(paddle.left, 100)
+            game.trigger_move('left', 'down')
+            game.ball.move_at(100, 200)
+            game.ball.set_angle(180)
+            game.ball.px_per_sec = 1000
+            game.step(0.2)
+            self.assertEqual(game.player['right'].score, score)
+
+    def test_bounce_off_wall_within_step(self):
+        game = self.create_game()
+        game.ball.move_at(200, 10)
+        game.ball.set_angle(270)
+        game.ball.px_per_sec = 100
+        game.step(0.2)
+        self.assertEqual(game.ball.angle, 90)
+        self.assertAlmostEqual(game.ball.top, 10)
+        self.assertAlmostEqual(game.ball.left, 200)
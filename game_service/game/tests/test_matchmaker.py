@@ -0,0 +1,102 @@
+import asyncio
+import json
+
+import httpx
+from django.test import SimpleTestCase
+from game.consumers import Game
+from game.matchmaker import MatchmakerClient
+from unittest.mock import patch
+
+
+class FakeMatchmaker:
+    def __init__(self, rejected=0):
+        self.rejected = rejected
+        self.tokens = 0
+        self.results = []
+
+    def __call__(self, request):
+        if request.url.path == '/get-csrf-token/':
+            self.tokens += 1
+            return httpx.Response(
+                200,
+                json={'csrfToken': f'token{self.tokens}'},
+                headers={'Set-Cookie': f'csrftoken=cookie{self.tokens}'}
+            )
+        if self.rejected > 0:
+            self.rejected -= 1
+            return httpx.Response(403)
+        self.results.append((
+            request.headers['X-CSRFToken'],
+            request.headers['Cookie'],
+            json.loads(request.content)
+        ))
+        return httpx.Response(200, json={'message': 'ok'})
+
+
+class MatchmakerClientTests(SimpleTestCase):
+    """Tests for the shared matchmaker-service client"""
+
+    def post(self, client, count=1):
+        async def run():
+            responses = [
+                await client.post('/api/games/result/', {'game_id': i})
+                for i in range(count)
+            ]
+            await client.close()
+            return responses
+        return asyncio.run(run())
+
+    def test_csrf_token_is_reused(self):
+        server = FakeMatchmaker()
+        client = MatchmakerClient(transport=httpx.MockTransport(server))
+        responses = self.post(client, 3)
+        self.assertEqual([r.status_code for r in responses], [200] * 3)
+        self.assertEqual(server.tokens, 1)
+        self.assertEqual(
+            [result[:2] for result in server.results],
+            [('token1', 'csrftoken=cookie1')] * 3
+        )
+
+    def test_csrf_token_is_refreshed_on_403(self):
+        server = FakeMatchmaker(rejected=1)
+        client = MatchmakerClient(transport=httpx.MockTransport(server))
+        response, = self.post(client)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(server.tokens, 2)
+        self.assertEqual(
+            server.results,
+            [('token2', 'csrftoken=cookie2', {'game_id': 0})]
+        )
+
+    def test_retries_once(self):
+        server = FakeMatchmaker(rejected=5)
+        client = MatchmakerClient(transport=httpx.MockTransport(server))
+        response, = self.post(client)
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(server.tokens, 2)
+
+    def test_client_closed_when_loop_changes(self):
+        client = MatchmakerClient(transport=httpx.MockTransport(
+            FakeMatchmaker()
+        ))
+
+        async def get_client():
+            return await client.get_client()
+        first = asyncio.run(get_client())
+        second = asyncio.run(get_client())
+        self.assertIsNot(first, second)
+        self.assertTrue(first.is_closed)
+        self.assertFalse(second.is_closed)
+
+    def test_submit_result(self):
+        game = Game('game1')
+        game.player = {'left': object()}
+        game.status = 'player_forfeited'
+        with patch('game.consumers.ResultOutbox.add') as add:
+            asyncio.run(game.submit_result())
+        add.assert_called_once_with({
+            'game_id': 'game1',
+            'left_score': 3,
+            'right_score': 0,
+            'status': 'player_forfeited'
+        })
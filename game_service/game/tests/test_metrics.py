@@ -0,0 +1,65 @@
+import asyncio
+from unittest.mock import patch
+
+from django.test import SimpleTestCase
+from django.urls import reverse
+from game.consumers import TickScheduler
+from game.metrics import Histogram, Metrics
+from .test_consumers import FakeGame
+
+
+class HistogramTests(SimpleTestCase):
+    """Tests for the fixed bucket histograms"""
+
+    def test_observe(self):
+        histogram = Histogram((1, 2, 4))
+        for value in [0.5, 1, 1.5, 3, 10]:
+            histogram.observe(value)
+        self.assertEqual(histogram.counts, [2, 1, 1, 1])
+        self.assertEqual(histogram.count, 5)
+        self.assertEqual(histogram.sum, 16)
+        self.assertEqual(histogram.max, 10)
+
+    def test_quantile(self):
+        histogram = Histogram((1, 2, 4))
+        self.assertIsNone(histogram.quantile(0.5))
+        for value in [0.5] * 90 + [3] * 9 + [6]:
+            histogram.observe(value)
+        self.assertEqual(histogram.quantile(0.5), 1)
+        self.assertEqual(histogram.quantile(0.99), 4)
+        self.assertEqual(histogram.quantile(1), 6)
+
+    def test_to_dict(self):
+        histogram = Histogram((1, 2))
+        histogram.observe(1.5)
+        data = histogram.to_dict()
+        self.assertEqual(data['buckets'], {'1': 0, '2': 1, 'inf': 0})
+        self.assertEqual(data['p50'], 1.5)
+
+
+class MetricsTests(SimpleTestCase):
+    """Tests for the tick loop instrumentation"""
+
+    def setUp(self):
+        TickScheduler.games = {}
+        self.metrics = Metrics()
+        patcher = patch('game.consumers.metrics', self.metrics)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_tick(self):
+        TickScheduler.games = {'1': FakeGame('1', 2)}
+        asyncio.run(TickScheduler.tick())
+        self.assertEqual(self.metrics.counters['ticks'], 1)
+        self.assertEqual(
+            self.metrics.histograms['tick_duration'].count, 1
+        )
+
+    def test_endpoint(self):
+        with patch('game.views.metrics', self.metrics):
+            response = self.client.get(reverse('metrics'), secure=True)
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data['live_games'], 0)
+        self.assertIn('tick_lag', data['histograms'])
+        self.assertEqual(data['counters']['ticks'], 0)
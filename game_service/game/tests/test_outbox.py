@@ -0,0 +1,151 @@
+import asyncio
+from datetime import timedelta
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from django.test import TransactionTestCase
+from django.utils import timezone
+from game import outbox
+from game.models import PendingResult
+from game.outbox import ResultOutbox
+
+
+def result(game_id, left_score=3, right_score=1):
+    return {
+        'game_id': game_id,
+        'left_score': left_score,
+        'right_score': right_score,
+        'status': 'game_over'
+    }
+
+
+def response(status_code):
+    return MagicMock(status_code=status_code, reason_phrase='')
+
+
+class ResultOutboxTests(TransactionTestCase):
+    """Tests for the durable outbox of game results"""
+
+    def drain(self, *status_codes):
+        post = AsyncMock(side_effect=[response(s) for s in status_codes])
+        with patch('game.matchmaker.client.post', post):
+            asyncio.run(ResultOutbox.drain())
+        return post
+
+    def test_batched_delivery(self):
+        outbox.store(result('game1'))
+        outbox.store(result('game2'))
+        post = self.drain(200)
+        post.assert_called_once_with(outbox.BULK_PATH, {
+            'results': [result('game1'), result('game2')]
+        })
+        self.assertFalse(PendingResult.objects.exists())
+
+    def test_single_fallback(self):
+        outbox.store(result('game1'))
+        outbox.store(result('game2'))
+        post = self.drain(404, 200, 500)
+        self.assertEqual(post.call_count, 3)
+        self.assertEqual(post.call_args_list[1].args[0], outbox.SINGLE_PATH)
+        self.assertEqual(
+            list(PendingResult.objects.values_list('game_id', flat=True)),
+            ['game2']
+        )
+
+    def test_backoff(self):
+        outbox.store(result('game1'))
+        for attempts in range(1, 4):
+            self.drain(503)
+            pending = PendingResult.objects.get()
+            self.assertEqual(pending.attempts, attempts)
+            delay = pending.next_attempt_at - timezone.now()
+            self.assertAlmostEqual(
+                delay.total_seconds(),
+                outbox.BACKOFF_TIME * 2 ** (attempts - 1),
+                delta=0.5
+            )
+            self.assertEqual(outbox.claim(), [])
+            pending.next_attempt_at = timezone.now()
+            pending.save()
+
+    def test_retried_at_max_backoff(self):
+        outbox.store(result('game1'))
+        PendingResult.objects.update(attempts=1000)
+        self.drain(500)
+        pending = PendingResult.objects.get()
+        self.assertEqual(pending.attempts, 1001)
+        delay = pending.next_attempt_at - timezone.now()
+        self.assertAlmostEqual(
+            delay.total_seconds(), outbox.MAX_BACKOFF, delta=0.5
+        )
+
+    def test_failed_batch_split(self):
+        for game_id in ['game1', 'game2', 'game3']:
+            outbox.store(result(game_id))
+        post = self.drain(500, 200, 500, 200, 500)
+        self.assertEqual(
+            [len(call.args[1]['results']) for call in post.call_args_list],
+            [3, 1, 2, 1, 1]
+        )
+        self.assertEqual(
+            list(PendingResult.objects.values_list('game_id', flat=True)),
+            ['game3']
+        )
+
+    def drain_slowly(self, *status_codes):
+        # Every request takes 8 seconds
+        clock = [0]
+
+        async def post(path, data):
+            clock[0] += 8
+            return response(status_codes[post.await_count - 1])
+        post = AsyncMock(side_effect=post)
+        with patch('game.matchmaker.client.post', post), \
+                patch('game.outbox.time.monotonic', lambda: clock[0]):
+            asyncio.run(ResultOutbox.drain())
+        return post
+
+    def test_split_stops_within_lease(self):
+        for game_id in ['game1', 'game2', 'game3']:
+            outbox.store(result(game_id))
+        post = self.drain_slowly(500, 500, 500)
+        self.assertEqual(
+            [len(call.args[1]['results']) for call in post.call_args_list],
+            [3, 1, 2]
+        )
+        self.assertEqual(
+            set(PendingResult.objects.values_list('attempts', flat=True)),
+            {1}
+        )
+
+    def test_single_fallback_stops_within_lease(self):
+        for game_id in ['game1', 'game2', 'game3']:
+            outbox.store(result(game_id))
+        post = self.drain_slowly(404, 200, 200)
+        self.assertEqual(post.call_count, 3)
+        self.assertEqual(
+            list(PendingResult.objects.values_list('game_id', flat=True)),
+            ['game3']
+        )
+
+    def test_unavailable_batch_not_split(self):
+        outbox.store(result('game1'))
+        outbox.store(result('game2'))
+        post = self.drain(503)
+        post.assert_called_once()
+        self.assertEqual(PendingResult.objects.count(), 2)
+
+    def test_claim_leases_results(self):
+        outbox.store(result('game1'))
+        claimed = outbox.claim()
+        self.assertEqual([r.game_id for r in claimed], ['game1'])
+        self.assertEqual(outbox.claim(), [])
+        PendingResult.objects.update(
+            next_attempt_at=timezone.now() - timedelta(seconds=1)
+        )
+        self.assertEqual(len(outbox.claim()), 1)
+
+    def test_store_is_idempotent(self):
+        outbox.store(result('game1', 1, 2))
+        outbox.store(result('game1', 3, 2))
+        pending = PendingResult.objects.get()
+        self.assertEqual(pending.left_score, 3)
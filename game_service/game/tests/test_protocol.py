@@ -0,0 +1,119 @@
+import json
+
+from django.test import SimpleTestCase
+from game import protocol
+
+
+class ProtocolTests(SimpleTestCase):
+    """Test game frame encodings"""
+
+    def setUp(self):
+        self.message = {
+            'type': 'update_message',
+            'time': 12.5,
+            'ballX': 236.5,
+            'ballY': 177.5,
+            'paddleLeft': 150,
+            'paddleRight': 42.25,
+            'scoreLeft': 2,
+            'scoreRight': 1,
+            'status': 'game_started',
+        }
+
+    def test_json_is_default(self):
+        frame = protocol.encode(self.message)
+        self.assertEqual(frame['type'], 'update_message')
+        self.assertEqual(json.loads(frame['text']), self.message)
+
+    def test_binary_round_trip(self):
+        frame = protocol.encode(self.message, protocol.BINARY)
+        self.assertEqual(len(frame['bytes']), protocol.BINARY_FRAME.size)
+        self.assertLess(
+            len(frame['bytes']) * 5, len(json.dumps(self.message))
+        )
+        self.assertEqual(protocol.decode_binary(frame['bytes']), self.message)
+
+    def test_binary_placeholders(self):
+        self.message.update({
+            'type': 'endgame_message',
+            'time': '-',
+            'ballX': '-',
+            'ballY': '-',
+            'paddleLeft': 'not connected',
+            'scoreLeft': '-',
+            'status': 'player_forfeited',
+        })
+        frame = protocol.encode(self.message, protocol.BINARY)
+        decoded = protocol.decode_binary(frame['bytes'])
+        self.assertEqual(decoded['type'], 'endgame_message')
+        self.assertIsNone(decoded['time'])
+        self.assertIsNone(decoded['ballX'])
+        self.assertIsNone(decoded['paddleLeft'])
+        self.assertIsNone(decoded['scoreLeft'])
+        self.assertEqual(decoded['scoreRight'], 1)
+        self.assertEqual(decoded['status'], 'player_forfeited')
+
+    def test_initial_message_stays_json(self):
+        message = {'type': 'initial_message', 'width': 480}
+        frame = protocol.encode(message, protocol.BINARY)
+        self.assertEqual(json.loads(frame['text']), message)
+
+
+class DeltaTests(SimpleTestCase):
+    """Test delta-compressed update streams"""
+
+    def setUp(self):
+        self.encoder = protocol.DeltaEncoder(keyframe_interval=10)
+        self.decoder = protocol.DeltaDecoder()
+
+    def message(self, tick, score_left=0, status='game_started'):
+        return {
+            'type': 'update_message',
+            'time': tick * 0.03,
+            'ballX': 100 + tick,
+            'ballY': 100 - tick,
+            'paddleLeft': 150,
+            'paddleRight': 150 + (tick // 5),
+            'scoreLeft': score_left,
+            'scoreRight': 0,
+            'status': status,
+        }
+
+    def test_stream_reconstructs_messages(self):
+        full_size = 0
+        delta_size = 0
+        for tick in range(50):
+            message = self.message(tick, score_left=tick // 20)
+            frame = self.encoder.encode(message)
+            self.assertEqual(self.decoder.decode(frame['text']), message)
+            full_size += len(json.dumps(message))
+            delta_size += len(frame['text'])
+        self.assertLess(delta_size, full_size * 0.75)
+
+    def test_keyframes(self):
+        keyframes = []
+        for tick in range(25):
+            message = self.message(tick, score_left=1 if tick >= 13 else 0)
+            frame = json.loads(self.encoder.encode(message)['text'])
+            self.assertEqual(frame['seq'], tick + 1)
+            if frame['keyframe']:
+                keyframes.append(tick)
+        self.assertEqual(keyframes, [0, 10, 13, 23])
+
+    def test_unchanged_fields_are_omitted(self):
+        self.encoder.encode(self.message(0))
+        frame = json.loads(self.encoder.encode(self.message(1))['text'])
+        self.assertNotIn('paddleLeft', frame)
+        self.assertNotIn('scoreLeft', frame)
+        self.assertIn('ballX', frame)
+
+    def test_gap_is_detected(self):
+        self.decoder.decode(self.encoder.encode(self.message(0))['text'])
+        self.encoder.encode(self.message(1))
+        with self.assertRaises(ValueError):
+            self.decoder.decode(
+                self.encoder.encode(self.message(2))['text']
+            )
+        self.encoder.request_keyframe()
+        frame = self.encoder.encode(self.message(3))
+        self.assertEqual(self.decoder.decode(frame['text']), self.message(3))
@@ -0,0 +1,73 @@
+from django.test import SimpleTestCase
+from game.consumers import GAME_CONFIG
+from game.replay import MAX_GAP, ReplayRecorder, parse, replay
+from game.simulation import RandomInputs, TrackingInputs, play_match
+
+
+class RecordedInputs:
+    def __init__(self, inputs):
+        self.inputs = inputs
+        self.recorder = None
+
+    def __call__(self, tick, logic):
+        if self.recorder is None:
+            self.recorder = ReplayRecorder(GAME_CONFIG, logic)
+        trigger_move = logic.trigger_move
+
+        def record(side, move):
+            trigger_move(side, move)
+            self.recorder.record(logic.steps, side, move)
+        logic.trigger_move = record
+        try:
+            self.inputs(tick, logic)
+        finally:
+            del logic.trigger_move
+
+
+class ReplayTests(SimpleTestCase):
+    """Test recording and replaying matches"""
+
+    def assert_same_match(self, logic, replayed):
+        self.assertEqual(replayed.steps, logic.steps)
+        self.assertEqual(replayed.finished, logic.finished)
+        for side in ['left', 'right']:
+            self.assertEqual(
+                replayed.player[side].score, logic.player[side].score
+            )
+            self.assertEqual(
+                replayed.player[side].paddle.top,
+                logic.player[side].paddle.top
+            )
+        self.assertEqual(replayed.ball.left, logic.ball.left)
+        self.assertEqual(replayed.ball.top, logic.ball.top)
+
+    def test_replay_is_exact(self):
+        for seed, inputs in [(1, RandomInputs), (2, TrackingInputs)]:
+            recorded = RecordedInputs(inputs(seed))
+            logic, _ = play_match(GAME_CONFIG, recorded, seed=seed)
+            data = recorded.recorder.finish(logic)
+            self.assert_same_match(logic, replay(data))
+
+    def test_replay_is_compact(self):
+        recorded = RecordedInputs(TrackingInputs(3))
+        logic, ticks = play_match(GAME_CONFIG, recorded, seed=3)
+        data = recorded.recorder.finish(logic)
+        # Tracking presses a key on each side every tick
+        inputs = len(parse(data)['inputs'])
+        self.assertLess(inputs, ticks)
+        self.assertLessEqual(len(data), 400 + 3 * inputs)
+
+    def test_long_gaps(self):
+        logic, _ = play_match(
+            GAME_CONFIG, lambda tick, logic: None, seed=4, max_duration=1
+        )
+        recorder = ReplayRecorder(GAME_CONFIG, logic)
+        recorder.last_step = 0
+        recorder.record(2 * MAX_GAP + 5, 'right', 'down')
+        recorder.record(2 * MAX_GAP + 5, 'left', 'fly')
+        logic.steps = 3 * MAX_GAP
+        recorded = parse(recorder.finish(logic))
+        self.assertEqual(
+            recorded['inputs'], [(2 * MAX_GAP + 5, 'right', 'down')]
+        )
+        self.assertEqual(recorded['steps'], 3 * MAX_GAP)
@@ -0,0 +1,70 @@
+from django.test import SimpleTestCase
+from game.simulation import (
+    RandomInputs,
+    ScriptedInputs,
+    VirtualClock,
+    play_match,
+    run_benchmark,
+)
+
+
+CONFIG = {
+    'pitch_width': 480,
+    'pitch_height': 360,
+    'ball_size': 5,
+    'ball_speed': 200,
+    'start_amplitude': 60,
+    'paddle_size': 60,
+    'paddle_speed': 300,
+    'paddle_amplitude': 60,
+    'pause_duration': 1.5,
+    'max_points': 3,
+    'accelerator': 15,
+    'max_acceleration': 500,
+    'time_step': 0.01,
+    'max_steps': 10,
+    'swept_collisions': True,
+}
+
+
+class SimulationTests(SimpleTestCase):
+    """Test the headless match runner"""
+
+    def test_virtual_clock(self):
+        clock = VirtualClock(5)
+        clock.advance(0.5)
+        self.assertEqual(clock(), 5.5)
+
+    def test_match_is_reproducible(self):
+        first, first_ticks = play_match(CONFIG, RandomInputs(1), seed=1)
+        second, second_ticks = play_match(CONFIG, RandomInputs(1), seed=1)
+        self.assertTrue(first.finished)
+        self.assertEqual(first_ticks, second_ticks)
+        self.assertEqual(
+            (first.player['left'].score, first.player['right'].score),
+            (second.player['left'].score, second.player['right'].score)
+        )
+        self.assertEqual(first.ball.top, second.ball.top)
+
+    def test_scripted_inputs(self):
+        logic, ticks = play_match(
+            CONFIG,
+            ScriptedInputs([(0, 'left', 'up'), (0, 'right', 'down')]),
+            seed=1,
+            max_duration=1
+        )
+        self.assertEqual(ticks, 34)
+        self.assertEqual(logic.player['left'].paddle.top, 0)
+        self.assertEqual(
+            logic.player['right'].paddle.bottom,
+            logic.pitch.bottom
+        )
+
+    def test_benchmark_report(self):
+        report = run_benchmark(CONFIG, matches=3)
+        self.assertEqual(report['matches'], 3)
+        self.assertEqual(report['unfinished'], 0)
+        self.assertGreater(report['ticks_per_sec'], 0)
+        self.assertLessEqual(report['duration_min'], report['duration_p50'])
+        self.assertLessEqual(report['duration_p50'], report['duration_p99'])
+        self.assertLessEqual(report['duration_p99'], report['duration_max'])
@@ -5,7 +5,9 @@ from . import views
 
 # API Endpoints
 # -------------
-# PUT   /api/game/<str:game_id>/    : Create a game
+# PUT   /api/game/<str:game_id>/    : Create a game, 503 while the shard
+#                                     drains or when it is full, with a
+#                                     Retry-After header then
 #
 # GET   /api/game/<str:game_id>/    : Get a game's current state
 #
@@ -16,6 +18,12 @@ from . import views
 #                                       "side": str,    # Required
 #                                   }
 #
+# PUT   /api/bot/<str:game_id>/     : Let a bot play one side of a game
+#                                   {
+#                                       "side": str,    # Required
+#                                       "level": str    # Optional
+#                                   }
+#
 # PUT   /api/control/<str:game_id>/ : Send control message
 #                                   {
 #                                       "side": str,    # Required
@@ -23,9 +31,19 @@ from . import views
 #                                       "event": str,   # Required
 #                                   }
 #
+# GET   /api/load/                  : Live games, tick load and lag, and
+#                                     whether new games are accepted, of
+#                                     the shard answering. Shards are picked
+#                                     by game id, through nginx
+#                                     /game-service/shards/<n>/api/load/
+#                                     reaches shard n.
+#
 # GET   /get-csrf-token/            : Get CSRF token
 #
 # GET   /health/                    : Health check
+#
+# GET   /metrics/                   : Tick loop metrics of the shard
+#                                     answering, see /api/load/
 
 urlpatterns = [
     path(
@@ -43,11 +61,21 @@ urlpatterns = [
         views.Join.as_view(),
         name='join'
     ),
+    path(
+        'api/bot/<str:game_id>/',
+        views.Bot.as_view(),
+        name='bot'
+    ),
     path(
         'api/control/<str:game_id>/',
         views.Control.as_view(),
         name='control'
     ),
+    path(
+        'api/load/',
+        views.Load.as_view(),
+        name='load'
+    ),
     path(
         'get-csrf-token/',
         views.getCsrfToken.as_view(),
@@ -57,5 +85,10 @@ urlpatterns = [
         'health/',
         views.HealthCheck.as_view(),
         name='health'
+    ),
+    path(
+        'metrics/',
+        views.Metrics.as_view(),
+        name='metrics'
     )
 ]
@@ -3,12 +3,15 @@ import logging
 import uuid
 
 from asgiref.sync import async_to_sync
+from django.conf import settings
 from django.http import JsonResponse
 from django.utils.decorators import method_decorator
 from django.views import View
 from django.views.decorators.csrf import ensure_csrf_cookie, csrf_exempt
 
-from .consumers import GamePlayerConsumer
+from . import bot
+from .consumers import GamePlayerConsumer, TickScheduler, RETRY_AFTER
+from .metrics import metrics
 from game_service.utils.decorators import log_request, handle_exceptions
 from game_service.utils.mixins import MethodNotAllowedMixin
 
@@ -16,17 +19,29 @@ from game_service.utils.mixins import MethodNotAllowedMixin
 logger = logging.getLogger('game-service')
 
 
+def unavailable(message):
+    # Refused for now, callers may try again after RETRY_AFTER seconds
+    response = JsonResponse({'message': message}, status=503)
+    response['Retry-After'] = str(RETRY_AFTER)
+    return response
+
+
 @method_decorator(log_request, name='dispatch')
 @method_decorator(handle_exceptions, name='dispatch')
 @method_decorator(csrf_exempt, name='dispatch')
 class Game(MethodNotAllowedMixin, View):
-    # PUT   /api/game/<str:game_id>/    : Create a game
+    # PUT   /api/game/<str:game_id>/    : Create a game, 503 with a
+    #                                     Retry-After header while draining
+    #                                     or full
     # GET   /api/game/<str:game_id>/    : Get a game's current state
 
     def put(self, request, *args, **kwargs):
         game_id = kwargs.get('game_id')
-        async_to_sync(GamePlayerConsumer.create_game)(game_id)
-        game = GamePlayerConsumer.get_game(game_id)
+        if GamePlayerConsumer.draining:
+            return unavailable(f'Shard {settings.SHARD} is draining')
+        game = async_to_sync(GamePlayerConsumer.create_game)(game_id)
+        if not game:
+            return unavailable(f'Shard {settings.SHARD} is full')
         if game.status != 'created':
             return JsonResponse(
                 {'message': f'Game {game_id} already existing'}, status=500
@@ -124,6 +139,58 @@ class Join(MethodNotAllowedMixin, View):
             )
 
 
+@method_decorator(log_request, name='dispatch')
+@method_decorator(handle_exceptions, name='dispatch')
+@method_decorator(csrf_exempt, name='dispatch')
+class Bot(MethodNotAllowedMixin, View):
+    # PUT   /api/bot/<str:game_id>/     : Let a bot play one side of a game
+    #                                   {
+    #                                       "side": str,    # Required
+    #                                       "level": str,   # Optional
+    #                                   }
+
+    def put(self, request, *args, **kwargs):
+        game_id = kwargs.get('game_id')
+        game = GamePlayerConsumer.get_game(game_id)
+        if not game:
+            return JsonResponse(
+                {'message': f'Game {game_id} not existing'}, status=500
+            )
+        elif game.status == 'created':
+            return JsonResponse(
+                {'message': f'Game {game_id} not open yet'}, status=500
+            )
+        elif game.status != 'waiting_for_players':
+            return JsonResponse(
+                {'message': f'Game {game_id} already started'}, status=500
+            )
+
+        data = json.loads(request.body)
+        side = data.get('side')
+        level = data.get('level', bot.DEFAULT_LEVEL)
+        if side not in ['left', 'right']:
+            return JsonResponse(
+                {'message': 'side must be \'left\' or \'right\''},
+                status=500
+            )
+        elif level not in bot.LEVELS:
+            return JsonResponse(
+                {'message': f'level must be one of {list(bot.LEVELS)}'},
+                status=500
+            )
+        elif side in game.player:
+            return JsonResponse(
+                {'message': f'{side} player joined game {game_id} yet'},
+                status=500
+            )
+        else:
+            game.add_bot(side, level)
+            return JsonResponse(
+                {'message': f'{side} bot added to game {game_id}'},
+                status=200
+            )
+
+
 @method_decorator(log_request, name='dispatch')
 @method_decorator(handle_exceptions, name='dispatch')
 @method_decorator(csrf_exempt, name='dispatch')
@@ -157,10 +224,7 @@ class Control(MethodNotAllowedMixin, View):
                 status=500
             )
         else:
-            player = game.player[side]
-            keyname = player.key_to_action.get(key, '')
-            suffix = '_off' if event == 'keyup' else ''
-            game.game_logic.trigger_move(side, keyname + suffix)
+            game.key_event(side, key, event)
             return JsonResponse(
                 {'message': 'Key event registered successfully'},
                 status=200
@@ -180,7 +244,54 @@ class getCsrfToken(MethodNotAllowedMixin, View):
 
 @method_decorator(handle_exceptions, name='dispatch')
 class HealthCheck(MethodNotAllowedMixin, View):
-    # GET /health/ : Returns status ok
+    # GET /health/ : Returns status ok, the shard answering and whether it
+    #               is draining
+
+    def get(self, request):
+        return JsonResponse({
+            'status': 'ok',
+            'shard': settings.SHARD,
+            'draining': GamePlayerConsumer.draining,
+        })
+
+
+@method_decorator(handle_exceptions, name='dispatch')
+class Load(MethodNotAllowedMixin, View):
+    # GET /api/load/ : Current load of the shard answering and whether it
+    #                  accepts new games
+
+    def get(self, request):
+        return JsonResponse({
+            'shard': settings.SHARD,
+            'games': GamePlayerConsumer.active_games(),
+            'max_games': settings.MAX_GAMES,
+            'live_games': len(TickScheduler.games),
+            'tick_load': TickScheduler.load,
+            'tick_lag': TickScheduler.lag,
+            'backoff': TickScheduler.backoff,
+            'draining': GamePlayerConsumer.draining,
+            'accepting': not (
+                GamePlayerConsumer.draining or GamePlayerConsumer.is_full()
+            ),
+        })
+
+
+@method_decorator(handle_exceptions, name='dispatch')
+class Metrics(MethodNotAllowedMixin, View):
+    # GET /metrics/ : Tick loop histograms and counters of the shard
+    #                 answering, cumulative since it started
 
     def get(self, request):
-        return JsonResponse({'status': 'ok'})
+        return JsonResponse({
+            'shard': settings.SHARD,
+            'games': len(GamePlayerConsumer.games),
+            'live_games': len(TickScheduler.games),
+            'spectators': sum(
+                len(group.members)
+                for game in list(GamePlayerConsumer.games.values())
+                for group in list(game.spectators.values())
+            ),
+            'backoff': TickScheduler.backoff,
+            'draining': GamePlayerConsumer.draining,
+            **metrics.to_dict()
+        })
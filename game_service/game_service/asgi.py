@@ -1,5 +1,6 @@
 import os
 
+import game.lifespan
 import game.routing
 from channels.auth import AuthMiddlewareStack
 from channels.routing import ProtocolTypeRouter, URLRouter
@@ -16,6 +17,7 @@ websocket_patterns = game.routing.get_websocket_urlpatterns()
 application = ProtocolTypeRouter(
     {
         "http": django_asgi_app,
+        "lifespan": game.lifespan.lifespan,
         "websocket": AllowedHostsOriginValidator(
             AuthMiddlewareStack(URLRouter(websocket_patterns))
         ),
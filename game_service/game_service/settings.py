@@ -24,6 +24,21 @@ for env_var, var in env_vars:
         raise ImproperlyConfigured(f'{env_var} environment variable is required')
     globals()[var] = value
 
+# Step every live game with the vectorized NumPy engine (game/batch.py)
+BATCH_PHYSICS = os.environ.get('GAME_BATCH_PHYSICS', 'false').lower() == 'true'
+
+# Sharded mode: `manage.py runshards` starts GAME_SHARDS processes on
+# consecutive ports and nginx routes each game_id to the shard owning it
+SHARDS = int(os.environ.get('GAME_SHARDS', '1'))
+SHARD = int(os.environ.get('GAME_SHARD', '0'))
+
+# Seconds a draining shard lets its matches finish before handing the others
+# over, see GamePlayerConsumer.drain()
+DRAIN_TIMEOUT = int(os.environ.get('GAME_DRAIN_TIMEOUT', '30'))
+
+# Matches a shard runs at once, new ones are refused with a 503 beyond that
+MAX_GAMES = int(os.environ.get('GAME_MAX_GAMES', '1000'))
+
 # SECURITY WARNING: don't run with debug turned on in production!
 DEBUG = False
 
@@ -71,6 +86,9 @@ WSGI_APPLICATION = 'game_service.wsgi.application'
 
 ASGI_APPLICATION = 'game_service.asgi.application'
 
+# Game frames and spectator groups never leave the shard: a shard runs its
+# games and their players' consumers in one process, see runshards. Unlike
+# matchmaker-service, game-service has no Postgres channel layer.
 CHANNEL_LAYERS = {
     'default': {
         'BACKEND': 'channels.layers.InMemoryChannelLayer',
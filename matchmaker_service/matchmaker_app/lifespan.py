@@ -0,0 +1,21 @@
+import logging
+
+
+logger = logging.getLogger('matchmaker-service')
+
+
+async def lifespan(scope, receive, send):
+    # ASGI lifespan events of the matchmaker process. At startup the games
+    # left pending by the previous process get retried.
+    from .pending import PendingGames
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            try:
+                PendingGames.start_loop()
+            except Exception as e:
+                logger.error(f'Failed to start matchmaker-service [{e}]')
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
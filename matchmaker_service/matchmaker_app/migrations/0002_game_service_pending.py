@@ -0,0 +1,28 @@
+# Generated by Django 4.2.30 on 2026-10-18 03:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('matchmaker_app', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='game',
+            name='service_attempts',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='game',
+            name='service_pending',
+            field=models.CharField(blank=True, choices=[('create', 'Create'), ('start', 'Start')], default=None, max_length=10, null=True),
+        ),
+        migrations.AddField(
+            model_name='game',
+            name='service_retry_at',
+            field=models.DateTimeField(blank=True, default=None, null=True),
+        ),
+    ]
@@ -310,6 +310,14 @@ class Game(models.Model):
         (FINISHED, 'Finished'),
     ]
 
+    CREATE = 'create'
+    START = 'start'
+
+    SERVICE_ACTIONS = [
+        (CREATE, 'Create'),
+        (START, 'Start')
+    ]
+
     id = models.CharField(
         primary_key=True,
         max_length=32,
@@ -370,6 +378,19 @@ class Game(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     finished_at = models.DateTimeField(null=True, blank=True, default=None)
+    # Create or start request game-service did not take, retried in the
+    # background, see pending.py
+    service_pending = models.CharField(
+        max_length=10,
+        choices=SERVICE_ACTIONS,
+        null=True,
+        blank=True,
+        default=None
+    )
+    service_attempts = models.IntegerField(default=0)
+    service_retry_at = models.DateTimeField(
+        null=True, blank=True, default=None
+    )
 
     def __str__(self):
         return self.id
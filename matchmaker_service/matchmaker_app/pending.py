@@ -0,0 +1,123 @@
+import logging
+import threading
+import time
+from datetime import timedelta
+
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+
+from .models import Game
+from .utils import channels as channels_utils
+from .utils import game as game_utils
+from .utils import tournament as tournament_utils
+
+
+logger = logging.getLogger('matchmaker-service')
+
+
+# Games game-service did not create or start when asked are marked pending
+# and retried here by one thread per process, with doubling delays. Threads
+# of different processes lease the game they retry, one game at a time as
+# retrying it may take a few requests. A game that still cannot start after
+# MAX_START_ATTEMPTS is finished without score so its players and
+# tournament can go on, games waiting to be created are retried until they
+# start.
+POLL_TIME = 2           # Seconds between checks for due retries
+LEASE_TIME = 30         # Seconds, above the requests of one retry
+MAX_RETRY_DELAY = 60    # Seconds
+MAX_START_ATTEMPTS = 8
+
+
+def claim():
+    now = timezone.now()
+    with transaction.atomic():
+        game = (
+            Game.objects
+            .select_for_update(skip_locked=True)
+            .filter(service_pending__isnull=False, service_retry_at__lte=now)
+            .exclude(status=Game.FINISHED)
+            .order_by('service_retry_at')
+            .first()
+        )
+        if game:
+            Game.objects.filter(id=game.id).update(
+                service_retry_at=now + timedelta(seconds=LEASE_TIME)
+            )
+    return game
+
+
+def finish(game, done):
+    if done:
+        Game.objects.filter(id=game.id).update(service_pending=None)
+        return
+    game.service_attempts += 1
+    delay = min(
+        game_utils.RETRY_DELAY * 2 ** min(game.service_attempts - 1, 16),
+        MAX_RETRY_DELAY
+    )
+    Game.objects.filter(id=game.id).update(
+        service_attempts=game.service_attempts,
+        service_retry_at=timezone.now() + timedelta(seconds=delay)
+    )
+
+
+def give_up(game):
+    logger.error(
+        f'Gave up starting game {game.id} after {game.service_attempts} '
+        f'attempts, finishing it without score'
+    )
+    Game.objects.filter(id=game.id).update(service_pending=None)
+    games = game_utils.finish_many([
+        {'game_id': game.id, 'left_score': 0, 'right_score': 0}
+    ])
+    for tournament in tournament_utils.update_leaderboards(games):
+        tournament_utils.advance(tournament)
+        channels_utils.send_tournament_update(tournament)
+
+
+class PendingGames:
+
+    lock = threading.Lock()
+    thread = None
+
+    @classmethod
+    def start_loop(cls):
+        with cls.lock:
+            if cls.thread is None:
+                cls.thread = threading.Thread(
+                    target=cls.loop, name='pending-games', daemon=True
+                )
+                cls.thread.start()
+
+    @classmethod
+    def loop(cls):
+        while True:
+            time.sleep(POLL_TIME)
+            try:
+                while cls.retry_next():
+                    pass
+            except Exception as e:
+                logger.error(f'Failed to retry pending games [{e}]')
+            finally:
+                close_old_connections()
+
+    @classmethod
+    def retry_next(cls):
+        # Returns whether a game was due
+        game = claim()
+        if game is None:
+            return False
+        if game.service_pending == Game.CREATE:
+            status = game_utils.game_service_action(game.id, 'create')
+        else:
+            status = game_utils.send_game_start(game.id)
+        finish(game, status == 200)
+        if status == 200:
+            logger.info(
+                f'Game service did {game.service_pending} game {game.id} '
+                f'after {game.service_attempts + 1} attempts'
+            )
+        elif game.service_pending == Game.START \
+                and game.service_attempts >= MAX_START_ATTEMPTS:
+            give_up(game)
+        return True
@@ -0,0 +1,144 @@
+from datetime import timedelta
+from unittest.mock import MagicMock, patch
+
+from django.test import TestCase
+from django.utils import timezone
+
+from matchmaker_app import pending
+from matchmaker_app.models import Game, Lock, Player
+from matchmaker_app.utils import game as game_utils
+
+
+def response(status):
+    return MagicMock(status=status, reason='')
+
+
+def requested(connection):
+    return [
+        args[1] for args, _ in connection.return_value.request.call_args_list
+    ]
+
+
+@patch('matchmaker_app.pending.PendingGames.start_loop')
+@patch(
+    'matchmaker_app.utils.game.get_game_service_csrf_token',
+    return_value=('token', 'cookie')
+)
+@patch('matchmaker_app.utils.game.game_service_connection')
+class GameServiceTests(TestCase):
+    """Tests for the requests sent to game service."""
+
+    def setUp(self):
+        self.game = Game.objects.create(player1_name='player')
+
+    def test_pending_when_busy(self, connection, csrf_token, start_loop):
+        connection.return_value.getresponse.return_value = response(503)
+        self.assertFalse(game_utils.request_game_create(self.game.id))
+        connection.return_value.request.assert_called_once()
+        self.game.refresh_from_db()
+        self.assertEqual(self.game.service_pending, Game.CREATE)
+        self.assertGreater(self.game.service_retry_at, timezone.now())
+        start_loop.assert_called_once()
+
+    def test_create_when_starting(self, connection, csrf_token, start_loop):
+        Game.objects.filter(id=self.game.id).update(
+            service_pending=Game.CREATE
+        )
+        connection.return_value.getresponse.side_effect = [
+            response(500), response(200), response(200)
+        ]
+        self.assertTrue(game_utils.request_game_start(self.game.id))
+        self.assertEqual(requested(connection), [
+            f'/api/start/{self.game.id}/',
+            f'/api/game/{self.game.id}/',
+            f'/api/start/{self.game.id}/'
+        ])
+        self.game.refresh_from_db()
+        self.assertIsNone(self.game.service_pending)
+
+    def test_pending_when_create_refused_at_start(
+        self, connection, csrf_token, start_loop
+    ):
+        connection.return_value.getresponse.side_effect = [
+            response(500), response(503)
+        ]
+        self.assertFalse(game_utils.request_game_start(self.game.id))
+        self.game.refresh_from_db()
+        self.assertEqual(self.game.service_pending, Game.START)
+
+
+@patch(
+    'matchmaker_app.utils.game.get_game_service_csrf_token',
+    return_value=('token', 'cookie')
+)
+@patch('matchmaker_app.utils.game.game_service_connection')
+class PendingGamesTests(TestCase):
+    """Tests for the games retried in the background."""
+
+    def pending_game(self, action, attempts=0):
+        return Game.objects.create(
+            player1_name='player',
+            status=Game.IN_PROGRESS,
+            service_pending=action,
+            service_attempts=attempts,
+            service_retry_at=timezone.now() - timedelta(seconds=1)
+        )
+
+    def test_nothing_due(self, connection, csrf_token):
+        game = self.pending_game(Game.CREATE)
+        Game.objects.filter(id=game.id).update(
+            service_retry_at=timezone.now() + timedelta(seconds=60)
+        )
+        self.assertFalse(pending.PendingGames.retry_next())
+        connection.return_value.request.assert_not_called()
+
+    def test_retry_done(self, connection, csrf_token):
+        game = self.pending_game(Game.START)
+        connection.return_value.getresponse.return_value = response(200)
+        self.assertTrue(pending.PendingGames.retry_next())
+        self.assertEqual(requested(connection), [f'/api/start/{game.id}/'])
+        game.refresh_from_db()
+        self.assertIsNone(game.service_pending)
+
+    def test_retry_backs_off(self, connection, csrf_token):
+        game = self.pending_game(Game.CREATE, attempts=2)
+        connection.return_value.getresponse.return_value = response(503)
+        pending.PendingGames.retry_next()
+        game.refresh_from_db()
+        self.assertEqual(game.service_pending, Game.CREATE)
+        self.assertEqual(game.service_attempts, 3)
+        delay = game.service_retry_at - timezone.now()
+        self.assertGreater(delay, timedelta(seconds=game_utils.RETRY_DELAY))
+        # Leased games are not retried again meanwhile
+        self.assertFalse(pending.PendingGames.retry_next())
+
+    def test_give_up_start(self, connection, csrf_token):
+        game = self.pending_game(
+            Game.START, attempts=pending.MAX_START_ATTEMPTS - 1
+        )
+        connection.return_value.getresponse.return_value = response(503)
+        pending.PendingGames.retry_next()
+        game.refresh_from_db()
+        self.assertIsNone(game.service_pending)
+        self.assertEqual(game.status, Game.FINISHED)
+        self.assertEqual((game.player1_score, game.player2_score), (0, 0))
+
+    def test_finished_games_not_retried(self, connection, csrf_token):
+        game = self.pending_game(Game.START)
+        Game.objects.filter(id=game.id).update(status=Game.FINISHED)
+        self.assertFalse(pending.PendingGames.retry_next())
+
+
+class CreateTests(TestCase):
+    """Tests for creating games."""
+
+    @patch('matchmaker_app.utils.game.request_game_create')
+    def test_request_outside_lock(self, request_game_create):
+        locked = []
+        request_game_create.side_effect = lambda game_id: locked.append(
+            Lock.objects.filter(name='game').exists()
+        )
+        game = game_utils.create(Player.objects.create(name='player'))
+        request_game_create.assert_called_once_with(game.id)
+        self.assertEqual(locked, [False])
+        self.assertTrue(Game.objects.filter(id=game.id).exists())
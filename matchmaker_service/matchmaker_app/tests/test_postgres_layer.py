@@ -0,0 +1,124 @@
+import asyncio
+import uuid
+from contextlib import asynccontextmanager
+
+from channels.exceptions import ChannelFull
+from django.test import TransactionTestCase
+from matchmaker_service.utils.postgres_layer import (
+    PostgresChannelLayer, route_of
+)
+
+
+TIMEOUT = 5     # Seconds
+
+
+@asynccontextmanager
+async def layers(count=2, **config):
+    # Layers sharing a prefix act as processes of one service
+    prefix = f'test-{uuid.uuid4().hex[:8]}'
+    instances = [
+        PostgresChannelLayer(prefix=prefix, **config) for _ in range(count)
+    ]
+    try:
+        yield instances
+    finally:
+        await instances[0].flush()
+        for layer in instances:
+            await layer.close()
+
+
+async def receive(layer, channel, timeout=TIMEOUT):
+    return await asyncio.wait_for(layer.receive(channel), timeout)
+
+
+class PostgresChannelLayerTests(TransactionTestCase):
+    """Tests for the channel layer shared through Postgres."""
+
+    def test_route_of(self):
+        self.assertEqual(route_of('process!specific.1'), 'process!')
+        self.assertEqual(route_of('normal.channel'), 'normal.channel')
+
+    async def test_send(self):
+        async with layers() as (sender, receiver):
+            channel = await receiver.new_channel()
+            await sender.send(channel, {'type': 'test', 'n': 1})
+            await sender.send(channel, {'type': 'test', 'n': 2})
+            self.assertEqual(await receive(receiver, channel), {
+                'type': 'test', 'n': 1
+            })
+            self.assertEqual((await receive(receiver, channel))['n'], 2)
+
+    async def test_normal_channel(self):
+        async with layers() as (sender, receiver):
+            await sender.send('worker', {'type': 'test'})
+            self.assertEqual(
+                await receive(receiver, 'worker'), {'type': 'test'}
+            )
+
+    async def test_expired_messages_dropped(self):
+        async with layers(expiry=0) as (sender, receiver):
+            channel = await receiver.new_channel()
+            await sender.send(channel, {'type': 'expired'})
+            with self.assertRaises(asyncio.TimeoutError):
+                await receive(receiver, channel, timeout=0.5)
+
+    async def test_capacity(self):
+        async with layers(capacity=3) as (sender, receiver):
+            channel = await receiver.new_channel()
+            for n in range(3):
+                await sender.send(channel, {'type': 'test', 'n': n})
+            with self.assertRaises(ChannelFull):
+                await sender.send(channel, {'type': 'test', 'n': 3})
+            # Room is made as messages get received
+            for n in range(3):
+                self.assertEqual((await receive(receiver, channel))['n'], n)
+            await sender.send(channel, {'type': 'test', 'n': 4})
+            self.assertEqual((await receive(receiver, channel))['n'], 4)
+
+    async def test_capacity_counted_once_per_headroom(self):
+        async with layers(capacity=10) as (sender, receiver):
+            channel = await receiver.new_channel()
+            executed = []
+            await sender.send(channel, {'type': 'test'})
+            state = await sender.get_state()
+            execute = state.connection.execute
+
+            async def counting(query, params=None):
+                executed.append('LIMIT' in query)
+                return await execute(query, params)
+            state.connection.execute = counting
+            for _ in range(9):
+                await sender.send(channel, {'type': 'test'})
+            with self.assertRaises(ChannelFull):
+                await sender.send(channel, {'type': 'test'})
+            self.assertEqual(executed, [False] * 9 + [True])
+
+    async def test_groups(self):
+        async with layers(3) as (sender, first, second):
+            channels = [
+                await first.new_channel(),
+                await second.new_channel()
+            ]
+            for layer, channel in zip([first, second], channels):
+                await layer.group_add('game', channel)
+            await sender.group_send('game', {'type': 'update'})
+            for layer, channel in zip([first, second], channels):
+                self.assertEqual(
+                    await receive(layer, channel), {'type': 'update'}
+                )
+
+            await second.group_discard('game', channels[1])
+            await sender.group_send('game', {'type': 'later'})
+            self.assertEqual(
+                await receive(first, channels[0]), {'type': 'later'}
+            )
+            with self.assertRaises(asyncio.TimeoutError):
+                await receive(second, channels[1], timeout=0.5)
+
+    async def test_groups_per_prefix(self):
+        async with layers(1) as (layer,), layers(1) as (other,):
+            channel = await layer.new_channel()
+            await layer.group_add('game', channel)
+            await other.group_send('game', {'type': 'update'})
+            with self.assertRaises(asyncio.TimeoutError):
+                await receive(layer, channel, timeout=0.5)
@@ -226,3 +226,74 @@ class TournamentFlowTestCase(TestCase):
         self.assertEqual(response.status_code, 200)
         tournament_data = response.json()
         self.assertEqual(tournament_data['status'], 'finished')
+
+    @patch('matchmaker_app.utils.channels.send_tournament_update')
+    @patch('matchmaker_app.utils.decorators.jwt_validate')
+    @patch('matchmaker_app.utils.game.request_game_start')
+    @patch('matchmaker_app.utils.game.request_game_create')
+    def test_bulk_results(
+        self,
+        mock_request_game_service_creation,
+        mock_request_game_start,
+        mock_validate,
+        mock_send_tournament_update
+    ):
+        tournament_url = None
+        for i in range(1, 5):
+            mock_validate.side_effect = lambda request: mock_jwt_validate(
+                request, f'TestPlayer{i}'
+            )
+            if tournament_url is None:
+                response = self.client.post(
+                    reverse('tournaments'),
+                    data=json.dumps({
+                        "pool_size": 4,
+                        "tournament_name": "TestTournament",
+                        "players": ['TestPlayer1']
+                    }),
+                    content_type="application/json"
+                )
+                tournament_url = reverse(
+                    'tournaments-detail',
+                    args=[response.json().get('tournament_id')]
+                )
+            else:
+                response = self.client.post(
+                    tournament_url,
+                    data=json.dumps({"player": f"TestPlayer{i}"}),
+                    content_type="application/json"
+                )
+        rounds = self.client.get(tournament_url).json()['games']
+        round_1_game_ids = [game['id'] for game in rounds[0]['games']]
+        mock_send_tournament_update.reset_mock()
+
+        # Both games of round 1, one unknown and one duplicate result
+        results = [
+            {"game_id": game_id, "left_score": 3, "right_score": 1}
+            for game_id in round_1_game_ids
+        ]
+        results.append({"game_id": "unknown", "left_score": 3})
+        results.append(results[0])
+        response = self.client.post(
+            reverse('game-results'),
+            data=json.dumps({"results": results}),
+            content_type="application/json",
+            **{'HTTP_X_API_KEY': settings.MATCHMAKER_SERVICE_API_KEY}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertCountEqual(response.json()['finished'], round_1_game_ids)
+        self.assertEqual(response.json()['ignored'], ['unknown'])
+        self.assertEqual(mock_send_tournament_update.call_count, 1)
+
+        tournament_data = self.client.get(tournament_url).json()
+        rounds = tournament_data['games']
+        self.assertTrue(
+            all(game['status'] == 'finished' for game in rounds[0]['games'])
+        )
+        self.assertTrue(
+            all(game['status'] == 'in_progress' for game in rounds[1]['games'])
+        )
+        self.assertEqual(
+            sum(entry['points'] for entry in tournament_data['leaderboard']),
+            6
+        )
@@ -231,6 +231,22 @@ class ViewTests(TestCase):
         self.assertEqual(response.status_code, 500)
         self.assertIn('error', response.json())
 
+    def test_game_result_duplicate_ignored(self):
+        response = self.client.post(
+            reverse('game-result'),
+            data=json.dumps({
+                'game_id': 'game_id_3',
+                'left_score': 5,
+                'right_score': 0
+            }),
+            content_type='application/json',
+            **{'HTTP_X_API_KEY': settings.MATCHMAKER_SERVICE_API_KEY}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.game3.refresh_from_db()
+        self.assertEqual(self.game3.player1_score, 2)
+        self.assertEqual(self.game3.player2_score, 5)
+
     def test_game_detail_view_method_not_allowed(self):
         response = self.client.post(
             reverse('games-detail', args=['game_id_1'])
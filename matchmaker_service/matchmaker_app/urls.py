@@ -1,7 +1,8 @@
 from django.urls import path
 
 from .views.games import (
-    GamesView, MyGamesView, GameDetailView, GameResultView, GameStartView
+    GamesView, MyGamesView, GameDetailView, GameResultView, GameResultsView,
+    GameStartView
 )
 from .views.misc import getCsrfToken, HealthCheck
 from .views.players import (
@@ -52,6 +53,17 @@ from .views.tournaments import (
 #                                           "right_score": int  # Required
 #                                       }
 #
+# POST /api/games/results/            : Submit the results of many games,
+#                                       results of unknown or finished games
+#                                       are ignored
+#                                       {
+#                                           "results": [{   # Required
+#                                               "game_id": int,
+#                                               "left_score": int,
+#                                               "right_score": int
+#                                           }]
+#                                       }
+#
 # GET  /api/tournaments/               : List all tournaments
 #                                     ?status=<tournament_status>  # Optional
 #                                     ?type=<tournament_type>      # Optional
@@ -121,6 +133,11 @@ urlpatterns = [
         GameResultView.as_view(),
         name='game-result'
     ),
+    path(
+        'api/games/results/',
+        GameResultsView.as_view(),
+        name='game-results'
+    ),
     path(
         'api/games/<str:game_id>/',
         GameDetailView.as_view(),
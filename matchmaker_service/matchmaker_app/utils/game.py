@@ -2,9 +2,12 @@ import http.client
 import json
 import logging
 import ssl
+from datetime import timedelta
 
+from django.conf import settings
 from django.db import transaction
 from django.db.models import Q
+from django.utils import timezone
 
 from ..models import Game, Player
 from .. import lock
@@ -15,6 +18,14 @@ from . import player as player_utils
 logger = logging.getLogger('matchmaker-service')
 
 
+# A create or start request game service does not take (503 when busy) is
+# not retried here, the game is marked pending and retried in the
+# background, see pending.py. Requests are never sent while holding a
+# database lock.
+RETRY_DELAY = 2         # Seconds, game service's Retry-After
+TIMEOUT = 5             # Seconds
+
+
 def create(
     player1,
     player2=None,
@@ -56,8 +67,6 @@ def create(
             f'Created {game.type} game '
             f'{game.id}'
         )
-        request_game_create(game.id)
-        return game
 
     except Exception as e:
         raise Exception(
@@ -69,18 +78,62 @@ def create(
     finally:
         lock.release('game')
 
+    # Outside the game lock, game service may be slow to answer
+    request_game_create(game.id)
+    return game
+
 
 def request_game_create(game_id):
+    # Returns whether the game got created, it is created in the background
+    # otherwise
     logger.debug(f'Creating Game Service game (ID: {game_id})')
-    game_service_action(game_id, 'create')
+    status = game_service_action(game_id, 'create')
+    if status != 200:
+        set_pending(game_id, Game.CREATE)
+    return status == 200
 
 
 def request_game_start(game_id):
+    # Returns whether the game started, it is started in the background
+    # otherwise
     logger.debug(f'Start Game Service game (ID: {game_id})')
-    game_service_action(game_id, 'start')
+    status = send_game_start(game_id)
+    if status != 200:
+        set_pending(game_id, Game.START)
+    else:
+        Game.objects.filter(id=game_id).exclude(
+            service_pending=None
+        ).update(service_pending=None)
+    return status == 200
+
+
+def send_game_start(game_id):
+    # Returns the status of the last request
+    status = game_service_action(game_id, 'start')
+    if status == 500:
+        # Not created yet when game service was busy at creation
+        status = game_service_action(game_id, 'create')
+        if status == 200:
+            status = game_service_action(game_id, 'start')
+    return status
+
+
+def set_pending(game_id, action):
+    from ..pending import PendingGames
+    logger.warning(
+        f'Game service did not {action} game {game_id}, retrying '
+        f'in the background'
+    )
+    Game.objects.filter(id=game_id).update(
+        service_pending=action,
+        service_attempts=0,
+        service_retry_at=timezone.now() + timedelta(seconds=RETRY_DELAY)
+    )
+    PendingGames.start_loop()
 
 
 def game_service_action(game_id, action):
+    # Returns the response status, None when none came
     page = 'game' if action == 'create' else action
     csrf_token, cookies = get_game_service_csrf_token()
 
@@ -89,13 +142,8 @@ def game_service_action(game_id, action):
             f'Failed to {action} game {game_id} '
             f'[No CSRF token or cookie]'
         )
+        return None
 
-    context = ssl._create_unverified_context()
-    conn = http.client.HTTPSConnection(
-        'game-service',
-        8000,
-        context=context
-    )
     headers = {
         'Content-Type': 'application/json',
         'X-CSRFToken': csrf_token,
@@ -103,10 +151,11 @@ def game_service_action(game_id, action):
         'Cookie': cookies
     }
 
+    conn = game_service_connection()
     try:
         conn.request(
             'PUT',
-            f'/api/{page}/{game_id}/',
+            game_service_path(f'/api/{page}/{game_id}/'),
             headers=headers
         )
         response = conn.getresponse()
@@ -115,22 +164,36 @@ def game_service_action(game_id, action):
                 f'Failed to {action} game {game_id} '
                 f'{response.status} {response.reason}'
             )
+        return response.status
     except Exception as e:
         logger.error(f'{e}')
     finally:
         conn.close()
+    return None
 
 
-def get_game_service_csrf_token():
+def game_service_connection():
     context = ssl._create_unverified_context()
-    conn = http.client.HTTPSConnection(
-        'game-service',
-        8000,
+    return http.client.HTTPSConnection(
+        settings.GAME_SERVICE_HOST,
+        settings.GAME_SERVICE_PORT,
+        timeout=TIMEOUT,
         context=context
     )
 
+
+def game_service_path(path):
+    # nginx adds the trailing slash back when stripping its prefix
+    if settings.GAME_SERVICE_PATH:
+        return settings.GAME_SERVICE_PATH + path.rstrip('/')
+    return path
+
+
+def get_game_service_csrf_token():
+    conn = game_service_connection()
+
     try:
-        conn.request('GET', '/get-csrf-token/')
+        conn.request('GET', game_service_path('/get-csrf-token/'))
         response = conn.getresponse()
         if response.status == 200:
             cookies = response.getheader('Set-Cookie')
@@ -149,7 +212,7 @@ def get_game_service_csrf_token():
         logger.error(f'{e}')
     finally:
         conn.close()
-    return None
+    return None, None
 
 
 def update(game_id, **kwargs):
@@ -169,6 +232,39 @@ def update(game_id, **kwargs):
         lock.release('game')
 
 
+def finish_many(results):
+    # Finishes the games of many results in one transaction and returns
+    # them, results of unknown or already finished games are ignored
+    scores = {str(result['game_id']): result for result in results}
+    lock.acquire('game')
+
+    try:
+        with transaction.atomic():
+            games = list(
+                Game.objects.select_for_update(of=('self',))
+                .filter(id__in=scores)
+                .exclude(status=Game.FINISHED)
+                .select_related('tournament')
+            )
+            finished_at = timezone.now()
+            for game in games:
+                game.player1_score = scores[game.id].get('left_score')
+                game.player2_score = scores[game.id].get('right_score')
+                game.status = Game.FINISHED
+                game.finished_at = finished_at
+            Game.objects.bulk_update(
+                games,
+                ['player1_score', 'player2_score', 'status', 'finished_at']
+            )
+        return games
+
+    except Exception as e:
+        raise Exception(f'Error finishing {len(scores)} games [{e}]')
+
+    finally:
+        lock.release('game')
+
+
 def registration(player_name, opponent_name, type=Game.ONLINE):
     if opponent_name and len(opponent_name) == 0:
         opponent_name = None
@@ -507,6 +507,69 @@ def update_leaderboard(game):
         lock.release('tournament')
 
 
+def update_leaderboards(games):
+    # Applies the games of each tournament to its leaderboard in one pass
+    # and returns the tournaments
+    tournaments = {}
+    for game in games:
+        if game.tournament:
+            tournaments.setdefault(game.tournament.id, []).append(game)
+    if not tournaments:
+        return []
+
+    lock.acquire('tournament')
+
+    try:
+        with transaction.atomic():
+            entries = {
+                (entry.tournament_id, entry.player_name): entry
+                for entry in LeaderboardEntry.objects.filter(
+                    tournament_id__in=tournaments
+                )
+            }
+            updated = {}
+            for tournament_id, tournament_games in tournaments.items():
+                for game in tournament_games:
+                    for player in [game.player1_name, game.player2_name]:
+                        entry = entries[(tournament_id, player)]
+                        entry.games_played += 1
+                        if player == game.get_winner():
+                            entry.games_won += 1
+                            entry.points += 3
+                        entry.goals_for += game.get_score(player)
+                        entry.goals_against += game.get_score(
+                            game.get_opponent(player)
+                        )
+                        entry.goal_difference = \
+                            entry.goals_for - entry.goals_against
+                        updated[entry.pk] = entry
+            LeaderboardEntry.objects.bulk_update(
+                updated.values(),
+                [
+                    'games_played',
+                    'games_won',
+                    'points',
+                    'goals_for',
+                    'goals_against',
+                    'goal_difference'
+                ]
+            )
+
+    except Exception as e:
+        logger.error(
+            f'Failed to update leaderboards of tournaments '
+            f'{list(tournaments)} [{e}]'
+        )
+
+    finally:
+        lock.release('tournament')
+
+    return [
+        tournament_games[0].tournament
+        for tournament_games in tournaments.values()
+    ]
+
+
 def get(filters):
     status = filters.get('status')
     type = filters.get('type')
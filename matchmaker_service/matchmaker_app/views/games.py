@@ -178,6 +178,15 @@ class GameResultView(MethodNotAllowedMixin, View):
     def post(self, request, *args, **kwargs):
         data = json.loads(request.body)
         game_id = data.get('game_id')
+        game = Game.objects.get(id=game_id)
+        if game.status == Game.FINISHED:
+            # game-service retries results until they are acknowledged
+            logger.info(
+                f'Ignored duplicate result of game \'{game.get_name()}\' '
+                f'(ID: {game_id})'
+            )
+            return JsonResponse(game.to_dict())
+
         game_utils.update(
             game_id,
             player1_score=data.get('left_score'),
@@ -207,6 +216,46 @@ class GameResultView(MethodNotAllowedMixin, View):
         return JsonResponse(game.to_dict())
 
 
+@method_decorator(log_request, name='dispatch')
+@method_decorator(handle_exceptions, name='dispatch')
+class GameResultsView(MethodNotAllowedMixin, View):
+    # POST /api/games/results/ : Submit the results of many games
+    #                            {results: [{game_id, left_score,
+    #                                        right_score}]}
+
+    @method_decorator(api_key_required)
+    @method_decorator(csrf_protect)
+    def post(self, request, *args, **kwargs):
+        data = json.loads(request.body)
+        results = data.get('results', [])
+        games = game_utils.finish_many(results)
+        for game in games:
+            logger.info(
+                f'Game \'{game.get_name()}\' (ID: {game.id}) '
+                f'ended in {game.get_winner()}\'s favor '
+                f'({game.player1_score} - {game.player2_score})'
+            )
+
+        # One leaderboard update, round check and message per tournament
+        for tournament in tournament_utils.update_leaderboards(games):
+            tournament_utils.advance(tournament)
+            channels_utils.send_tournament_update(tournament)
+            logger.info(
+                f'Tournament \'{tournament.name}\' '
+                f' (ID: {tournament.id}) '
+                f'updated ranking: {tournament.get_ranking()}'
+            )
+
+        finished = [game.id for game in games]
+        return JsonResponse({
+            'finished': finished,
+            'ignored': [
+                str(result.get('game_id')) for result in results
+                if str(result.get('game_id')) not in finished
+            ]
+        })
+
+
 @method_decorator(log_request, name='dispatch')
 @method_decorator(handle_exceptions, name='dispatch')
 class GameStartView(MethodNotAllowedMixin, View):
@@ -5,6 +5,7 @@ from channels.auth import AuthMiddlewareStack
 from channels.routing import ProtocolTypeRouter, URLRouter
 from channels.security.websocket import AllowedHostsOriginValidator
 
+import matchmaker_app.lifespan
 import matchmaker_app.routing
 
 
@@ -17,5 +18,6 @@ application = ProtocolTypeRouter(
         "websocket": AllowedHostsOriginValidator(
             AuthMiddlewareStack(URLRouter(websocket_patterns))
         ),
+        "lifespan": matchmaker_app.lifespan.lifespan,
     }
 )
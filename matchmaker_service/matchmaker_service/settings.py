@@ -69,6 +69,29 @@ CHANNEL_LAYERS = {
     },
 }
 
+# Share the channel layer between processes through Postgres
+if os.environ.get('POSTGRES_CHANNEL_LAYER', 'false').lower() == 'true':
+    CHANNEL_LAYERS = {
+        'default': {
+            'BACKEND': 'matchmaker_service.utils.postgres_layer.PostgresChannelLayer',
+            'CONFIG': {
+                'prefix': 'matchmaker-service',
+            },
+        },
+    }
+
+# A sharded game service is reached through nginx, which routes each game_id
+# to the shard owning the game
+GAME_SHARDS = int(os.environ.get('GAME_SHARDS', '1'))
+if GAME_SHARDS > 1:
+    GAME_SERVICE_HOST = 'nginx'
+    GAME_SERVICE_PORT = 8443
+    GAME_SERVICE_PATH = '/game-service'
+else:
+    GAME_SERVICE_HOST = 'game-service'
+    GAME_SERVICE_PORT = 8000
+    GAME_SERVICE_PATH = ''
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.postgresql',
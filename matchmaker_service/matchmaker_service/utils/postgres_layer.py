@@ -0,0 +1,398 @@
+import asyncio
+import logging
+import time
+import uuid
+import weakref
+
+import msgpack
+import psycopg
+from channels.exceptions import ChannelFull
+from channels.layers import BaseChannelLayer
+from django.conf import settings
+
+
+logger = logging.getLogger('matchmaker-service')
+
+
+# Messages wait in channels_message until the process owning their route
+# fetches them. A route is the part of a specific channel name up to the '!'
+# (one per process and event loop) or the whole name of a normal channel.
+# Senders notify the route on NOTIFY_CHANNEL, Postgres collapses identical
+# notifications of one statement, so a group_send wakes each receiving
+# process once and the process fetches all its messages in batches.
+#
+# Every send is a round trip to Postgres. That suits matchmaker
+# notifications, not the frames game-service sends to every player on every
+# update, which stay on the in-process layer of the shard running the game.
+#
+# Channel capacity is checked with a count of the messages waiting on the
+# channel. Each process remembers how much room a channel had at its last
+# check and only counts again once it sent that many messages, a channel
+# that keeps up is counted once every `capacity` sends.
+NOTIFY_CHANNEL = 'channels_layer'
+BATCH_SIZE = 500
+CLEANUP_INTERVAL = 60   # Seconds
+RECONNECT_TIME = 1      # Seconds
+
+SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS channels_message (
+        id bigserial PRIMARY KEY,
+        route text NOT NULL,
+        channel text NOT NULL,
+        message bytea NOT NULL,
+        expires timestamptz NOT NULL
+    )
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS channels_message_route
+    ON channels_message (route, id)
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS channels_message_channel
+    ON channels_message (channel)
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS channels_group (
+        group_name text NOT NULL,
+        channel text NOT NULL,
+        expires timestamptz NOT NULL,
+        PRIMARY KEY (group_name, channel)
+    )
+    """,
+]
+
+ROUTE = """
+    CASE WHEN strpos(channel, '!') > 0
+        THEN split_part(channel, '!', 1) || '!'
+        ELSE channel
+    END
+"""
+
+SEND = """
+    WITH inserted AS (
+        INSERT INTO channels_message (route, channel, message, expires)
+        VALUES (
+            %(route)s,
+            %(channel)s,
+            %(message)s,
+            now() + %(expiry)s * interval '1 second'
+        )
+        RETURNING route
+    )
+    SELECT pg_notify(%(notify)s, route) FROM inserted
+"""
+
+# Returns the messages already waiting, up to the capacity, and only
+# inserts when there is room left
+CHECKED_SEND = """
+    WITH waiting AS (
+        SELECT count(*) AS waiting FROM (
+            SELECT 1 FROM channels_message
+            WHERE channel = %(channel)s AND expires > now()
+            LIMIT %(capacity)s
+        ) messages
+    ), inserted AS (
+        INSERT INTO channels_message (route, channel, message, expires)
+        SELECT
+            %(route)s,
+            %(channel)s,
+            %(message)s,
+            now() + %(expiry)s * interval '1 second'
+        FROM waiting
+        WHERE waiting < %(capacity)s
+        RETURNING route
+    )
+    SELECT waiting, (SELECT pg_notify(%(notify)s, route) FROM inserted)
+    FROM waiting
+"""
+
+GROUP_SEND = f"""
+    WITH inserted AS (
+        INSERT INTO channels_message (route, channel, message, expires)
+        SELECT
+            {ROUTE},
+            channel,
+            %(message)s,
+            now() + %(expiry)s * interval '1 second'
+        FROM channels_group
+        WHERE group_name = %(group)s AND expires > now()
+        RETURNING route
+    )
+    SELECT pg_notify(%(notify)s, route)
+    FROM (SELECT DISTINCT route FROM inserted) routes
+"""
+
+GROUP_ADD = """
+    INSERT INTO channels_group (group_name, channel, expires)
+    VALUES (%(group)s, %(channel)s, now() + %(expiry)s * interval '1 second')
+    ON CONFLICT (group_name, channel)
+    DO UPDATE SET expires = EXCLUDED.expires
+"""
+
+GROUP_DISCARD = """
+    DELETE FROM channels_group
+    WHERE group_name = %(group)s AND channel = %(channel)s
+"""
+
+FETCH = """
+    DELETE FROM channels_message
+    WHERE id IN (
+        SELECT id FROM channels_message
+        WHERE route = ANY(%(routes)s)
+        ORDER BY id
+        LIMIT %(limit)s
+        FOR UPDATE SKIP LOCKED
+    )
+    RETURNING id, channel, message, expires > now()
+"""
+
+CLEANUP = [
+    'DELETE FROM channels_message WHERE expires <= now()',
+    'DELETE FROM channels_group WHERE expires <= now()',
+]
+
+FLUSH = [
+    'DELETE FROM channels_message WHERE starts_with(channel, %(prefix)s)',
+    'DELETE FROM channels_group WHERE starts_with(group_name, %(prefix)s)',
+]
+
+
+def route_of(channel):
+    if '!' in channel:
+        return channel.split('!', 1)[0] + '!'
+    return channel
+
+
+class LoopState:
+    # Connections and queues of the layer on one event loop
+
+    def __init__(self, prefix):
+        self.client_prefix = f'{prefix}.{uuid.uuid4().hex}!'
+        self.connection = None
+        self.lock = asyncio.Lock()
+        self.listener = None
+        self.queues = {}
+        self.headroom = {}
+        self.routes = {self.client_prefix}
+        self.wakeup = asyncio.Event()
+        self.last_cleanup = time.monotonic()
+
+
+class PostgresChannelLayer(BaseChannelLayer):
+    extensions = ['groups', 'flush']
+
+    def __init__(
+        self,
+        prefix='channels',
+        expiry=60,
+        group_expiry=86400,
+        capacity=100,
+        channel_capacity=None,
+        conninfo=None
+    ):
+        super().__init__(expiry=expiry, capacity=capacity)
+        self.channel_capacity = self.compile_capacities(
+            channel_capacity or {}
+        )
+        self.prefix = prefix
+        self.group_expiry = group_expiry
+        self.conninfo = conninfo
+        self.schema_ready = False
+        self.loops = weakref.WeakKeyDictionary()
+
+    def get_conninfo(self):
+        if self.conninfo is None:
+            database = settings.DATABASES['default']
+            self.conninfo = psycopg.conninfo.make_conninfo(
+                host=database['HOST'],
+                port=database['PORT'],
+                dbname=database['NAME'],
+                user=database['USER'],
+                password=database['PASSWORD']
+            )
+        return self.conninfo
+
+    async def get_state(self):
+        loop = asyncio.get_running_loop()
+        state = self.loops.get(loop)
+        if state is None:
+            state = self.loops[loop] = LoopState(self.prefix)
+        await self.connect(state)
+        return state
+
+    async def connect(self, state):
+        async with state.lock:
+            if state.connection is None or state.connection.closed:
+                state.connection = await psycopg.AsyncConnection.connect(
+                    self.get_conninfo(),
+                    autocommit=True
+                )
+                if not self.schema_ready:
+                    await self.create_schema(state.connection)
+
+    async def create_schema(self, connection):
+        async with connection.transaction():
+            await connection.execute(
+                'SELECT pg_advisory_xact_lock(hashtext(%s))',
+                [NOTIFY_CHANNEL]
+            )
+            for statement in SCHEMA:
+                await connection.execute(statement)
+        self.schema_ready = True
+
+    def group_name(self, group):
+        return f'{self.prefix}.{group}'
+
+    # Channel layer API
+
+    async def send(self, channel, message):
+        assert isinstance(message, dict), 'message is not a dict'
+        assert self.valid_channel_name(channel), 'Channel name not valid'
+        assert '__asgi_channel__' not in message
+        state = await self.get_state()
+        params = {
+            'route': route_of(channel),
+            'channel': channel,
+            'message': msgpack.packb(message, use_bin_type=True),
+            'expiry': self.expiry,
+            'notify': NOTIFY_CHANNEL,
+        }
+        headroom = state.headroom.get(channel, 0)
+        if headroom > 0:
+            state.headroom[channel] = headroom - 1
+            await state.connection.execute(SEND, params)
+            return
+        capacity = self.get_capacity(channel)
+        cursor = await state.connection.execute(
+            CHECKED_SEND, {**params, 'capacity': capacity}
+        )
+        waiting, _ = await cursor.fetchone()
+        if waiting >= capacity:
+            raise ChannelFull(channel)
+        state.headroom[channel] = capacity - waiting - 1
+
+    async def receive(self, channel):
+        assert self.valid_channel_name(channel), 'Channel name not valid'
+        state = await self.get_state()
+        queue = state.queues.setdefault(channel, asyncio.Queue())
+        route = route_of(channel)
+        if route not in state.routes:
+            state.routes.add(route)
+            state.wakeup.set()
+        if state.listener is None or state.listener.done():
+            state.wakeup.set()
+            state.listener = asyncio.create_task(self.listen(state))
+        try:
+            return await queue.get()
+        except asyncio.CancelledError:
+            # The consumer is gone, so is its channel
+            if '!' in channel:
+                state.queues.pop(channel, None)
+            raise
+
+    async def new_channel(self, prefix='specific'):
+        state = await self.get_state()
+        channel = f'{state.client_prefix}{prefix}.{uuid.uuid4().hex}'
+        state.queues[channel] = asyncio.Queue()
+        return channel
+
+    async def group_add(self, group, channel):
+        assert self.valid_group_name(group), 'Group name not valid'
+        assert self.valid_channel_name(channel), 'Channel name not valid'
+        state = await self.get_state()
+        await state.connection.execute(GROUP_ADD, {
+            'group': self.group_name(group),
+            'channel': channel,
+            'expiry': self.group_expiry,
+        })
+
+    async def group_discard(self, group, channel):
+        assert self.valid_group_name(group), 'Group name not valid'
+        assert self.valid_channel_name(channel), 'Channel name not valid'
+        state = await self.get_state()
+        await state.connection.execute(GROUP_DISCARD, {
+            'group': self.group_name(group),
+            'channel': channel,
+        })
+
+    async def group_send(self, group, message):
+        assert isinstance(message, dict), 'message is not a dict'
+        assert self.valid_group_name(group), 'Group name not valid'
+        state = await self.get_state()
+        await state.connection.execute(GROUP_SEND, {
+            'group': self.group_name(group),
+            'message': msgpack.packb(message, use_bin_type=True),
+            'expiry': self.expiry,
+            'notify': NOTIFY_CHANNEL,
+        })
+
+    async def flush(self):
+        state = await self.get_state()
+        for statement in FLUSH:
+            await state.connection.execute(statement, {'prefix': self.prefix})
+
+    async def close(self):
+        state = self.loops.pop(asyncio.get_running_loop(), None)
+        if state is None:
+            return
+        if state.listener is not None:
+            state.listener.cancel()
+        if state.connection is not None:
+            await state.connection.close()
+
+    # Delivery
+
+    async def listen(self, state):
+        while True:
+            try:
+                async with await psycopg.AsyncConnection.connect(
+                    self.get_conninfo(),
+                    autocommit=True
+                ) as listener:
+                    await listener.execute(f'LISTEN {NOTIFY_CHANNEL}')
+                    fetcher = asyncio.create_task(self.fetch_loop(state))
+                    try:
+                        async for notify in listener.notifies():
+                            if notify.payload in state.routes:
+                                state.wakeup.set()
+                    finally:
+                        fetcher.cancel()
+            except psycopg.OperationalError as e:
+                logger.error(f'Channel layer listener failed [{e}]')
+                state.wakeup.set()
+                await asyncio.sleep(RECONNECT_TIME)
+
+    async def fetch_loop(self, state):
+        while True:
+            await state.wakeup.wait()
+            state.wakeup.clear()
+            try:
+                await self.connect(state)
+                while await self.fetch(state) == BATCH_SIZE:
+                    pass
+                if time.monotonic() - state.last_cleanup > CLEANUP_INTERVAL:
+                    state.last_cleanup = time.monotonic()
+                    state.headroom.clear()
+                    for statement in CLEANUP:
+                        await state.connection.execute(statement)
+            except psycopg.OperationalError as e:
+                logger.error(f'Channel layer fetch failed [{e}]')
+                state.connection = None
+                state.wakeup.set()
+                await asyncio.sleep(RECONNECT_TIME)
+
+    async def fetch(self, state):
+        cursor = await state.connection.execute(FETCH, {
+            'routes': list(state.routes),
+            'limit': BATCH_SIZE,
+        })
+        rows = await cursor.fetchall()
+        for _, channel, message, live in sorted(rows):
+            queue = state.queues.get(channel)
+            if not live or (queue is None and '!' in channel):
+                continue
+            if queue is None:
+                queue = state.queues[channel] = asyncio.Queue()
+            queue.put_nowait(msgpack.unpackb(message, raw=False))
+        return len(rows)
@@ -9,3 +9,23 @@ echo "window.config = {
 sed "s/\${IP_ADDRESS}/$IP_ADDRESS/g" /etc/nginx/conf.d/cors.conf > /etc/nginx/conf.d/cors.conf.template
 cat /etc/nginx/conf.d/cors.conf.template > /etc/nginx/conf.d/cors.conf
 rm /etc/nginx/conf.d/cors.conf.template
+
+# One server per game-service shard, see game_service's runshards command
+{
+    echo "upstream game-service-shards {"
+    echo "    hash \$game_id consistent;"
+    shard=0
+    while [ "$shard" -lt "${GAME_SHARDS:-1}" ]; do
+        echo "    server game-service:$((8000 + shard));"
+        shard=$((shard + 1))
+    done
+    echo "}"
+    # Each shard on its own too, for the load and metrics of every shard
+    shard=0
+    while [ "$shard" -lt "${GAME_SHARDS:-1}" ]; do
+        echo "upstream game-service-shard-$shard {"
+        echo "    server game-service:$((8000 + shard));"
+        echo "}"
+        shard=$((shard + 1))
+    done
+} > /etc/nginx/conf.d/game-service-upstream.conf
@@ -33,6 +33,7 @@ const DEFAULT_LOCAL_RIGHT_UP_KEY = 'ArrowUp';
 const DEFAULT_LOCAL_RIGHT_DOWN_KEY = 'ArrowDown';
 const DEFAULT_LOCAL_LEFT_UP_KEY = 'w';
 const DEFAULT_LOCAL_LEFT_DOWN_KEY = 's';
+const MAX_RECONNECT_ATTEMPTS = 5;
 
 export class Player {
     constructor(name, up=null, down=null, isUser=false) {
@@ -54,6 +55,9 @@ export class Player {
         this.statusInfos = '';
         this.tournamentSession = null;
         this.waitingToContinue = false;
+        this.reconnectDelay = null;
+        this.reconnectAttempts = 0;
+        this.reconnectTimeout = null;
     }
 
     setControls(up, down) {
@@ -96,6 +100,8 @@ export class Player {
     }
 
     disconnectFromGame() {
+        this.reconnectDelay = null;
+        clearTimeout(this.reconnectTimeout);
         if (this.gameSocket) {
             console.log(
                 `${this.name} disconnecting from game #${this.gameId}`
@@ -129,6 +135,7 @@ export class Player {
     setupGameSocketEventListeners() {
         this.gameSocket.onOpen(() => {
             console.log(`${this.name} connected to game-service`);
+            this.reconnectDelay = null;
         });
 
         this.gameSocket.onMessage((e) => {
@@ -136,6 +143,13 @@ export class Player {
         });
 
         this.gameSocket.onClose(() => {
+            if (
+                this.reconnectDelay !== null &&
+                this.reconnectAttempts < MAX_RECONNECT_ATTEMPTS
+            ) {
+                this.reconnectToGame();
+                return;
+            }
             this.cleanup();
             console.log(`${this.name} disconnected from game-service`);
         });
@@ -232,6 +246,8 @@ export class Player {
                 this.handleGameUpdateMessage(data);
             } else if (type === 'endgame_message') {
                 this.handleGameEndgameMessage(data);
+            } else if (type === 'redirect_message') {
+                this.handleGameRedirectMessage(data);
             }
         } catch (error) {
             console.error(`${this.name} \
@@ -285,6 +301,25 @@ export class Player {
         }
     }
 
+    handleGameRedirectMessage(data) {
+        // The game moved to another game-service shard, the server closes
+        // the socket and we connect again once it is there
+        console.log(`${this.name} received redirect message`);
+        this.reconnectDelay = data.delay;
+        this.reconnectAttempts = 0;
+    }
+
+    reconnectToGame() {
+        const delay = this.reconnectDelay * 2 ** this.reconnectAttempts;
+        this.reconnectAttempts += 1;
+        this.gameSocket.close();
+        this.gameSocket = null;
+        this.reconnectTimeout = setTimeout(() => {
+            console.log(`${this.name} reconnecting to game #${this.gameId}`);
+            this.connectToGame(this.gameId, this.position);
+        }, delay * 1000);
+    }
+
     async getEndGameMessage() {
         if (this.isUser && this.pongGame) {
             try {